@@ -1,40 +1,410 @@
-from django.contrib import admin
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.models import CHANGE, DELETION, LogEntry
+from django.contrib.admin.options import get_content_type_for_model
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import DateField, Exists, ExpressionWrapper, F, OuterRef, Q
+from django.forms.models import BaseInlineFormSet
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from catalog import denorm, facets, search, versions
+from catalog.search import search_ids
+from catalog.stats import invalidate_stats
+from giftlist.retry import retry_on_lock
 
 from .models import Brand, Category, Country, Gift, GiftInstance
 
-admin.site.register(Category)
-admin.site.register(Country)
+# Admin pages stay fast however big the tables get: related objects are
+# picked with autocomplete widgets instead of full <select>s, changelists
+# count at most COUNT_LIMIT rows and inlines show at most INLINE_LIMIT rows.
+# Bulk actions change rows with one UPDATE, or delete them BATCH_SIZE at a
+# time, and leave one change-log entry however many rows they touch.
+COUNT_LIMIT = 10000
+INLINE_LIMIT = 20
+SEARCH_LIMIT = 1000
+BATCH_SIZE = 1000
 
 
-class GiftsInline(admin.TabularInline):
-    model = Gift
+def estimated_count(model, using):
+    """Return the planner's estimate of the rows in model's table, or None.
+
+    Needs ANALYZE to have been run (sqlite_stat1 on SQLite, pg_class on
+    PostgreSQL).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            except DatabaseError:
+                # the statistics table only exists once ANALYZE has run
+                return None
+        else:
+            return None
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    # sqlite_stat1 has a row per index, starting with the number of rows it
+    # covers; partial indexes cover fewer, so the largest is the table's
+    estimate = max(int(str(stat).split()[0]) for stat, in rows)
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts more than COUNT_LIMIT + 1 rows.
+
+    An unfiltered list takes the planner's estimate when it is larger, so a
+    table of millions of rows still shows roughly how many there are.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return capped_count(queryset)
+
+
+def capped_count(queryset):
+    """Count the rows of queryset, stopping at COUNT_LIMIT + 1."""
+    return queryset[: COUNT_LIMIT + 1].count()
+
+
+@retry_on_lock
+def _delete_batch(queryset, delete, batch_size, using):
+    with transaction.atomic(using=using):
+        pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if pks:
+            delete(pks, using)
+    return len(pks)
+
+
+def delete_in_batches(queryset, delete, batch_size=BATCH_SIZE):
+    """Delete every row of queryset, batch_size rows per transaction.
+
+    delete(pks, using) deletes one batch. Returns the number of rows deleted.
+    """
+    using = router.db_for_write(queryset.model)
+    queryset = queryset.using(using).prefetch_related(None).order_by("pk")
+    total = 0
+    while True:
+        deleted = _delete_batch(queryset, delete, batch_size, using)
+        if not deleted:
+            return total
+        total += deleted
+
+
+def delete_instances(pks, using):
+    instances = GiftInstance.objects.using(using).filter(pk__in=pks)
+    gift_ids = set(instances.values_list("gift_id", flat=True))
+    # nothing references gift instances, so no cascade needs collecting
+    instances._raw_delete(using)
+    denorm.refresh_counts(gift_ids, using)
+
+
+def delete_gifts(pks, using):
+    values = facets.values_of(pks, using)
+    categories = Gift.category.through.objects.using(using)
+    categories.filter(gift_id__in=pks)._raw_delete(using)
+    Gift.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+    search.remove_gifts(pks)
+    facets.apply(values, {}, using)
+
+
+class ShiftEventDateForm(forms.Form):
+    days = forms.IntegerField(
+        min_value=-3650,
+        max_value=3650,
+        help_text="Days to move the event dates by; negative moves them earlier.",
+    )
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # skip the second COUNT over the whole table
+    show_full_result_count = False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if "delete_in_batches" in actions:
+            # lists every object on its confirmation page
+            actions.pop("delete_selected", None)
+        return actions
+
+    def log_bulk_action(self, request, count, message, action_flag=CHANGE, model=None):
+        """Report count rows of model touched by a bulk action, in one log
+        entry."""
+        model = model or self.model
+        opts = model._meta
+        name = opts.verbose_name if count == 1 else opts.verbose_name_plural
+        LogEntry.objects.log_action(
+            user_id=request.user.pk,
+            content_type_id=get_content_type_for_model(model).pk,
+            object_id=None,
+            object_repr=f"{count} {name}",
+            action_flag=action_flag,
+            change_message=message,
+        )
+        self.message_user(request, f"{message}: {count} {name}.", messages.SUCCESS)
+
+    def confirm_action(self, request, queryset, title, form=None):
+        """Render the page asking to confirm an action, with an optional form.
+
+        The page posts the action again with "apply" set, for the same
+        selection (or the same filters with "select all").
+        """
+        opts = self.model._meta
+        count = capped_count(queryset)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": title,
+            "opts": opts,
+            "form": form,
+            "count": count,
+            "more": count > COUNT_LIMIT,
+            "name": opts.verbose_name if count == 1 else opts.verbose_name_plural,
+            "action": request.POST["action"],
+            "select_across": request.POST.get("select_across", "0"),
+            "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        }
+        return TemplateResponse(request, "admin/catalog/bulk_action.html", context)
+
+    @admin.action(description="Delete selected %(verbose_name_plural)s in batches")
+    def delete_in_batches(self, request, queryset):
+        """Replace delete_selected in the admins listing this action.
+
+        Those admins define delete_rows(pks, using), deleting one batch.
+        """
+        if "apply" not in request.POST:
+            return self.confirm_action(
+                request, queryset, f"Delete {self.model._meta.verbose_name_plural}"
+            )
+        deleted = delete_in_batches(queryset, self.delete_rows)
+        self.bulk_changed()
+        self.log_bulk_action(request, deleted, "Deleted", DELETION)
+
+    def bulk_changed(self):
+        """Called after a bulk action, which sends no signals."""
+        invalidate_stats()
+        versions.touch(self.model)
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """Inline formset showing only the first INLINE_LIMIT related rows."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_limited_queryset"):
+            self._limited_queryset = super().get_queryset()[:INLINE_LIMIT]
+        return self._limited_queryset
+
+    def hidden_count(self):
+        """Return how many related rows are not shown."""
+        shown = len(self.get_queryset())
+        if shown < INLINE_LIMIT:
+            return 0
+        return super().get_queryset().count() - shown
+
+    def changelist_url(self):
+        """Return the changelist of every row related to the instance."""
+        opts = self.model._meta
+        url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+        return f"{url}?{self.fk.name}__id__exact={self.instance.pk}"
+
+
+class LimitedInline(admin.TabularInline):
+    formset = LimitedInlineFormSet
+    template = "admin/catalog/limited_tabular.html"
     extra = 0
 
 
-class BrandAdmin(admin.ModelAdmin):
-    list_display = ("name", "est")
-    inlines = [GiftsInline]
+class InputFilter(admin.SimpleListFilter):
+    """A list filter with a text box instead of one link per value."""
+
+    template = "admin/catalog/input_filter.html"
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.hidden_params = [
+            (key, value)
+            for key, value in changelist.params.items()
+            if key != self.parameter_name
+        ]
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "display": "All",
+        }
 
 
-admin.site.register(Brand, BrandAdmin)
+class GiftFilter(InputFilter):
+    title = "gift"
+    parameter_name = "gift"
 
+    def queryset(self, request, queryset):
+        value = (self.value() or "").strip()
+        if not value:
+            return queryset
+        condition = Q(gift__ref=value)
+        if value.isdigit():
+            condition |= Q(gift_id=int(value))
+        return queryset.filter(condition)
 
-class GiftsInstanceInline(admin.TabularInline):
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    search_fields = ["name"]
+
+
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    search_fields = ["name"]
+
+
+class GiftsInline(LimitedInline):
+    model = Gift
+    autocomplete_fields = ["made_in", "category"]
+
+
+@admin.register(Brand)
+class BrandAdmin(ScalableAdmin):
+    list_display = ("name", "est")
+    search_fields = ["name"]
+    inlines = [GiftsInline]
+
+
+class GiftsInstanceInline(LimitedInline):
     model = GiftInstance
-    extra = 0
+    autocomplete_fields = ["requester", "taken_by"]
 
 
 @admin.register(Gift)
-class GiftAdmin(admin.ModelAdmin):
+class GiftAdmin(ScalableAdmin):
     list_display = ("name", "brand", "display_category")
+    list_select_related = ("brand",)
     fields = [("brand", "name"), "description", "ref", "category", "made_in"]
+    autocomplete_fields = ["brand", "category", "made_in"]
+    # searches go through the full-text index, see get_search_results
+    search_fields = ["=ref"]
     inlines = [GiftsInstanceInline]
+    actions = ["delete_in_batches", "mark_instances_available"]
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = search_ids(search_term, limit=SEARCH_LIMIT)
+        return queryset.filter(Q(pk__in=ids) | Q(ref=search_term.strip())), False
+
+    def delete_in_batches(self, request, queryset):
+        # gifts with instances cannot be deleted (on_delete=RESTRICT)
+        queryset = queryset.exclude(
+            Exists(GiftInstance.objects.filter(gift=OuterRef("pk")))
+        )
+        return super().delete_in_batches(request, queryset)
+
+    delete_in_batches.short_description = (
+        "Delete selected gifts without instances in batches"
+    )
+
+    def delete_rows(self, pks, using):
+        delete_gifts(pks, using)
+
+    @admin.action(description="Make all instances of selected gifts available")
+    def mark_instances_available(self, request, queryset):
+        changed = (
+            GiftInstance.objects.filter(gift__in=queryset.values("pk"))
+            .filter(~Q(status="a") | Q(taken_by__isnull=False))
+            .update(status="a", taken_by=None, updated_at=timezone.now())
+        )
+        invalidate_stats()
+        versions.touch(GiftInstance)
+        denorm.refresh_counts(queryset.values("pk"))
+        self.log_bulk_action(
+            request, changed, "Made instances available", model=GiftInstance
+        )
 
 
 @admin.register(GiftInstance)
-class GiftInstanceAdmin(admin.ModelAdmin):
+class GiftInstanceAdmin(ScalableAdmin):
     list_display = ("gift", "event_date", "requester")
-    list_filter = (
-        "gift",
-        "event_date",
-    )
+    list_select_related = ("gift", "requester")
+    list_filter = (GiftFilter, "status", "event_date")
+    autocomplete_fields = ["gift", "requester", "taken_by"]
+    actions = [
+        "mark_taken",
+        "mark_available",
+        "clear_requester",
+        "shift_event_date",
+        "delete_in_batches",
+    ]
+
+    def delete_rows(self, pks, using):
+        delete_instances(pks, using)
+
+    def update(self, request, queryset, message, **values):
+        gift_ids = ()
+        if "status" in values:
+            # the gifts whose instance counts the update changes
+            gifts = queryset.order_by().values_list("gift_id", flat=True)
+            gift_ids = set(gifts.distinct())
+        changed = queryset.update(**values, updated_at=timezone.now())
+        denorm.refresh_counts(gift_ids)
+        self.bulk_changed()
+        self.log_bulk_action(request, changed, message)
+
+    @admin.action(description="Mark selected gift instances as taken")
+    def mark_taken(self, request, queryset):
+        self.update(request, queryset.exclude(status="t"), "Marked taken", status="t")
+
+    @admin.action(description="Mark selected gift instances as available")
+    def mark_available(self, request, queryset):
+        self.update(
+            request,
+            queryset.filter(~Q(status="a") | Q(taken_by__isnull=False)),
+            "Marked available",
+            status="a",
+            taken_by=None,
+        )
+
+    @admin.action(description="Clear the requester of selected gift instances")
+    def clear_requester(self, request, queryset):
+        self.update(
+            request,
+            queryset.exclude(requester=None),
+            "Cleared requester",
+            requester=None,
+        )
+
+    @admin.action(description="Shift the event date of selected gift instances")
+    def shift_event_date(self, request, queryset):
+        form = ShiftEventDateForm(request.POST if "apply" in request.POST else None)
+        if not form.is_valid():
+            return self.confirm_action(request, queryset, "Shift event dates", form)
+        days = form.cleaned_data["days"]
+        self.update(
+            request,
+            queryset.exclude(event_date=None),
+            f"Shifted event date by {days} days",
+            event_date=ExpressionWrapper(
+                F("event_date") + timedelta(days=days), output_field=DateField()
+            ),
+        )
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CatalogConfig(AppConfig):
     name = "catalog"
+
+    def ready(self):
+        # connect signal handlers and register system checks
+        from catalog import checks, popularity, signals  # noqa: F401
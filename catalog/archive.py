@@ -0,0 +1,83 @@
+"""Moving expired gift instances out of the live table.
+
+Instances whose event date is before a cut-off are copied into
+ArchivedGiftInstance and deleted from GiftInstance, batch by batch. Each
+batch is its own short transaction found through the event_date index, so
+the live table is never locked for long and an interrupted run can simply be
+started again.
+"""
+
+import time
+
+from django.db import router, transaction
+
+from catalog import denorm, versions
+from catalog.models import ArchivedGiftInstance, GiftInstance
+from catalog.stats import invalidate_stats
+from giftlist.retry import retry_on_lock
+
+FIELDS = [
+    "id",
+    "gift_id",
+    "event_date",
+    "size",
+    "colour",
+    "price",
+    "url",
+    "requester_id",
+    "status",
+    "taken_by_id",
+    "updated_at",
+]
+
+
+@retry_on_lock
+def archive_batch(before, batch_size=1000):
+    """Archive up to batch_size instances with an event before the date before.
+
+    Returns the number of instances archived.
+    """
+    using = router.db_for_write(GiftInstance)
+    with transaction.atomic(using=using):
+        rows = list(
+            GiftInstance.objects.using(using)
+            .filter(event_date__lt=before)
+            .order_by("event_date")
+            .values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedGiftInstance.objects.using(using).bulk_create(
+            [ArchivedGiftInstance(**row) for row in rows], ignore_conflicts=True
+        )
+        # nothing references gift instances, so no cascade needs collecting
+        GiftInstance.objects.using(using).filter(
+            pk__in=[row["id"] for row in rows]
+        )._raw_delete(using)
+        denorm.refresh_counts([row["gift_id"] for row in rows], using)
+    return len(rows)
+
+
+def archive_expired(before, batch_size=1000, pause=0, limit=None, stdout=None):
+    """Archive every instance with an event before the date before.
+
+    Sleeps pause seconds between batches to leave room for other writers,
+    and stops after about limit instances if given. Returns the number of
+    instances archived.
+    """
+    total = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total)
+        archived = archive_batch(before, size)
+        if not archived:
+            break
+        total += archived
+        if stdout is not None:
+            stdout.write(f"Archived {total} gift instances")
+        if pause:
+            time.sleep(pause)
+    if total:
+        # raw deletes send no signals
+        invalidate_stats()
+        versions.touch(GiftInstance)
+    return total
@@ -0,0 +1,478 @@
+"""Load benchmarks for every URL of the catalog and the API.
+
+Each endpoint is requested by several concurrent test clients, each in its
+own thread with its own database connection, going through the full
+middleware stack. The paths requested are drawn from the seeded data with a
+fixed seed, so two runs over the same dataset request the same pages and
+their reports can be compared.
+"""
+
+import logging
+import math
+import platform
+import random
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, connections, models, transaction
+from django.test import Client
+from django.urls import URLResolver, reverse
+
+from catalog import urls as catalog_urls
+from catalog.budgets import QueryCounter, count_queries
+from catalog.ids import uuid7
+from catalog.models import Brand, Category, Gift, GiftInstance
+from catalog.seed import NOUNS
+from giftapi import urls as giftapi_urls
+from giftlist.retry import retry_on_lock
+from giftlist.sqlite3.base import apply_pragmas
+
+DATASETS = {"small": 1_000, "medium": 100_000, "large": 1_000_000}
+
+# endpoints that read a whole table are requested fewer times
+HEAVY = {"export"}
+
+# username is None for anonymous requests; responses with another status
+# than those in ok are counted as errors
+Endpoint = namedtuple(
+    "Endpoint", ["paths", "username", "method", "ok"], defaults=["get", (200,)]
+)
+
+
+def url_names():
+    """Return the names of every URL in catalog.urls and giftapi.urls."""
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+
+    return set(walk(catalog_urls.urlpatterns)) | set(walk(giftapi_urls.urlpatterns))
+
+
+def sample_ids(queryset, count, rng):
+    """Return up to count primary keys of queryset, picked with rng."""
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True)[: count * 20])
+    return rng.sample(ids, min(count, len(ids)))
+
+
+def endpoints(seed=0, samples=50):
+    """Return {url name: Endpoint} for the seeded data.
+
+    Claims and releases of the same instances alternate, so they measure
+    contended writes: losing a race (409) is expected. Raises LookupError if
+    the catalog is empty.
+    """
+    rng = random.Random(seed)
+    gifts = sample_ids(Gift.objects.all(), samples, rng)
+    brands = sample_ids(Brand.objects.all(), samples, rng)
+    owner = (
+        GiftInstance.objects.exclude(requester=None)
+        .order_by("pk")
+        .values_list("requester__username", flat=True)
+        .first()
+    )
+    if not gifts or not brands or owner is None:
+        raise LookupError("Seed the catalog before benchmarking it.")
+    instances = sample_ids(
+        GiftInstance.objects.filter(requester__username=owner), samples, rng
+    )
+    staff, _ = User.objects.get_or_create(
+        username="bench-staff", defaults={"is_staff": True, "password": "!"}
+    )
+
+    def paths(name, ids):
+        return [reverse(name, args=[pk]) for pk in ids]
+
+    def query(name, params):
+        return [f"{reverse(name)}?{param}" for param in params]
+
+    words = [f"q={noun}" for noun in NOUNS]
+    categories = Category.objects.order_by("pk").values_list("pk", flat=True)[:5]
+    # no filter, one and two filters, which count in different ways
+    facet_filters = [""]
+    for category, brand in zip(categories, brands):
+        facet_filters += [f"category={category}", f"category={category}&brand={brand}"]
+    exports = [
+        reverse("export", args=["gifts"]),
+        reverse("export", args=["brands"]) + "?type=csv",
+        reverse("export", args=["giftinstances"]) + "?compress=gzip",
+    ]
+    claim_paths = [
+        reverse(name, args=[pk])
+        for pk in instances[:5]
+        for name in ("giftinstance-claim", "giftinstance-release")
+    ]
+    api_claim_paths = [
+        reverse(name, args=[pk])
+        for pk in instances[5:10] or instances[:5]
+        for name in ("claim", "release")
+    ]
+    return {
+        "index": Endpoint([reverse("index")], None),
+        "search": Endpoint(query("search", words), None),
+        "most-viewed": Endpoint([reverse("most-viewed")], None),
+        "gifts": Endpoint([reverse("gifts")], None),
+        "browse": Endpoint(query("browse", facet_filters), None),
+        "gift-detail": Endpoint(paths("gift-detail", gifts), None),
+        "brands": Endpoint([reverse("brands")], None),
+        "brand-detail": Endpoint(paths("brand-detail", brands), None),
+        "mygifts": Endpoint([reverse("mygifts")], owner),
+        "giftinstance-update": Endpoint(
+            paths("giftinstance-update", instances), owner
+        ),
+        "giftinstance-claim": Endpoint(claim_paths, owner, "post", (302, 409)),
+        "giftinstance-release": Endpoint(claim_paths[1:], owner, "post", (302, 409)),
+        "api-root": Endpoint([reverse("api-root")], None),
+        "country-list": Endpoint([reverse("country-list")], None),
+        "category-list": Endpoint([reverse("category-list")], None),
+        "brand-list": Endpoint([reverse("brand-list")], None),
+        "gift-list": Endpoint([reverse("gift-list")], None),
+        "gift-search": Endpoint(query("gift-search", words), None),
+        "gift-browse": Endpoint(query("gift-browse", facet_filters), None),
+        "export": Endpoint(exports, staff.username),
+        "claim": Endpoint(api_claim_paths, owner, "post", (200, 409)),
+        "release": Endpoint(api_claim_paths[1:], owner, "post", (200, 409)),
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def client_host():
+    """Return a host name the site accepts, for test clients."""
+    # "localhost" is allowed while DEBUG is on and ALLOWED_HOSTS is empty
+    hosts = [host for host in settings.ALLOWED_HOSTS if "*" not in host]
+    return hosts[0].lstrip(".") if hosts else "localhost"
+
+
+def run_endpoint(endpoint, requests, concurrency, warmup=2):
+    """Request the paths of endpoint round robin from concurrent clients and
+    return a summary.
+
+    Latencies include reading the whole body of streaming responses.
+    """
+    paths = endpoint.paths
+    clients = []
+    user = User.objects.get(username=endpoint.username) if endpoint.username else None
+    for _ in range(concurrency):
+        client = Client(SERVER_NAME=client_host(), raise_request_exception=False)
+        if user is not None:
+            client.force_login(user)
+        clients.append(client)
+
+    lock = threading.Lock()
+    results = []
+
+    def get(client, path):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with count_queries(counter):
+            response = getattr(client, endpoint.method)(path)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        elapsed = time.perf_counter() - start
+        response.close()
+        return elapsed, counter.count, response.status_code
+
+    def worker(number):
+        client = clients[number]
+        try:
+            for index in range(warmup):
+                get(client, paths[index % len(paths)])
+            mine = []
+            for index in range(number, requests, concurrency):
+                mine.append(get(client, paths[index % len(paths)]))
+            with lock:
+                results.extend(mine)
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    queries = [count for _, count, _ in results]
+    errors = sum(1 for _, _, status in results if status not in endpoint.ok)
+
+    def ms(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_rps": round(len(results) / wall, 2) if wall else None,
+        "queries_per_request": (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def meta(**extra):
+    """Describe the run, so that reports from different commits line up."""
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        **extra,
+    }
+
+
+def run(requests=200, concurrency=4, seed=0, only=None, stdout=None):
+    """Benchmark every endpoint (or those named in only) and return the report."""
+    specs = endpoints(seed)
+    missing = url_names() - set(specs)
+    report = {
+        "meta": meta(
+            gifts=Gift.objects.count(),
+            instances=GiftInstance.objects.count(),
+            requests=requests,
+            concurrency=concurrency,
+            seed=seed,
+            not_benchmarked=sorted(missing),
+        ),
+        "endpoints": {},
+    }
+    # expected 4xx responses (lost claims) would be logged as warnings
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.ERROR)
+    try:
+        for name, endpoint in sorted(specs.items()):
+            if only and name not in only:
+                continue
+            count = max(concurrency, requests // 20) if name in HEAVY else requests
+            report["endpoints"][name] = run_endpoint(endpoint, count, concurrency)
+            if stdout is not None:
+                stdout.write(summary(name, report["endpoints"][name]))
+    finally:
+        request_logger.setLevel(level)
+    return report
+
+
+def summary(name, result):
+    return (
+        f"{name:<22} p50 {result['p50_ms']:>9} ms  "
+        f"p95 {result['p95_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  "
+        f"{result['throughput_rps']:>8} req/s  "
+        f"{result['queries_per_request']:>6} queries  "
+        f"{result['errors']} errors"
+    )
+
+
+def compare(baseline, report, threshold=0.25):
+    """Return messages for endpoints that got slower or run more queries.
+
+    An endpoint regresses when its p95 latency grows by more than threshold
+    (a fraction) or its mean number of queries per request goes up.
+    """
+    regressions = []
+    for name, result in report.get("endpoints", {}).items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        limit = (before["p95_ms"] or math.inf) * (1 + threshold)
+        if (result["p95_ms"] or 0) > limit:
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms"
+            )
+        if (result["queries_per_request"] or 0) > (before["queries_per_request"] or 0):
+            regressions.append(
+                f"{name}: {before['queries_per_request']} -> "
+                f"{result['queries_per_request']} queries per request"
+            )
+        if result["errors"] > before["errors"]:
+            regressions.append(
+                f"{name}: {before['errors']} -> {result['errors']} errors"
+            )
+    return regressions
+
+
+ID_GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def index_size(table):
+    """Return the size in bytes of the indexes of table, or None if unknown."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' "
+                    "AND tbl_name = %s)",
+                    [table],
+                )
+            except DatabaseError:
+                # SQLite built without the dbstat table
+                return None
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_indexes_size(%s::regclass)", [table])
+        else:
+            return None
+        return cursor.fetchone()[0]
+
+
+def insert_ids(rows, batch_size=10000):
+    """Bulk insert rows keys from each generator of ID_GENERATORS.
+
+    Each generator fills its own table with a UUID primary key, the way
+    GiftInstance is keyed, and is timed from key generation to commit.
+    Returns {generator: {"rows_per_s": ..., "index_bytes": ...}}.
+    """
+    field = models.UUIDField(primary_key=True)
+    quote = connection.ops.quote_name
+    results = {}
+    for name, generate in ID_GENERATORS.items():
+        table = f"bench_ids_{name}"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+            cursor.execute(
+                f"CREATE TABLE {quote(table)} "
+                f"(id {field.db_type(connection)} PRIMARY KEY, n integer)"
+            )
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            batch = [
+                (field.get_db_prep_value(generate(), connection), n)
+                for n in range(offset, min(offset + batch_size, rows))
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {quote(table)} (id, n) VALUES (%s, %s)", batch
+                )
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "rows": rows,
+            "rows_per_s": round(rows / elapsed),
+            "index_bytes": index_size(table),
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {quote(table)}")
+    return results
+
+
+# PRAGMAs of Django's own sqlite3 backend, to compare the tuned ones against
+SQLITE_BASELINE = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def sqlite_locks(path, pragmas, readers=4, writers=2, duration=2.0, rows=1000):
+    """Run reader and writer threads against the SQLite file path.
+
+    Readers sum a random range of rows. Writers read a row and update it in
+    one transaction, retried with retry_on_lock when the database is locked.
+    Every thread has its own connection set up with pragmas. Returns the
+    reads and writes per second, the number of failed writes and whether
+    every committed write is in the table.
+    """
+    setup = sqlite3.connect(path)
+    apply_pragmas(setup, pragmas)
+    setup.execute("CREATE TABLE counters (id integer PRIMARY KEY, n integer)")
+    setup.executemany(
+        "INSERT INTO counters (id, n) VALUES (?, 0)", [(n,) for n in range(rows)]
+    )
+    setup.commit()
+
+    deadline = time.perf_counter() + duration
+    totals = {"reads": 0, "writes": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def connect():
+        db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        apply_pragmas(db, pragmas)
+        return db
+
+    def read(seed):
+        db, rng, count = connect(), random.Random(seed), 0
+        while time.perf_counter() < deadline:
+            start = rng.randrange(rows)
+            db.execute(
+                "SELECT SUM(n) FROM counters WHERE id BETWEEN ? AND ?",
+                (start, start + 100),
+            ).fetchone()
+            count += 1
+        db.close()
+        with lock:
+            totals["reads"] += count
+
+    def write(seed):
+        db, rng, count, failed = connect(), random.Random(seed), 0, 0
+
+        @retry_on_lock
+        def increment(pk):
+            try:
+                db.execute("BEGIN")
+                (n,) = db.execute(
+                    "SELECT n FROM counters WHERE id = ?", (pk,)
+                ).fetchone()
+                db.execute("UPDATE counters SET n = ? WHERE id = ?", (n + 1, pk))
+                db.execute("COMMIT")
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise
+
+        while time.perf_counter() < deadline:
+            try:
+                increment(rng.randrange(rows))
+                count += 1
+            except sqlite3.OperationalError:
+                failed += 1
+        db.close()
+        with lock:
+            totals["writes"] += count
+            totals["failed"] += failed
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    threads += [
+        threading.Thread(target=write, args=(readers + n,)) for n in range(writers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    (stored,) = setup.execute("SELECT SUM(n) FROM counters").fetchone()
+    setup.close()
+    return {
+        "reads_per_s": round(totals["reads"] / elapsed),
+        "writes_per_s": round(totals["writes"] / elapsed),
+        "failed_writes": totals["failed"],
+        "consistent": stored == totals["writes"],
+    }
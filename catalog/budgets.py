@@ -0,0 +1,95 @@
+"""Query budgets for views.
+
+Decorate a view with ``query_budget(n)`` to count the database queries it
+runs on every connection. Going over budget is logged as a warning, or raises
+QueryBudgetExceeded when settings.QUERY_BUDGET_RAISE is true (the default
+under DEBUG), so N+1 regressions show up in development straight away.
+The count is also left on the response as ``response.query_count``.
+
+Queries run inside ``uncounted()`` are left out of the count. Wrap the code
+refilling a cache in it: those queries run once after each invalidation, not
+on every request, so a budget sized for the steady state still holds on the
+first request after a write.
+"""
+
+import logging
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_uncounted = ContextVar("uncounted", default=False)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """execute_wrapper that counts the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not _uncounted.get():
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def uncounted():
+    """Leave the queries run in the block out of every query budget."""
+    token = _uncounted.set(True)
+    try:
+        yield
+    finally:
+        _uncounted.reset(token)
+
+
+def count_queries(counter):
+    """Context manager installing counter on every database connection."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+    return stack
+
+
+def query_budget(limit):
+    """Decorate a view function (or dispatch(), via method_decorator)."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with count_queries(counter):
+                response = view(request, *args, **kwargs)
+                # count queries run while rendering a lazy TemplateResponse
+                lazy = getattr(response, "template_name", None)
+                if lazy and not response.is_rendered:
+                    response.render()
+            response.query_count = counter.count
+            match = request.resolver_match
+            name = match.view_name if match else request.path
+            if counter.count > limit:
+                message = (
+                    f"View {name} ran {counter.count} queries for "
+                    f"{request.path}, over its budget of {limit}"
+                )
+                if getattr(settings, "QUERY_BUDGET_RAISE", settings.DEBUG):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            else:
+                logger.debug(
+                    "View %s ran %d queries for %s", name, counter.count, request.path
+                )
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the default cache is not shared between workers."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PER_PROCESS:
+        return []
+    return [
+        Warning(
+            f"The default cache ({backend}) is not shared between workers.",
+            hint=(
+                "Home page statistics, change stamps and facet counts are "
+                "invalidated through the default cache, so other workers "
+                "would keep serving stale data. Use a cache every worker "
+                "shares, such as memcached or the file cache."
+            ),
+            id="catalog.W001",
+        )
+    ]
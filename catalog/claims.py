@@ -0,0 +1,77 @@
+"""Claiming and releasing gift instances.
+
+Both are a single conditional UPDATE that never reads the row first. When
+many buyers claim the same gift at once, the first UPDATE to reach the row
+matches it, and every later one matches nothing because the status has
+already changed. So a gift cannot be taken twice. The lock is held only
+for that statement and the recount of the gift's instances, which commits
+with it.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from catalog import denorm, versions
+from catalog.models import Gift, GiftInstance
+from catalog.stats import invalidate_stats
+from giftlist.retry import retry_on_lock
+
+
+class ClaimConflict(Exception):
+    """The instance exists but was not in the state the change needs."""
+
+
+def _change(pk, instances, message, **values):
+    """Apply values to instances, which should match the row pk at most."""
+    # the UPDATE and the gift's counts commit together, so a lock error on
+    # either rolls both back and retry_on_lock runs the claim again whole
+    with transaction.atomic():
+        changed = instances.update(updated_at=timezone.now(), **values)
+        if changed:
+            denorm.refresh_counts(
+                GiftInstance.objects.filter(pk=pk).values("gift_id")
+            )
+    if changed:
+        # update() sends no signals; stamps move once the change is visible
+        invalidate_stats()
+        versions.touch(GiftInstance, Gift)
+        return
+    if not GiftInstance.objects.filter(pk=pk).exists():
+        raise GiftInstance.DoesNotExist
+    raise ClaimConflict(message)
+
+
+@retry_on_lock
+def claim(pk, user):
+    """Mark an available instance as taken by user.
+
+    Raises ClaimConflict if it is already taken and GiftInstance.DoesNotExist
+    if there is no such instance.
+    """
+    _change(
+        pk,
+        GiftInstance.objects.filter(pk=pk, status="a"),
+        "Someone is already buying this gift.",
+        status="t",
+        taken_by=user,
+    )
+
+
+@retry_on_lock
+def release(pk, user):
+    """Make an instance taken by user available again.
+
+    Staff can release anyone's claim. Raises ClaimConflict if the instance is
+    not taken by user and GiftInstance.DoesNotExist if there is no such
+    instance.
+    """
+    instances = GiftInstance.objects.filter(pk=pk, status="t")
+    if not user.is_staff:
+        instances = instances.filter(taken_by=user)
+    _change(
+        pk,
+        instances,
+        "This gift is not taken by you.",
+        status="a",
+        taken_by=None,
+    )
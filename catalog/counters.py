@@ -0,0 +1,44 @@
+"""Adding to counter rows with multi-row upserts."""
+
+from django.db import connections, transaction
+
+
+def _upsert_sql(connection, model, keys, count):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    key_columns = [quote(model._meta.get_field(name).column) for name in keys]
+    column = quote(model._meta.get_field(count).column)
+    insert = f"INSERT INTO {table} ({', '.join(key_columns + [column])}) VALUES"
+    if connection.vendor == "mysql":
+        update = f"ON DUPLICATE KEY UPDATE {column} = {column} + VALUES({column})"
+    else:
+        # PostgreSQL and SQLite 3.24+
+        update = (
+            f"ON CONFLICT ({', '.join(key_columns)}) "
+            f"DO UPDATE SET {column} = {table}.{column} + excluded.{column}"
+        )
+    return insert, update
+
+
+def add_counts(model, keys, count, rows, using):
+    """Add to the count field of the rows of model with the given keys.
+
+    rows are tuples of the values of the keys fields followed by the amount
+    to add; missing rows are inserted with that amount. keys must be covered
+    by a unique constraint. Runs one INSERT ... ON CONFLICT statement for as
+    many rows as the database accepts in a single statement.
+    """
+    if not rows:
+        return
+    connection = connections[using]
+    insert, update = _upsert_sql(connection, model, keys, count)
+    fields = [model._meta.get_field(name) for name in (*keys, count)]
+    batch_size = max(1, connection.ops.bulk_batch_size(fields, rows))
+    placeholders = f"({', '.join(['%s'] * len(fields))})"
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            values = ", ".join([placeholders] * len(batch))
+            cursor.execute(
+                f"{insert} {values} {update}", [value for row in batch for value in row]
+            )
@@ -0,0 +1,125 @@
+"""Copies of related data kept on the Gift row.
+
+Gift lists show each gift's categories and how many of its instances are
+available or taken. Reading those through the category join and a GROUP BY
+over the instances costs queries for every page, so Gift keeps them in its
+own columns:
+
+category_names   names of the gift's categories, in name order
+available_count  number of its available instances
+taken_count      number of its taken instances
+
+The signal handlers in catalog.signals refresh them whenever a gift's
+categories or instances change. Bulk writes send no signals, so whatever
+writes in bulk calls refresh_categories or refresh_counts itself. Anything
+missed is repaired by the recompute_gift_denorm command.
+"""
+
+import time
+
+from django.db import router, transaction
+from django.db.models import Count, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from catalog import versions
+from catalog.models import Gift, GiftInstance
+
+
+def _chunks(ids, size=500):
+    ids = list({pk for pk in ids if pk is not None})
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def _instances(status):
+    """The number of instances of the outer gift with status."""
+    return Coalesce(
+        Subquery(
+            GiftInstance.objects.filter(gift=OuterRef("pk"), status=status)
+            .order_by()
+            .values("gift")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def refresh_counts(gift_ids, using=None):
+    """Recount the available and taken instances of the gifts with gift_ids.
+
+    gift_ids is a list of ids or a queryset of ids, which is used as a
+    subquery. Only gifts whose counts are wrong are written, with one UPDATE
+    for up to 500 gifts that counts through the gift/status index. Returns
+    the number of gifts changed.
+    """
+    using = using or router.db_for_write(Gift)
+    gifts = Gift.objects.using(using)
+    chunks = [gift_ids] if isinstance(gift_ids, QuerySet) else _chunks(gift_ids)
+    available, taken = _instances("a"), _instances("t")
+    changed = 0
+    for chunk in chunks:
+        changed += (
+            gifts.filter(pk__in=chunk)
+            .filter(~Q(available_count=available) | ~Q(taken_count=taken))
+            .update(available_count=available, taken_count=taken)
+        )
+    if changed:
+        versions.touch(Gift)
+    return changed
+
+
+def refresh_categories(gift_ids, using=None):
+    """Rewrite category_names of the gifts with gift_ids where it is wrong.
+
+    Returns the number of gifts changed.
+    """
+    using = using or router.db_for_write(Gift)
+    gifts = Gift.objects.using(using)
+    links = Gift.category.through.objects.using(using)
+    changed = []
+    for chunk in _chunks(gift_ids):
+        names = {pk: [] for pk in chunk}
+        rows = (
+            links.filter(gift_id__in=chunk)
+            .order_by("category__name")
+            .values_list("gift_id", "category__name")
+        )
+        for gift_id, name in rows:
+            names[gift_id].append(name)
+        for gift in gifts.filter(pk__in=chunk).only("pk", "category_names"):
+            if gift.category_names != names[gift.pk]:
+                gift.category_names = names[gift.pk]
+                changed.append(gift)
+    if changed:
+        gifts.bulk_update(changed, ["category_names"], batch_size=500)
+        versions.touch(Gift)
+    return len(changed)
+
+
+def recompute(batch_size=1000, pause=0, stdout=None):
+    """Repair the copied columns of every gift, batch_size gifts at a time.
+
+    Each batch is its own transaction. Sleeps pause seconds between batches.
+    Returns a dict with the number of gifts checked and the number whose
+    category names and whose counts were wrong.
+    """
+    using = router.db_for_write(Gift)
+    gifts = Gift.objects.using(using).order_by("pk")
+    totals = {"checked": 0, "categories": 0, "counts": 0}
+    last = None
+    while True:
+        batch = gifts if last is None else gifts.filter(pk__gt=last)
+        ids = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic(using=using):
+            totals["categories"] += refresh_categories(ids, using)
+            totals["counts"] += refresh_counts(ids, using)
+        totals["checked"] += len(ids)
+        last = ids[-1]
+        if stdout is not None:
+            stdout.write(f"Checked {totals['checked']} gifts")
+        if pause:
+            time.sleep(pause)
+    return totals
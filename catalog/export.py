@@ -0,0 +1,163 @@
+"""Streaming exports of the catalog tables.
+
+Rows are read in keyset-ordered chunks, each with its related objects
+fetched by select_related/prefetch_related, and written out as they are
+produced. Memory use therefore depends on the chunk size, not on the size of
+the table. The gift export uses the same columns as import_catalog reads.
+"""
+
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from catalog.models import Brand, Gift, GiftInstance
+
+FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def gift_row(gift):
+    return {
+        "id": gift.id,
+        "ref": gift.ref,
+        "name": gift.name,
+        "description": gift.description,
+        "brand": gift.brand.name if gift.brand else "",
+        "made_in": gift.made_in.name if gift.made_in else "",
+        "category": [category.name for category in gift.category.all()],
+    }
+
+
+def brand_row(brand):
+    return {"id": brand.id, "name": brand.name, "est": brand.est}
+
+
+def giftinstance_row(instance):
+    return {
+        "id": instance.id,
+        "gift": instance.gift.ref if instance.gift else "",
+        "event_date": instance.event_date,
+        "size": instance.size,
+        "colour": instance.colour,
+        "price": instance.price,
+        "url": instance.url,
+        "requester": instance.requester.username if instance.requester else "",
+        "status": instance.status,
+    }
+
+
+# name: (queryset, row function, columns)
+TABLES = {
+    "gifts": (
+        Gift.objects.select_related("brand", "made_in").prefetch_related("category"),
+        gift_row,
+        ["id", "ref", "name", "description", "brand", "made_in", "category"],
+    ),
+    "brands": (Brand.objects.all(), brand_row, ["id", "name", "est"]),
+    "giftinstances": (
+        GiftInstance.objects.select_related("gift", "requester"),
+        giftinstance_row,
+        [
+            "id",
+            "gift",
+            "event_date",
+            "size",
+            "colour",
+            "price",
+            "url",
+            "requester",
+            "status",
+        ],
+    ),
+}
+
+
+def iter_rows(table, chunk_size=2000):
+    """Yield the rows of table as dicts, reading chunk_size rows per query."""
+    queryset, row, _ = TABLES[table]
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        objects = list(chunk[:chunk_size])
+        if not objects:
+            return
+        for obj in objects:
+            yield row(obj)
+        last_pk = objects[-1].pk
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+class _Line:
+    """File-like object whose write() returns what was written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    """Yield CSV lines with a header row; lists are joined with "|"."""
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            "|".join(value) if isinstance(value, list) else value
+            for value in (row[column] for column in columns)
+        )
+
+
+def buffered(chunks, size=64 * 1024):
+    """Join small byte strings into blocks of about size bytes."""
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress an iterable of byte strings into gzip format on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(table, file_format="ndjson", compress=False, chunk_size=2000):
+    """Yield the export of table as byte strings."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}'.")
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format '{file_format}'.")
+    rows = iter_rows(table, chunk_size)
+    if file_format == "csv":
+        lines = csv_lines(rows, TABLES[table][2])
+    else:
+        lines = ndjson_lines(rows)
+    chunks = buffered(line.encode("utf-8") for line in lines)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return chunks
+
+
+def filename(table, file_format, compress=False):
+    name = f"{table}.{file_format}"
+    return f"{name}.gz" if compress else name
+
+
+def content_type(file_format, compress=False):
+    return "application/gzip" if compress else CONTENT_TYPES[file_format]
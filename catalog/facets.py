@@ -0,0 +1,253 @@
+"""Faceted browsing of gifts by category, brand and country.
+
+A gift's facet values are its categories, its brand and its country
+(made_in). Browsing narrows the gifts to those having every selected value
+and shows, for each facet, the values most common among them with their
+number of gifts.
+
+Counting that with a GROUP BY over the gift and category tables on every
+request grows with the catalog. Instead FacetCount holds the counts ready:
+the number of gifts with each value, and with each pair of values. The
+signal handlers in catalog.signals add and subtract a gift's contribution
+whenever its values change, and bulk writers call apply() themselves. So
+with no filter, or one, the counts are a read of a few index rows. With
+several filters the counts are worked out from the gifts matching all of
+them, which are no more than those matching the most selective one. Either
+way results are cached until a gift, facet value or count changes.
+
+Settings live in the FACETS dict:
+
+LIMIT          values listed per facet, most gifts first (default 20)
+CACHE_TIMEOUT  seconds a set of counts stays cached (default 300)
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Count
+
+from catalog import versions
+from catalog.budgets import uncounted
+from catalog.counters import add_counts
+from catalog.models import Brand, Category, Country, FacetCount, Gift
+from catalog.stats import get_stats
+from giftlist.retry import retry_on_lock
+
+DEFAULTS = {
+    "LIMIT": 20,
+    "CACHE_TIMEOUT": 300,
+}
+
+# facet: the model of its values; each is also the name of a Gift field
+FACETS = {"category": Category, "brand": Brand, "made_in": Country}
+KEYS = ("filter_facet", "filter_value", "facet", "value_id")
+# the filter of the rows that count every gift with a value
+NONE = ("", 0)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "FACETS", {})}
+
+
+def _chunks(ids, size=500):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def own_values(gift):
+    """Return the facet values held on the gift row itself."""
+    # deferred fields are left out rather than loaded one query at a time
+    values = {
+        ("brand", gift.__dict__.get("brand_id")),
+        ("made_in", gift.__dict__.get("made_in_id")),
+    }
+    return values - {("brand", None), ("made_in", None)}
+
+
+def values_of(gift_ids, using=None):
+    """Return a dict of each gift's set of (facet, value id) pairs."""
+    using = using or router.db_for_write(Gift)
+    links = Gift.category.through.objects.using(using)
+    values = {}
+    for chunk in _chunks(gift_ids):
+        rows = (
+            Gift.objects.using(using)
+            .filter(pk__in=chunk)
+            .values_list("pk", "brand_id", "made_in_id")
+        )
+        for pk, brand_id, made_in_id in rows:
+            values[pk] = {("brand", brand_id), ("made_in", made_in_id)}
+            values[pk] -= {("brand", None), ("made_in", None)}
+        rows = links.filter(gift_id__in=chunk).values_list("gift_id", "category_id")
+        for gift_id, category_id in rows:
+            values[gift_id].add(("category", category_id))
+    return values
+
+
+def contributions(values):
+    """Return the FacetCount keys that a gift with values adds one to."""
+    keys = [(*NONE, *value) for value in values]
+    keys += [(*other, *value) for other in values for value in values - {other}]
+    return keys
+
+
+@retry_on_lock
+def _add(rows, using):
+    add_counts(FacetCount, KEYS, "gifts", rows, using)
+
+
+def apply(before, after, using=None):
+    """Move the counts of gifts from the values in before to those in after.
+
+    Both map gift ids to sets of values, as returned by values_of(). A gift
+    missing from one of them has no values there, so apply({}, values) adds
+    new gifts and apply(values, {}) takes deleted ones away.
+    """
+    deltas = Counter()
+    for gift_id in before.keys() | after.keys():
+        old, new = before.get(gift_id, set()), after.get(gift_id, set())
+        if old != new:
+            deltas.subtract(contributions(old))
+            deltas.update(contributions(new))
+    # a fixed order, so concurrent writers take their row locks in step
+    rows = sorted((*key, amount) for key, amount in deltas.items() if amount)
+    if rows:
+        _add(rows, using or router.db_for_write(FacetCount))
+        versions.touch(FacetCount)
+
+
+def drop_value(facet, value_id, using=None):
+    """Forget the counts of a facet value that no longer exists."""
+    using = using or router.db_for_write(FacetCount)
+    counts = FacetCount.objects.using(using)
+    counts.filter(facet=facet, value_id=value_id).delete()
+    counts.filter(filter_facet=facet, filter_value=value_id).delete()
+    versions.touch(FacetCount)
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """Count every gift's facet values again from scratch.
+
+    Gifts are added batch_size at a time, each batch in its own transaction,
+    so the counts are too low until it finishes. Returns the number of
+    gifts counted.
+    """
+    using = router.db_for_write(FacetCount)
+    FacetCount.objects.using(using).all()._raw_delete(using)
+    gifts = Gift.objects.using(using).order_by("pk")
+    total = 0
+    last = None
+    while True:
+        batch = gifts if last is None else gifts.filter(pk__gt=last)
+        ids = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic(using=using):
+            apply({}, values_of(ids, using), using)
+        total += len(ids)
+        last = ids[-1]
+        if stdout is not None:
+            stdout.write(f"Counted {total} gifts")
+    versions.touch(FacetCount)
+    return total
+
+
+def parse_filters(params):
+    """Return the (facet, value id) pairs in params, such as request.GET.
+
+    Each facet may be given several times. Raises ValueError for a value
+    that is not an id.
+    """
+    return sorted(
+        {(facet, int(value)) for facet in FACETS for value in params.getlist(facet)}
+    )
+
+
+def filter_gifts(queryset, filters):
+    """Narrow a Gift queryset to the gifts having every value in filters."""
+    for facet, value_id in filters:
+        # a filter() per value, so each category gets its own join
+        queryset = queryset.filter(**{facet: value_id})
+    return queryset
+
+
+def _top(rows, key, limit):
+    return list(rows.order_by("-gifts", key)[:limit])
+
+
+def _count(filters, limit):
+    if len(filters) > 1:
+        gifts = filter_gifts(Gift.objects.all(), filters)
+        total = gifts.count()
+        # grouped apart from the filters, which would otherwise share the
+        # category join and leave only the selected categories
+        matching = Gift.objects.filter(pk__in=gifts.values("pk"))
+        top = {}
+        for facet in FACETS:
+            key = f"{facet}__id"
+            rows = (
+                matching.exclude(**{key: None})
+                .values_list(key)
+                .annotate(gifts=Count("pk"))
+            )
+            top[facet] = _top(rows, key, limit)
+    else:
+        filter_facet, filter_value = filters[0] if filters else NONE
+        rows = FacetCount.objects.filter(
+            filter_facet=filter_facet, filter_value=filter_value, gifts__gt=0
+        ).values_list("value_id", "gifts")
+        if filters:
+            overall = FacetCount.objects.filter(
+                filter_facet="", filter_value=0, facet=filter_facet
+            )
+            total = (
+                overall.filter(value_id=filter_value)
+                .values_list("gifts", flat=True)
+                .first()
+                or 0
+            )
+        else:
+            total = get_stats()["num_gifts"]
+        top = {
+            facet: _top(rows.filter(facet=facet), "value_id", limit)
+            for facet in FACETS
+        }
+        if filters and total:
+            # pairs never join a value with itself, so add the selected one
+            own = top[filter_facet] + [(filter_value, total)]
+            top[filter_facet] = sorted(own, key=lambda row: (-row[1], row[0]))
+            del top[filter_facet][limit:]
+
+    facets = {}
+    for facet, model in FACETS.items():
+        found = model.objects.in_bulk([value_id for value_id, _ in top[facet]])
+        # counts of a value deleted meanwhile go with the next change
+        facets[facet] = [
+            (found[value_id], gifts)
+            for value_id, gifts in top[facet]
+            if value_id in found
+        ]
+    return {"total": total, "facets": facets}
+
+
+def facet_counts(filters):
+    """Return the gifts having every value in filters, counted by facet value.
+
+    filters is a list of (facet, value id) pairs. Returns a dict with the
+    number of matching gifts as "total", and as "facets" a dict of lists of
+    (value, number of matching gifts with it), most gifts first, for each
+    facet.
+    """
+    config = get_config()
+    models = (FacetCount, Gift, *FACETS.values())
+    stamps = [versions.changed_at(model) for model in models]
+    key = "catalog:facets:" + versions.make_etag(stamps, filters, config["LIMIT"])
+    result = cache.get(key)
+    if result is None:
+        with uncounted():
+            result = _count(filters, config["LIMIT"])
+        cache.set(key, result, config["CACHE_TIMEOUT"])
+    return result
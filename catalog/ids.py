@@ -0,0 +1,55 @@
+"""Time-ordered UUIDs for primary keys.
+
+uuid7() follows the version 7 layout of RFC 9562: a 48 bit Unix timestamp in
+milliseconds, then 12 bits that count up within the same millisecond, then 62
+random bits. New keys therefore sort after older ones and are appended to
+the right-hand edge of the primary key index, instead of landing on a random
+page like uuid4 keys do. They are still ordinary UUIDs, so they can be mixed
+with existing uuid4 keys in the same column.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7_int(ms, counter, random_bits):
+    """Return the 128 bit value of a version 7 UUID.
+
+    counter is kept to its low 12 bits and random_bits to its low 62 bits.
+    """
+    return (
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (counter & 0xFFF) << 64
+        | 0b10 << 62
+        | random_bits & 0x3FFF_FFFF_FFFF_FFFF
+    )
+
+
+def uuid7():
+    """Return a new version 7 UUID, greater than any returned before by this
+    process."""
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # start low in the millisecond and leave room to count up
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x1FF
+        else:
+            # same millisecond, or the clock went back: keep counting, and
+            # borrow the next millisecond when the counter runs out
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        counter = _counter
+    random_bits = int.from_bytes(os.urandom(8), "big")
+    return uuid.UUID(int=uuid7_int(ms, counter, random_bits))
@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from catalog.archive import archive_expired
+from catalog.models import GiftInstance
+
+
+class Command(BaseCommand):
+    help = (
+        "Move gift instances whose event is long past into the archive table, "
+        "in short batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Archive instances whose event was more than this many days ago "
+            "(default 90).",
+        )
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            help="Archive instances with an event before this date (YYYY-MM-DD) "
+            "instead of using --days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Instances moved per transaction (default 1000).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches (default 0).",
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Stop after archiving about this many."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the instances that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if options["days"] < 0:
+            raise CommandError("--days cannot be negative.")
+        before = options["before"] or (
+            timezone.localdate() - timedelta(days=options["days"])
+        )
+
+        if options["dry_run"]:
+            count = GiftInstance.objects.expired(today=before).count()
+            self.stdout.write(f"{count} gift instances would be archived.")
+            return
+
+        total = archive_expired(
+            before,
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            limit=options["limit"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {total} gift instances with an event before {before}."
+            )
+        )
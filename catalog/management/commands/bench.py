@@ -0,0 +1,151 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalog import bench
+from catalog.models import Gift
+from catalog.seed import seed, sqlite_fast_load
+
+# a file rather than SQLite's in-memory test database, so that the pragmas
+# are those of production and --keepdb has something to keep
+BENCH_DATABASE = Path(settings.BASE_DIR) / "bench.sqlite3"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, bench.sqlite3, and load test every catalog "
+        "and API URL, reporting latency percentiles, throughput and queries per "
+        "request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(bench.DATASETS, key=bench.DATASETS.get),
+            default="small",
+            help="Number of gifts to seed: small 1k, medium 100k, large 1M.",
+        )
+        parser.add_argument(
+            "--instances-per-gift",
+            type=int,
+            default=3,
+            help="Average number of instances per gift (default 3).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per endpoint (default 200).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Concurrent clients (default 4).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default 0)."
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="Only benchmark this URL name (can be repeated).",
+        )
+        parser.add_argument(
+            "--ids",
+            type=int,
+            metavar="ROWS",
+            help="Instead of the URLs, compare bulk inserting ROWS uuid4 and "
+            "uuid7 primary keys: insert rate and index size.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep bench.sqlite3, and reuse it if it has the dataset.",
+        )
+        parser.add_argument(
+            "--output", "-o", help="Write the JSON report here instead of stdout."
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON report of an earlier run; fail if any endpoint regressed.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed growth of p95 latency with --compare (default 0.25).",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        if options["ids"] is not None and options["ids"] < 1:
+            raise CommandError("--ids must be positive.")
+        unknown = set(options["endpoints"] or ()) - bench.url_names()
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+        baseline = None
+        if options["compare"]:
+            baseline = json.loads(Path(options["compare"]).read_text())
+
+        # never seed the real database
+        test_settings = connection.settings_dict["TEST"]
+        old_test_name = test_settings["NAME"]
+        test_settings["NAME"] = str(BENCH_DATABASE)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            if options["ids"]:
+                report = {
+                    "meta": bench.meta(rows=options["ids"]),
+                    "ids": bench.insert_ids(options["ids"]),
+                }
+            else:
+                report = self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            test_settings["NAME"] = old_test_name
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n")
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            regressions = bench.compare(baseline, report, options["threshold"])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions."))
+
+    def benchmark(self, options):
+        gifts = bench.DATASETS[options["dataset"]]
+        if Gift.objects.count() != gifts:
+            self.stderr.write(f"Seeding {gifts} gifts")
+            # the test database is thrown away, so durability does not matter
+            with sqlite_fast_load(connection):
+                seed(
+                    gifts,
+                    instances_per_gift=options["instances_per_gift"],
+                    users=max(10, gifts // 100),
+                    seed=options["seed"],
+                    stdout=self.stderr if options["verbosity"] > 1 else None,
+                )
+        report = bench.run(
+            requests=options["requests"],
+            concurrency=options["concurrency"],
+            seed=options["seed"],
+            only=options["endpoints"],
+            stdout=self.stderr,
+        )
+        report["meta"]["dataset"] = options["dataset"]
+        return report
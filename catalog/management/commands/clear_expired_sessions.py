@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.sessions import clear_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in short batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Sessions deleted per transaction (default 1000).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches (default 0).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        total = clear_expired(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        if total is None:
+            self.stdout.write("Expired sessions cleared by the session engine.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired sessions."))
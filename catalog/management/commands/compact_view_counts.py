@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.popularity import compact
+
+
+class Command(BaseCommand):
+    help = "Fold the per-worker rows of the view counts into one row per object."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Objects folded per transaction (default 1000).",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Also delete the counts of gifts and brands that no longer exist.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        removed = compact(
+            batch_size=options["batch_size"],
+            prune=options["prune"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} view count rows."))
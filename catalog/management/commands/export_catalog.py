@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from catalog import export
+
+
+class Command(BaseCommand):
+    help = "Stream a catalog table to a file or stdout as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=sorted(export.TABLES))
+        parser.add_argument("--format", choices=export.FORMATS, default="ndjson")
+        parser.add_argument(
+            "--gzip", action="store_true", help="Compress the output with gzip."
+        )
+        parser.add_argument(
+            "--output", "-o", help="File to write to (default: stdout)."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows read from the database per query (default 2000).",
+        )
+
+    def handle(self, *args, **options):
+        chunks = export.export(
+            options["table"],
+            options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            stream = getattr(self.stdout, "buffer", None) or sys.stdout.buffer
+            for chunk in chunks:
+                stream.write(chunk)
+            stream.flush()
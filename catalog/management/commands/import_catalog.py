@@ -0,0 +1,252 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from catalog import denorm, facets, search, versions
+from catalog.models import Brand, Category, Country, Gift
+from catalog.stats import invalidate_stats
+
+GIFT_FIELDS = ["name", "description", "brand_id", "made_in_id", "updated_at"]
+TEXT_FIELDS = ["ref", "name", "description", "brand", "made_in"]
+
+
+def read_csv(path):
+    """Yield records from a CSV file with a header row.
+
+    Categories are given in one column, separated by "|".
+    """
+    with open(path, newline="", encoding="utf-8") as source:
+        for row in csv.DictReader(source):
+            categories = row.get("category") or ""
+            row["category"] = [name for name in categories.split("|") if name]
+            yield row
+
+
+def read_jsonl(path):
+    """Yield records from a file holding one JSON object per line.
+
+    A line that is not a JSON object is yielded as None, to be skipped.
+    """
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    yield None
+                    continue
+                categories = record.get("category") or []
+                if not isinstance(categories, list):
+                    categories = [categories]
+                record["category"] = categories
+                yield record
+
+
+def _text(value):
+    """Return a JSON string or number as text, and anything else as ""."""
+    return str(value) if isinstance(value, (str, int, float)) else ""
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "ndjson": read_jsonl}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream gifts from a CSV or JSONL file into the catalog, creating "
+        "brands, countries and categories by name and upserting gifts on ref."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="File format (default: taken from the file extension).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Records written per transaction (default 5000).",
+        )
+        parser.add_argument(
+            "--on-conflict",
+            choices=["update", "ignore"],
+            default="update",
+            help="What to do with gifts whose ref already exists (default update).",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording how many records have been committed.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the records already committed according to --checkpoint.",
+        )
+        parser.add_argument(
+            "--no-search-index",
+            action="store_true",
+            help="Do not index the imported gifts (run rebuild_search_index later).",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in READERS:
+            raise CommandError(f"Unknown file format '{file_format}', use --format.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if options["resume"] and not options["checkpoint"]:
+            raise CommandError("--resume needs --checkpoint.")
+
+        self.update = options["on_conflict"] == "update"
+        self.index = not options["no_search_index"]
+        self.brands = dict(Brand.objects.values_list("name", "id"))
+        self.countries = dict(Country.objects.values_list("name", "id"))
+        self.categories = dict(Category.objects.values_list("name", "id"))
+
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+        done = 0
+        if options["resume"] and checkpoint.exists():
+            done = json.loads(checkpoint.read_text())["records"]
+            self.stdout.write(f"Resuming after record {done}")
+
+        records = islice(READERS[file_format](path), done, None)
+        totals = {"created": 0, "updated": 0, "skipped": 0}
+        started = time.monotonic()
+        processed = 0
+        while True:
+            batch = list(islice(records, options["batch_size"]))
+            if not batch:
+                break
+            with transaction.atomic():
+                counts = self.write_batch(batch, first=done + processed + 1)
+            processed += len(batch)
+            for key, value in counts.items():
+                totals[key] += value
+            if checkpoint is not None:
+                checkpoint.write_text(json.dumps({"records": done + processed}))
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"{done + processed} records ({rate:.0f} records/s): "
+                f"{totals['created']} created, {totals['updated']} updated, "
+                f"{totals['skipped']} skipped"
+            )
+
+        # bulk writes send no signals
+        invalidate_stats()
+        versions.touch(Brand, Category, Country, Gift)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {processed} records in {time.monotonic() - started:.1f}s."
+            )
+        )
+
+    def resolve(self, model, cache, names):
+        """Add the ids of names to cache, creating the rows that do not exist."""
+        missing = {name for name in names if name and name not in cache}
+        if missing:
+            model.objects.bulk_create(
+                [model(name=name) for name in missing], ignore_conflicts=True
+            )
+            cache.update(
+                model.objects.filter(name__in=missing).values_list("name", "id")
+            )
+
+    def write_batch(self, batch, first):
+        gifts = {}
+        for number, record in enumerate(batch, start=first):
+            if record is None:
+                self.stderr.write(f"Record {number} skipped: it is not an object.")
+                continue
+            # JSON values may be numbers; names and refs are stored as text
+            record = {
+                **{key: _text(record.get(key)) for key in TEXT_FIELDS},
+                "category": [name for name in map(_text, record["category"]) if name],
+            }
+            ref = record["ref"].strip()
+            name = record["name"].strip()
+            if not ref or not name or len(ref) > 20:
+                self.stderr.write(
+                    f"Record {number} skipped: it needs a name and a ref of "
+                    "at most 20 characters."
+                )
+                continue
+            # a later record for the same ref wins
+            gifts[ref] = record
+        skipped = len(batch) - len(gifts)
+
+        self.resolve(Brand, self.brands, (r.get("brand") for r in gifts.values()))
+        self.resolve(
+            Country, self.countries, (r.get("made_in") for r in gifts.values())
+        )
+        self.resolve(
+            Category,
+            self.categories,
+            (name for r in gifts.values() for name in r["category"]),
+        )
+
+        existing = dict(
+            Gift.objects.filter(ref__in=list(gifts)).values_list("ref", "id")
+        )
+        if not self.update:
+            skipped += len(existing)
+            for ref in existing:
+                del gifts[ref]
+
+        before = facets.values_of(existing.values())
+        new, changed = [], []
+        now = timezone.now()
+        for ref, record in gifts.items():
+            gift = Gift(
+                id=existing.get(ref),
+                ref=ref,
+                name=record["name"].strip(),
+                description=record.get("description") or "",
+                brand_id=self.brands.get(record.get("brand")),
+                made_in_id=self.countries.get(record.get("made_in")),
+                updated_at=now,
+            )
+            (changed if gift.id else new).append(gift)
+
+        Gift.objects.bulk_create(new)
+        if changed:
+            Gift.objects.bulk_update(changed, GIFT_FIELDS)
+        ids = dict(existing)
+        if new:
+            ids.update(
+                Gift.objects.filter(ref__in=[g.ref for g in new]).values_list(
+                    "ref", "id"
+                )
+            )
+
+        # categories of updated gifts are replaced by those in the file
+        Through = Gift.category.through
+        if changed:
+            Through.objects.filter(gift_id__in=[g.id for g in changed]).delete()
+        Through.objects.bulk_create(
+            [
+                Through(gift_id=ids[ref], category_id=self.categories[name])
+                for ref, record in gifts.items()
+                for name in set(record["category"])
+            ],
+            ignore_conflicts=True,
+        )
+
+        denorm.refresh_categories(ids[ref] for ref in gifts)
+        facets.apply(before, facets.values_of(ids.values()))
+        if self.index:
+            search.index_gifts(ids[ref] for ref in gifts)
+        return {"created": len(new), "updated": len(changed), "skipped": skipped}
@@ -0,0 +1,62 @@
+import pstats
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from catalog.bench import client_host
+from giftlist.profiling import get_config, profile_call, write_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a URL through the test client under cProfile and print the "
+        "hottest functions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Path to request, e.g. /catalog/gifts/")
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Number of requests (default 20)."
+        )
+        parser.add_argument("--user", help="Username to log in as.")
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            choices=["cumulative", "tottime", "ncalls"],
+            help="pstats sort order (default cumulative).",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=25, help="Functions to print (default 25)."
+        )
+        parser.add_argument(
+            "--save",
+            action="store_true",
+            help="Also write .prof and .collapsed reports to PROFILING['DIR'].",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive.")
+        client = Client(SERVER_NAME=client_host())
+        if options["user"]:
+            try:
+                client.force_login(User.objects.get(username=options["user"]))
+            except User.DoesNotExist:
+                raise CommandError(f"No user called {options['user']}.")
+
+        # one request outside the profile to warm caches and imports
+        response = client.get(options["url"])
+        if response.status_code >= 400:
+            raise CommandError(f"{options['url']} returned {response.status_code}.")
+
+        def replay():
+            for _ in range(options["repeat"]):
+                client.get(options["url"])
+
+        _, profile, sampler = profile_call(replay)
+        stats = pstats.Stats(profile, stream=self.stdout)
+        stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+        if options["save"]:
+            path = write_report(get_config()["DIR"], "profile_view", profile, sampler)
+            self.stdout.write(f"Report written to {path}")
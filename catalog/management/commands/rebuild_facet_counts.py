@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.facets import rebuild
+
+
+class Command(BaseCommand):
+    help = "Count the categories, brands and countries of every gift again."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Gifts counted per transaction (default 1000).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        total = rebuild(
+            batch_size=options["batch_size"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Counted the facet values of {total} gifts.")
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the gift full-text search index from the Gift table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of gifts indexed per batch (default 2000).",
+        )
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index(
+            batch_size=options["batch_size"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} gifts."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.denorm import recompute
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the category names and instance counts copied onto every "
+        "gift, in short batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Gifts checked per transaction (default 1000).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches (default 0).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        totals = recompute(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {totals['checked']} gifts: fixed the category names of "
+                f"{totals['categories']} and the instance counts of "
+                f"{totals['counts']}."
+            )
+        )
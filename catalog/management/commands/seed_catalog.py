@@ -0,0 +1,80 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from catalog.models import Gift
+from catalog.seed import seed, sqlite_fast_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the catalog with deterministic synthetic gifts, brands, users and "
+        "gift instances, written in large batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--gifts", type=int, required=True, help="Number of gifts to add."
+        )
+        parser.add_argument(
+            "--instances-per-gift",
+            type=int,
+            default=3,
+            help="Average number of instances per gift (default 3).",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Number of users requesting the instances (default 100).",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default 0)."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Gifts written per transaction (default 10000).",
+        )
+        parser.add_argument(
+            "--sqlite-fast",
+            action="store_true",
+            help=(
+                "On SQLite, keep the journal in memory and skip fsync while "
+                "loading. A crash during the load can corrupt the database."
+            ),
+        )
+        parser.add_argument(
+            "--no-search-index",
+            action="store_true",
+            help="Do not index the new gifts (run rebuild_search_index later).",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("gifts", "batch_size"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        for name in ("instances_per_gift", "users"):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} cannot be negative.")
+
+        connection = connections[router.db_for_write(Gift)]
+        fast = options["sqlite_fast"]
+        with sqlite_fast_load(connection) if fast else nullcontext():
+            counts = seed(
+                options["gifts"],
+                instances_per_gift=options["instances_per_gift"],
+                users=options["users"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                index=not options["no_search_index"],
+                stdout=self.stdout if options["verbosity"] > 1 else None,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {counts['gifts']} gifts, {counts['instances']} gift "
+                f"instances, {counts['brands']} brands and {counts['users']} users."
+            )
+        )
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import bench
+from giftlist.sqlite3.base import get_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against a scratch SQLite file, "
+        "once with Django's default PRAGMAs and once with SQLITE_PRAGMAS, and "
+        "report the throughput of each as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--readers", type=int, default=4, help="Reader threads (default 4)."
+        )
+        parser.add_argument(
+            "--writers", type=int, default=2, help="Writer threads (default 2)."
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=5,
+            help="Seconds to run each configuration for (default 5).",
+        )
+        parser.add_argument(
+            "--output", "-o", help="Write the JSON report here instead of stdout."
+        )
+
+    def handle(self, *args, **options):
+        if options["readers"] < 0 or options["writers"] < 0:
+            raise CommandError("--readers and --writers cannot be negative.")
+        if options["duration"] <= 0:
+            raise CommandError("--duration must be positive.")
+        configurations = {"default": bench.SQLITE_BASELINE, "tuned": get_pragmas()}
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas in configurations.items():
+                results[name] = bench.sqlite_locks(
+                    Path(directory) / f"{name}.sqlite3",
+                    pragmas,
+                    readers=options["readers"],
+                    writers=options["writers"],
+                    duration=options["duration"],
+                )
+                self.stderr.write(f"{name}: {results[name]}")
+        report = {
+            "meta": bench.meta(
+                readers=options["readers"],
+                writers=options["writers"],
+                duration=options["duration"],
+                sqlite=sqlite3.sqlite_version,
+            ),
+            "pragmas": configurations,
+            "results": results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n")
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from giftlist.replicas import get_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database over its replicas, for trying out "
+        "read replicas locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Replica to copy to (can be repeated; default all in "
+            "DATABASE_REPLICAS).",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["databases"] or get_replicas()
+        if not aliases:
+            raise CommandError("No replicas: set DATABASE_REPLICAS or --database.")
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias == DEFAULT_DB_ALIAS or alias not in connections.databases:
+                raise CommandError(f"{alias!r} is not a replica in DATABASES.")
+            target = connections[alias]
+            if source.vendor != "sqlite" or target.vendor != "sqlite":
+                raise CommandError(
+                    "Only SQLite files can be copied; other databases replicate "
+                    "themselves."
+                )
+            source.ensure_connection()
+            target.ensure_connection()
+            # the online backup API copies a consistent snapshot page by page
+            source.connection.backup(target.connection)
+            self.stdout.write(self.style.SUCCESS(f"Copied the database to {alias}."))
@@ -0,0 +1,89 @@
+from django.db import migrations
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE catalog_giftsearch USING fts5(
+    name, description, brand, category, tokenize = 'porter unicode61'
+)
+"""
+
+POSTGRESQL_CREATE = [
+    """
+    CREATE TABLE catalog_giftsearch (
+        gift_id bigint PRIMARY KEY REFERENCES catalog_gift (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX catalog_giftsearch_document ON catalog_giftsearch USING GIN (document)",
+]
+
+# copied from catalog.search as it was, so later changes there cannot alter
+# this migration
+SQLITE_INSERT = """
+INSERT INTO catalog_giftsearch (rowid, name, description, brand, category)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+POSTGRESQL_INSERT = """
+INSERT INTO catalog_giftsearch (gift_id, document) VALUES (%s,
+    setweight(to_tsvector('english', %s), 'A') ||
+    setweight(to_tsvector('english', %s), 'D') ||
+    setweight(to_tsvector('english', %s), 'B') ||
+    setweight(to_tsvector('english', %s), 'C'))
+ON CONFLICT (gift_id) DO UPDATE SET document = EXCLUDED.document
+"""
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_CREATE)
+        insert = SQLITE_INSERT
+    elif vendor == "postgresql":
+        for statement in POSTGRESQL_CREATE:
+            schema_editor.execute(statement)
+        insert = POSTGRESQL_INSERT
+    else:
+        return
+
+    # index whatever is already in the table, using the migration state models
+    Gift = apps.get_model("catalog", "Gift")
+    gifts = (
+        Gift.objects.using(schema_editor.connection.alias)
+        .select_related("brand")
+        .prefetch_related("category")
+        .order_by("pk")
+    )
+    last_id = 0
+    while True:
+        batch = list(gifts.filter(pk__gt=last_id)[:2000])
+        if not batch:
+            break
+        rows = [
+            (
+                gift.pk,
+                gift.name,
+                gift.description,
+                gift.brand.name if gift.brand else "",
+                " ".join(category.name for category in gift.category.all()),
+            )
+            for gift in batch
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(insert, rows)
+        last_id = batch[-1].pk
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_giftsearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0020_alter_gift_category"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
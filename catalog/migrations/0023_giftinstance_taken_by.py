@@ -0,0 +1,21 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0022_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='giftinstance',
+            name='taken_by',
+            field=models.ForeignKey(blank=True, help_text='Who is buying this gift', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taken_gifts', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
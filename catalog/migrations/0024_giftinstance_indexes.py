@@ -0,0 +1,42 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0023_giftinstance_taken_by'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='giftinstance',
+            name='gift',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.RESTRICT, to='catalog.gift'),
+        ),
+        migrations.AlterField(
+            model_name='giftinstance',
+            name='requester',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='giftinstance',
+            index=models.Index(fields=['requester', 'event_date', 'id'], name='gi_requester_event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftinstance',
+            index=models.Index(fields=['gift', 'status'], name='gi_gift_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftinstance',
+            index=models.Index(condition=models.Q(('status', 'a')), fields=['event_date'], name='gi_available_event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftinstance',
+            index=models.Index(fields=['event_date'], name='gi_event_date_idx'),
+        ),
+    ]
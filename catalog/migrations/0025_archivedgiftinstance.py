@@ -0,0 +1,30 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0024_giftinstance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGiftInstance',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('gift_id', models.BigIntegerField(null=True)),
+                ('event_date', models.DateField(null=True)),
+                ('size', models.TextField(default='')),
+                ('colour', models.CharField(default='', max_length=400)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('url', models.URLField(default='')),
+                ('requester_id', models.IntegerField(null=True)),
+                ('status', models.CharField(default='a', max_length=1)),
+                ('taken_by_id', models.IntegerField(null=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:19
+
+import catalog.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0025_archivedgiftinstance'),
+    ]
+
+    # The default is applied by Django, not stored in the database, so only
+    # the migration state changes. Existing uuid4 ids stay as they are, and
+    # SQLite does not rebuild the table.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='giftinstance',
+                    name='id',
+                    field=models.UUIDField(default=catalog.ids.uuid7, help_text='Unique ID for this specific gift requested by a single user', primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
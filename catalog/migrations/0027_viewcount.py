@@ -0,0 +1,27 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0026_giftinstance_uuid7'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('views', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='viewcount',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'shard'), name='viewcount_unique'),
+        ),
+    ]
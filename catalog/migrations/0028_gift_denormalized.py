@@ -0,0 +1,74 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill(apps, schema_editor):
+    """Copy every gift's category names and instance counts onto it."""
+    using = schema_editor.connection.alias
+    Gift = apps.get_model("catalog", "Gift")
+    GiftInstance = apps.get_model("catalog", "GiftInstance")
+    Through = Gift.category.through
+
+    def instances(status):
+        return Coalesce(
+            Subquery(
+                GiftInstance.objects.filter(gift=OuterRef("pk"), status=status)
+                .order_by()
+                .values("gift")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+    Gift.objects.using(using).update(
+        available_count=instances("a"), taken_count=instances("t")
+    )
+    gifts = Gift.objects.using(using).order_by("pk").only("pk")
+    last_id = 0
+    while True:
+        batch = list(gifts.filter(pk__gt=last_id)[:500])
+        if not batch:
+            break
+        names = {gift.pk: [] for gift in batch}
+        rows = (
+            Through.objects.using(using)
+            .filter(gift_id__in=names)
+            .order_by("category__name")
+            .values_list("gift_id", "category__name")
+        )
+        for gift_id, name in rows:
+            names[gift_id].append(name)
+        for gift in batch:
+            gift.category_names = names[gift.pk]
+        Gift.objects.using(using).bulk_update(batch, ["category_names"])
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0027_viewcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gift',
+            name='available_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gift',
+            name='category_names',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gift',
+            name='taken_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 3.2.4 on 2026-10-17 20:47
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def contributions(values):
+    # copied from catalog.facets as it was, so later changes there cannot
+    # alter this migration: each value counts with no filter ("", 0) and
+    # with every other value of the gift as the filter
+    keys = [("", 0, *value) for value in values]
+    keys += [(*other, *value) for other in values for value in values - {other}]
+    return keys
+
+
+def fill(apps, schema_editor):
+    """Count the facet values of the gifts already in the catalog."""
+    using = schema_editor.connection.alias
+    Gift = apps.get_model("catalog", "Gift")
+    FacetCount = apps.get_model("catalog", "FacetCount")
+    gifts = Gift.objects.using(using).order_by("pk")
+    links = Gift.category.through.objects.using(using)
+    counts = Counter()
+    last_id = 0
+    while True:
+        batch = gifts.filter(pk__gt=last_id)[:2000]
+        rows = list(batch.values_list("pk", "brand_id", "made_in_id"))
+        if not rows:
+            break
+        values = {}
+        for pk, brand_id, made_in_id in rows:
+            values[pk] = {("brand", brand_id), ("made_in", made_in_id)}
+            values[pk] -= {("brand", None), ("made_in", None)}
+        pairs = links.filter(gift_id__in=values).values_list("gift_id", "category_id")
+        for gift_id, category_id in pairs:
+            values[gift_id].add(("category", category_id))
+        for gift_values in values.values():
+            counts.update(contributions(gift_values))
+        last_id = rows[-1][0]
+    FacetCount.objects.using(using).bulk_create(
+        [
+            FacetCount(
+                filter_facet=filter_facet,
+                filter_value=filter_value,
+                facet=facet,
+                value_id=value_id,
+                gifts=gifts,
+            )
+            for (filter_facet, filter_value, facet, value_id), gifts in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0028_gift_denormalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_facet', models.CharField(blank=True, max_length=20)),
+                ('filter_value', models.BigIntegerField(default=0)),
+                ('facet', models.CharField(max_length=20)),
+                ('value_id', models.BigIntegerField()),
+                ('gifts', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='facetcount',
+            index=models.Index(fields=['filter_facet', 'filter_value', 'facet', '-gifts'], name='facetcount_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('filter_facet', 'filter_value', 'facet', 'value_id'), name='facetcount_unique'),
+        ),
+        migrations.RunPython(fill, migrations.RunPython.noop),
+    ]
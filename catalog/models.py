@@ -1,9 +1,12 @@
-import uuid  # Required for unique book instances
 from datetime import date
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Case, Q, When
 from django.urls import reverse
+from django.utils import timezone
+
+from catalog.ids import uuid7
 
 
 class Category(models.Model):
@@ -14,6 +17,10 @@ class Category(models.Model):
         unique = True
     )
 
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When this record was last changed"
+    )
+
     class Meta:
         ordering = ["name"]
 
@@ -44,14 +51,37 @@ class Gift(models.Model):
 
     made_in = models.ForeignKey("Country", on_delete=models.RESTRICT, null=True)
 
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When this record was last changed"
+    )
+
+    # copies of related data so lists render from the gift row alone; written
+    # only by catalog.denorm
+    category_names = models.JSONField(default=list, editable=False)
+    available_count = models.PositiveIntegerField(default=0, editable=False)
+    taken_count = models.PositiveIntegerField(default=0, editable=False)
+
+    DENORMALIZED_FIELDS = ("category_names", "available_count", "taken_count")
+
     class Meta:
         ordering = [
             "id"
         ]  # this orders the database and avoids ordering warnings related to pagination
 
+    def save(self, *args, **kwargs):
+        # never write back copies that may have changed since this gift was read
+        adding = self._state.adding or kwargs.get("force_insert")
+        if not adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def display_category(self):
         """Create a string for the Category. This is required to display categories in Admin."""
-        return ", ".join(category.name for category in self.category.all()[:3])
+        return ", ".join(self.category_names[:3])
 
     display_category.short_description = "Category"
 
@@ -64,15 +94,42 @@ class Gift(models.Model):
         return reverse("gift-detail", args=[str(self.id)])
 
 
+class GiftInstanceQuerySet(models.QuerySet):
+    """Expiry worked out by the database rather than row by row in Python.
+
+    An instance expires once its event date has passed. Instances without an
+    event date never expire. today defaults to the current local date.
+    """
+
+    def active(self, today=None):
+        today = today or timezone.localdate()
+        return self.filter(Q(event_date__gte=today) | Q(event_date__isnull=True))
+
+    def expired(self, today=None):
+        return self.filter(event_date__lt=today or timezone.localdate())
+
+    def with_expiry(self, today=None):
+        """Annotate each instance with an "expired" boolean."""
+        return self.annotate(
+            expired=Case(
+                When(event_date__lt=today or timezone.localdate(), then=True),
+                default=False,
+                output_field=models.BooleanField(),
+            )
+        )
+
+
 class GiftInstance(models.Model):
     """Model representing a specific size or colour of a gift that appear on lists (i.e. that can be taken by a buyer)."""
 
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         help_text="Unique ID for this specific gift requested by a single user",
     )
-    gift = models.ForeignKey("Gift", on_delete=models.RESTRICT, null=True)
+    gift = models.ForeignKey(
+        "Gift", on_delete=models.RESTRICT, null=True, db_index=False
+    )
     event_date = models.DateField(null=True, blank=True)
     size = models.TextField(
         max_length=1000,
@@ -91,9 +148,11 @@ class GiftInstance(models.Model):
 
     # on_delete setting may change between dev and production
     requester = models.ForeignKey(
-        User, on_delete=models.SET_NULL, null=True, blank=True
+        User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False
     )
 
+    objects = GiftInstanceQuerySet.as_manager()
+
     @property
     def is_expired(self):
         if date.today() > self.event_date:
@@ -113,8 +172,41 @@ class GiftInstance(models.Model):
         help_text="Gift availability",
     )
 
+    # set and cleared by catalog.claims together with status
+    taken_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="taken_gifts",
+        help_text="Who is buying this gift",
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When this record was last changed"
+    )
+
     class Meta:
         ordering = ["id"]
+        # designed from the hot queries; the composite indexes lead with the
+        # foreign keys, so these do without their own single column indexes
+        indexes = [
+            # "my gifts": requester=, ordered by event_date then id
+            models.Index(
+                fields=["requester", "event_date", "id"],
+                name="gi_requester_event_date_idx",
+            ),
+            # instances of a gift, optionally only available or taken ones
+            models.Index(fields=["gift", "status"], name="gi_gift_status_idx"),
+            # available instances by date; small, as taken ones are left out
+            models.Index(
+                fields=["event_date"],
+                condition=models.Q(status="a"),
+                name="gi_available_event_date_idx",
+            ),
+            # admin date filter and expiry
+            models.Index(fields=["event_date"], name="gi_event_date_idx"),
+        ]
 
     def __str__(self):
         """String for representing the GiftInstance object."""
@@ -131,6 +223,10 @@ class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
     est = models.IntegerField(null=True, blank=True)
 
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When this record was last changed"
+    )
+
     class Meta:
         ordering = ["name"]
 
@@ -151,8 +247,97 @@ class Country(models.Model):
         unique=True,
     )
 
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When this record was last changed"
+    )
+
     class Meta:
         ordering = ["name"]
 
     def __str__(self):
         return self.name
+
+
+class ArchivedGiftInstance(models.Model):
+    """A gift instance whose event is long past, moved out of the live table.
+
+    Written only by the archive_expired command. References are kept as plain
+    ids without constraints or indexes, so the archive stays cheap to append
+    to and never stops a gift or user from being deleted.
+    """
+
+    id = models.UUIDField(primary_key=True)
+    gift_id = models.BigIntegerField(null=True)
+    event_date = models.DateField(null=True)
+    size = models.TextField(default="")
+    colour = models.CharField(max_length=400, default="")
+    price = models.DecimalField(max_digits=10, default=0.00, decimal_places=2)
+    url = models.URLField(default="")
+    requester_id = models.IntegerField(null=True)
+    status = models.CharField(max_length=1, default="a")
+    taken_by_id = models.IntegerField(null=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.id} {self.event_date}"
+
+
+class ViewCount(models.Model):
+    """How many times the page of a gift or brand has been viewed.
+
+    Written only by the buffers in catalog/popularity.py. Each worker adds
+    to its own shard row so that workers never wait on each other, and the
+    compact_view_counts command later folds the shards into shard 0. The
+    object is a plain id, so counting never blocks deleting a gift.
+    """
+
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    views = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id", "shard"], name="viewcount_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.views}"
+
+
+class FacetCount(models.Model):
+    """How many gifts have a facet value, among the gifts with another value.
+
+    The facets are a gift's categories, its brand and its country (made_in).
+    A row counts the gifts having both its filter value and its value; rows
+    with an empty filter_facet count every gift with the value. Written only
+    by catalog/facets.py. Values are plain ids, so counting never blocks
+    deleting a category.
+    """
+
+    filter_facet = models.CharField(max_length=20, blank=True)
+    filter_value = models.BigIntegerField(default=0)
+    facet = models.CharField(max_length=20)
+    value_id = models.BigIntegerField()
+    gifts = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filter_facet", "filter_value", "facet", "value_id"],
+                name="facetcount_unique",
+            )
+        ]
+        indexes = [
+            # the values of a facet with the most gifts, given a filter
+            models.Index(
+                fields=["filter_facet", "filter_value", "facet", "-gifts"],
+                name="facetcount_top_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.facet} {self.value_id}: {self.gifts}"
@@ -0,0 +1,195 @@
+"""Keyset (cursor) pagination for the catalog list views.
+
+Offset pagination has to skip every row before the requested page and count
+the whole table to know how many pages there are. Keyset pagination instead
+remembers the ordering key of the last row shown and seeks straight past it,
+so every page costs the same however deep it is. The cursor handed to the
+client is an opaque, URL-safe encoding of that key.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(payload, dict):
+        raise InvalidCursor(cursor)
+    return payload
+
+
+class KeysetPage:
+    """One page of results, with the cursors of its neighbouring pages."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking on the given ordering keys.
+
+    The last key must be unique so that every row has a distinct position.
+    Nullable keys sort NULLs first on every database backend.
+    """
+
+    def __init__(self, queryset, keys, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        opts = queryset.model._meta
+        self.fields = [opts.get_field(key) for key in keys]
+
+    def _order_by(self, backwards):
+        ordering = []
+        for field in self.fields:
+            expression = F(field.attname)
+            if backwards:
+                ordering.append(expression.desc(nulls_last=field.null))
+            else:
+                ordering.append(expression.asc(nulls_first=field.null))
+        return ordering
+
+    def _after(self, values, backwards):
+        """Q matching the rows that come after values in the walk direction."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.fields, values):
+            name = field.attname
+            if value is None:
+                # NULL is the smallest value of a nullable key
+                beyond = Q(pk__in=[]) if backwards else Q(**{f"{name}__isnull": False})
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if backwards else "gt"
+                beyond = Q(**{f"{name}__{lookup}": value})
+                if backwards and field.null:
+                    beyond |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            condition |= equal & beyond
+            equal &= same
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def _cursor(self, obj, backwards):
+        return encode_cursor(
+            {"k": self._values(obj), "b": backwards, "s": self.per_page}
+        )
+
+    def page(self, cursor=None):
+        """Return the page that starts after (or, walking back, before) cursor."""
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            payload = decode_cursor(cursor)
+            values = payload.get("k")
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            try:
+                values = [
+                    field.to_python(value) for field, value in zip(self.fields, values)
+                ]
+            except ValidationError:
+                raise InvalidCursor(cursor)
+            backwards = bool(payload.get("b"))
+            queryset = queryset.filter(self._after(values, backwards))
+
+        rows = list(
+            queryset.order_by(*self._order_by(backwards))[: self.per_page + 1]
+        )
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if more or backwards:
+                next_cursor = self._cursor(rows[-1], backwards=False)
+            if (more and backwards) or (cursor and not backwards):
+                previous_cursor = self._cursor(rows[0], backwards=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """Give a ListView keyset pagination on keyset_ordering.
+
+    Requests with a ?page= parameter, or every request when
+    CATALOG_PAGINATION is "offset", keep using Django's offset paginator.
+    ?page_size= overrides paginate_by up to CATALOG_MAX_PAGE_SIZE.
+    """
+
+    keyset_ordering = ("id",)
+    cursor_kwarg = "cursor"
+    page_size_kwarg = "page_size"
+
+    def get_paginate_by(self, queryset):
+        page_size = super().get_paginate_by(queryset)
+        requested = self.request.GET.get(self.page_size_kwarg)
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if cursor and not requested:
+            try:
+                requested = decode_cursor(cursor).get("s")
+            except InvalidCursor:
+                pass  # reported by paginate_queryset
+        if requested:
+            try:
+                page_size = int(requested)
+            except (TypeError, ValueError):
+                raise Http404("Invalid page size.")
+        if page_size is not None:
+            max_size = getattr(settings, "CATALOG_MAX_PAGE_SIZE", 100)
+            page_size = max(1, min(page_size, max_size))
+        return page_size
+
+    def use_keyset(self):
+        if getattr(settings, "CATALOG_PAGINATION", "keyset") != "keyset":
+            return False
+        return self.page_kwarg not in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, self.keyset_ordering, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,240 @@
+"""Buffered page view counts for gifts and brands.
+
+An UPDATE on every hit would make all requests for a popular gift wait on
+the same row. Instead each worker process adds views to an in-memory buffer.
+The buffer is written with one multi-row upsert once it holds FLUSH_SIZE
+views, or when FLUSH_INTERVAL seconds have passed since the last write. The
+write runs from the request_finished signal, after the response has been
+sent, so no request waits for it and it does not count against a view's
+query budget. Each worker writes to its own shard rows, so workers do not
+block each other either. Views still buffered when a worker stops are lost,
+which is acceptable for popularity figures.
+
+Settings live in the VIEW_COUNTS dict:
+
+ENABLED         count views at all (default True)
+FLUSH_INTERVAL  seconds between writes (default 10)
+FLUSH_SIZE      also write once this many views are buffered (default 1000)
+SHARDS          rows each object is spread over between compactions
+                (default 16)
+CACHE_TIMEOUT   seconds the most viewed lists are cached for (default 60)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Sum
+from django.dispatch import receiver
+
+from catalog.budgets import uncounted
+from catalog.counters import add_counts
+from catalog.models import Brand, Gift, ViewCount
+from giftlist.retry import retry_on_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "FLUSH_INTERVAL": 10,
+    "FLUSH_SIZE": 1000,
+    "SHARDS": 16,
+    "CACHE_TIMEOUT": 60,
+}
+
+MODELS = (Gift, Brand)
+COLUMNS = ("kind", "object_id", "shard", "views")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "VIEW_COUNTS", {})}
+
+
+def kind_of(model):
+    return model._meta.model_name
+
+
+def worker_shard():
+    return os.getpid() % get_config()["SHARDS"]
+
+
+@retry_on_lock
+def upsert(counts, shard, using=None):
+    """Add counts, a mapping of (kind, object_id) to views, to shard's rows.
+
+    Runs one INSERT ... ON CONFLICT statement for as many rows as the
+    database accepts in a single statement.
+    """
+    rows = [
+        (kind, object_id, shard, views)
+        for (kind, object_id), views in counts.items()
+        if views
+    ]
+    using = using or router.db_for_write(ViewCount)
+    add_counts(ViewCount, COLUMNS[:-1], COLUMNS[-1], rows, using)
+
+
+class ViewBuffer:
+    """The view counts of one worker that have not been written yet."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, model, pk, views=1):
+        with self._lock:
+            self._counts[kind_of(model), int(pk)] += views
+            self._pending += views
+
+    def due(self, config):
+        """Return whether the buffer should be written now."""
+        return self._pending > 0 and (
+            self._pending >= config["FLUSH_SIZE"]
+            or time.monotonic() - self._last_flush >= config["FLUSH_INTERVAL"]
+        )
+
+    def take(self):
+        """Empty the buffer and return what it held."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+        return counts
+
+    def flush(self, shard=None):
+        """Write the buffered views and return how many there were.
+
+        On a database error the views go back into the buffer for the next
+        flush and the error is raised.
+        """
+        counts = self.take()
+        if not counts:
+            return 0
+        try:
+            upsert(counts, worker_shard() if shard is None else shard)
+        except DatabaseError:
+            with self._lock:
+                self._counts.update(counts)
+                self._pending += sum(counts.values())
+            raise
+        return sum(counts.values())
+
+
+buffer = ViewBuffer()
+
+
+@receiver(request_finished)
+def flush_when_due(sender, **kwargs):
+    config = get_config()
+    if not config["ENABLED"] or not buffer.due(config):
+        return
+    # never write inside a transaction someone else opened, such as a test's
+    if connections[router.db_for_write(ViewCount)].in_atomic_block:
+        return
+    try:
+        buffer.flush()
+    except DatabaseError:
+        logger.warning("Could not write view counts", exc_info=True)
+
+
+def counts_views(model):
+    """Decorate the get() of a detail view of model to count its views.
+
+    A view is counted for every 200 or 304 response.
+    """
+
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            response = get(view, request, *args, **kwargs)
+            if response.status_code in (200, 304) and get_config()["ENABLED"]:
+                buffer.add(model, kwargs["pk"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def most_viewed(model, limit=10):
+    """Return up to limit objects of model, most viewed first.
+
+    Each object has a views attribute. The list is cached for CACHE_TIMEOUT
+    seconds, so it costs no queries in steady state.
+    """
+    key = f"catalog:most_viewed:{kind_of(model)}:{limit}"
+    objects = cache.get(key)
+    if objects is None:
+        with uncounted():
+            totals = list(
+                ViewCount.objects.filter(kind=kind_of(model))
+                .values_list("object_id")
+                .annotate(total=Sum("views"))
+                .order_by("-total", "object_id")[:limit]
+            )
+            found = model.objects.in_bulk([pk for pk, _ in totals])
+        objects = []
+        for pk, views in totals:
+            # counts of deleted objects stay until compact_view_counts --prune
+            if pk in found:
+                found[pk].views = views
+                objects.append(found[pk])
+        cache.set(key, objects, get_config()["CACHE_TIMEOUT"])
+    return objects
+
+
+def compact(batch_size=1000, prune=False, stdout=None):
+    """Fold every object's shard rows into its row for shard 0.
+
+    Each batch of objects is one short transaction. The rows folded are
+    locked and deleted by primary key, so views flushed meanwhile are never
+    lost: they either wait for the lock or go into a new row, which the next
+    run folds in. With prune, the counts of gifts and brands that no longer
+    exist are deleted as well. Returns the number of rows removed.
+    """
+    using = router.db_for_write(ViewCount)
+    counters = ViewCount.objects.using(using)
+    removed = 0
+    for model in MODELS:
+        kind = kind_of(model)
+        while True:
+            with transaction.atomic(using=using):
+                ids = list(
+                    counters.filter(kind=kind)
+                    .exclude(shard=0)
+                    .values_list("object_id", flat=True)
+                    .distinct()[:batch_size]
+                )
+                if not ids:
+                    break
+                rows = list(
+                    counters.select_for_update()
+                    .filter(kind=kind, object_id__in=ids)
+                    .exclude(shard=0)
+                    .values_list("pk", "object_id", "views")
+                )
+                totals = Counter()
+                for _, object_id, views in rows:
+                    totals[kind, object_id] += views
+                counters.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+                upsert(totals, 0, using)
+            removed += len(rows)
+            if stdout is not None:
+                stdout.write(f"Folded {removed} view count rows")
+        if prune:
+            deleted, _ = (
+                counters.filter(kind=kind)
+                .exclude(object_id__in=model.objects.values("pk"))
+                .delete()
+            )
+            removed += deleted
+    return removed
@@ -0,0 +1,203 @@
+"""Full-text search over gifts.
+
+Each gift is indexed as one document made of its name, description, brand
+name and category names. On SQLite the index is an FTS5 virtual table and on
+PostgreSQL a weighted tsvector column with a GIN index; both are created by
+migration 0021. Other database backends fall back to a LIKE scan.
+"""
+
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from catalog.models import Gift
+
+TABLE = "catalog_giftsearch"
+
+# relative weight of the name, description, brand and category columns
+SQLITE_WEIGHTS = (10.0, 1.0, 5.0, 3.0)
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _connection():
+    return connections[router.db_for_write(Gift)]
+
+
+def _backend(connection):
+    if connection.vendor in ("sqlite", "postgresql"):
+        return connection.vendor
+    return None
+
+
+def gift_documents(gifts):
+    """Yield (id, name, description, brand, categories) rows for indexing.
+
+    The gifts should have their brand selected and categories prefetched.
+    """
+    for gift in gifts:
+        yield (
+            gift.pk,
+            gift.name,
+            gift.description,
+            gift.brand.name if gift.brand else "",
+            " ".join(category.name for category in gift.category.all()),
+        )
+
+
+def _write(connection, rows):
+    rows = list(rows)
+    if not rows:
+        return
+    backend = _backend(connection)
+    with connection.cursor() as cursor:
+        if backend == "sqlite":
+            cursor.executemany(
+                f"INSERT INTO {TABLE} "
+                "(rowid, name, description, brand, category) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+        elif backend == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (gift_id, document) VALUES (%s, "
+                "setweight(to_tsvector('english', %s), 'A') || "
+                "setweight(to_tsvector('english', %s), 'D') || "
+                "setweight(to_tsvector('english', %s), 'B') || "
+                "setweight(to_tsvector('english', %s), 'C')) "
+                "ON CONFLICT (gift_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def _chunks(ids, size=500):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def index_gifts(gift_ids):
+    """(Re)index the given gifts, dropping any that no longer exist."""
+    connection = _connection()
+    if _backend(connection) is None:
+        return
+    for chunk in _chunks(gift_ids):
+        remove_gifts(chunk)
+        gifts = (
+            Gift.objects.filter(pk__in=chunk)
+            .select_related("brand")
+            .prefetch_related("category")
+        )
+        _write(connection, gift_documents(gifts))
+
+
+def add_documents(rows):
+    """Index gifts from (id, name, description, brand, categories) rows.
+
+    For bulk loaders that already have the text at hand, so the gifts need
+    not be read back from the database.
+    """
+    connection = _connection()
+    if _backend(connection) is not None:
+        rows = list(rows)
+        remove_gifts(row[0] for row in rows)
+        _write(connection, rows)
+
+
+def remove_gifts(gift_ids):
+    """Drop the given gifts from the index."""
+    connection = _connection()
+    backend = _backend(connection)
+    if backend is None:
+        return
+    key = "rowid" if backend == "sqlite" else "gift_id"
+    with connection.cursor() as cursor:
+        for chunk in _chunks(gift_ids):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE {key} IN ({placeholders})", chunk
+            )
+
+
+def rebuild_index(batch_size=2000, stdout=None):
+    """Rebuild the whole index from the Gift table in batches of batch_size.
+
+    Returns the number of gifts indexed.
+    """
+    connection = _connection()
+    backend = _backend(connection)
+    if backend is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+    total = 0
+    last_id = 0
+    queryset = (
+        Gift.objects.select_related("brand")
+        .prefetch_related("category")
+        .order_by("pk")
+    )
+    while True:
+        batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        _write(connection, gift_documents(batch))
+        last_id = batch[-1].pk
+        total += len(batch)
+        if stdout is not None:
+            stdout.write(f"Indexed {total} gifts")
+
+    if backend == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _fts5_query(text):
+    """Turn free text into an FTS5 query that matches every word as a prefix.
+
+    Each word is quoted so that user input can never be parsed as FTS5 syntax.
+    """
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(text))
+
+
+def search_ids(text, limit=50):
+    """Return the ids of the gifts best matching text, best match first."""
+    if not WORD_RE.search(text or ""):
+        return []
+    connection = _connection()
+    backend = _backend(connection)
+
+    if backend == "sqlite":
+        sql = (
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, %s, %s, %s, %s) LIMIT %s"
+        )
+        params = [_fts5_query(text), *SQLITE_WEIGHTS, limit]
+    elif backend == "postgresql":
+        sql = (
+            f"SELECT gift_id FROM {TABLE}, "
+            "plainto_tsquery('english', %s) query WHERE document @@ query "
+            "ORDER BY ts_rank(document, query) DESC LIMIT %s"
+        )
+        params = [text, limit]
+    else:
+        words = WORD_RE.findall(text)
+        queryset = Gift.objects.all()
+        for word in words:
+            queryset = queryset.filter(
+                Q(name__icontains=word) | Q(description__icontains=word)
+            )
+        return list(queryset.values_list("pk", flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_gifts(text, limit=50):
+    """Return the Gift objects best matching text, best match first."""
+    ids = search_ids(text, limit)
+    gifts = Gift.objects.select_related("brand").in_bulk(ids)
+    return [gifts[pk] for pk in ids if pk in gifts]
@@ -0,0 +1,282 @@
+"""Deterministic synthetic catalog data for benchmarks and load tests.
+
+The same arguments always produce the same rows. Fan-out is skewed the way
+real catalogs are: a few brands own most of the gifts, gifts have one to
+three categories and a varying number of instances spread over past and
+future event dates.
+
+Users, brands and gifts are written with bulk_create. Gift instances and
+gift categories, which outnumber them, are written with a plain executemany
+of ready-made rows: building a model instance per row and compiling it
+costs several times more than the insert itself. No signals are sent, so the
+search index, stats, facet counts and change stamps are updated here, and
+each gift's copied category names and instance counts are filled in as it is
+built.
+"""
+
+import random as _random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from catalog import facets, search, versions
+from catalog.ids import uuid7_int
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+from catalog.stats import invalidate_stats
+
+COUNTRIES = [
+    "Australia", "Bangladesh", "Brazil", "Canada", "China", "Denmark",
+    "France", "Germany", "India", "Indonesia", "Italy", "Japan", "Mexico",
+    "Netherlands", "Poland", "Portugal", "South Korea", "Spain", "Sweden",
+    "Switzerland", "Taiwan", "Thailand", "Turkey", "UK", "USA", "Vietnam",
+]  # fmt: skip
+
+CATEGORIES = [
+    "Art", "Audio", "Baby", "Books", "Cameras", "Clothes", "Computers",
+    "Cooking", "Crafts", "Electronics", "Fitness", "Games", "Garden",
+    "Home", "Jewellery", "Kitchen", "Music", "Outdoors", "Pets", "Phones",
+    "Shoes", "Sports", "Stationery", "Tools", "Toys", "Travel", "Watches",
+]  # fmt: skip
+
+WORDS = [
+    "classic", "compact", "deluxe", "digital", "electric", "folding",
+    "handmade", "leather", "light", "mini", "portable", "pro", "smart",
+    "solar", "steel", "travel", "vintage", "waterproof", "wireless", "wooden",
+]  # fmt: skip
+
+NOUNS = [
+    "backpack", "blender", "camera", "chair", "headphones", "jacket", "kettle",
+    "keyboard", "lamp", "laptop", "mug", "notebook", "phone", "scarf",
+    "speaker", "telescope", "trainers", "umbrella", "watch", "wallet",
+]  # fmt: skip
+
+# instance keys count up from 2021-01-01 00:00 UTC, plus a millisecond for
+# every gift id used before the run, so seeding again never reuses a key
+SEED_EPOCH_MS = 1_609_459_200_000
+
+COLOURS = ["black", "blue", "green", "grey", "red", "white", "yellow", ""]
+SIZES = ["XS", "S", "M", "L", "XL", "one size", ""]
+
+
+def _ensure_named(model, names):
+    """Create the rows of names that are missing and return {name: id}."""
+    model.objects.bulk_create(
+        [model(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(model.objects.filter(name__in=names).values_list("name", "id"))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def _insert_sql(connection, model, fields):
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    return (
+        f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+        f"VALUES ({placeholders})"
+    )
+
+
+@contextmanager
+def sqlite_fast_load(connection):
+    """Trade durability for speed while loading into SQLite.
+
+    The rollback journal is kept in memory and nothing is synced to disk, so
+    a crash during the load can corrupt the database. Does nothing on other
+    databases, or inside a transaction, where SQLite refuses the change.
+    """
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+        cursor.execute("PRAGMA synchronous")
+        synchronous = cursor.fetchone()[0]
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        # negative sizes are in KiB: 256 MiB of page cache
+        cursor.execute("PRAGMA cache_size = -262144")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            cursor.execute(f"PRAGMA synchronous = {synchronous}")
+
+
+def seed(
+    gifts,
+    instances_per_gift=3,
+    users=10,
+    seed=0,
+    batch_size=10000,
+    index=True,
+    stdout=None,
+):
+    """Add gifts (and their brands, users and instances) to the catalog.
+
+    Each gift gets between 0 and 2 * instances_per_gift instances, so there
+    are about gifts * instances_per_gift in total. Every batch_size gifts are
+    written in one transaction together with their categories and instances.
+    Returns a dict of counts.
+    """
+    rng = _random.Random(seed)
+    random = rng.random
+
+    def pick(values):
+        # faster than rng.choice, which matters for millions of instances
+        return values[int(random() * len(values))]
+
+    connection = connections[router.db_for_write(Gift)]
+    ops = connection.ops
+    started = time.monotonic()
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(f"{message} ({time.monotonic() - started:.1f}s)")
+
+    countries = list(_ensure_named(Country, COUNTRIES).values())
+    category_names = _ensure_named(Category, CATEGORIES)
+    categories = list(category_names.items())
+
+    with transaction.atomic(using=connection.alias):
+        first_user = _next_id(User)
+        User.objects.bulk_create(
+            [
+                # "!" is Django's marker for an unusable password
+                User(id=first_user + n, username=f"seed-{first_user + n}", password="!")
+                for n in range(users)
+            ],
+            batch_size=batch_size,
+        )
+        requesters = list(range(first_user, first_user + users)) or [None]
+
+        # roughly one brand per 20 gifts, with Zipf-like popularity
+        first_brand = _next_id(Brand)
+        brand_count = max(1, gifts // 20)
+        brands = [
+            Brand(id=first_brand + n, name=f"Brand {first_brand + n}")
+            for n in range(brand_count)
+        ]
+        for brand in brands:
+            brand.est = rng.randint(1850, 2020)
+        Brand.objects.bulk_create(brands, batch_size=batch_size)
+        brand_weights = list(accumulate(1 / (n + 1) for n in range(brand_count)))
+    log(f"{users} users, {brand_count} brands")
+
+    # values are converted for the database once, not once per row
+    today = date.today()
+    dates = [
+        ops.adapt_datefield_value(today + timedelta(days=days))
+        for days in range(-365, 366)
+    ]
+    prices = [
+        ops.adapt_decimalfield_value(Decimal(cents) / 100, 10, 2)
+        for cents in range(100, 50001)
+    ]
+    now = GiftInstance._meta.get_field("updated_at").get_db_prep_save(
+        timezone.now(), connection
+    )
+    native_uuid = connection.features.has_native_uuid_field
+    Through = Gift.category.through
+    instance_fields = [
+        "id",
+        "gift",
+        "event_date",
+        "size",
+        "colour",
+        "price",
+        "url",
+        "requester",
+        "status",
+        "updated_at",
+    ]
+    instance_sql = _insert_sql(connection, GiftInstance, instance_fields)
+    link_sql = _insert_sql(connection, Through, ["gift", "category"])
+
+    first_gift = _next_id(Gift)
+    counts = {"users": users, "brands": brand_count, "gifts": 0, "instances": 0}
+    for start in range(0, gifts, batch_size):
+        ids = range(first_gift + start, first_gift + min(start + batch_size, gifts))
+        gift_rows, documents, links, instances = [], [], [], []
+        values = {}
+        for gift_id in ids:
+            noun = rng.choice(NOUNS)
+            brand = rng.choices(brands, cum_weights=brand_weights)[0]
+            gift = Gift(
+                id=gift_id,
+                ref=f"SEED-{gift_id:010d}",
+                name=f"{rng.choice(WORDS).title()} {noun} {gift_id}",
+                description=f"A {rng.choice(WORDS)} {rng.choice(WORDS)} {noun}.",
+                brand_id=brand.id,
+                made_in_id=rng.choice(countries),
+            )
+            gift_rows.append(gift)
+            names = []
+            values[gift_id] = {("brand", brand.id), ("made_in", gift.made_in_id)}
+            for name, category_id in rng.sample(categories, rng.randint(1, 3)):
+                links.append((gift_id, category_id))
+                names.append(name)
+                values[gift_id].add(("category", category_id))
+            gift.category_names = sorted(names)
+            documents.append(
+                (gift_id, gift.name, gift.description, brand.name, " ".join(names))
+            )
+            first = len(instances)
+            for _ in range(rng.randint(0, 2 * instances_per_gift)):
+                # time-ordered like the default uuid7 keys, but reproducible;
+                # the first gift id keeps runs with the same seed apart
+                number = counts["instances"] + len(instances)
+                ms = SEED_EPOCH_MS + first_gift + number // 4096
+                pk = uuid7_int(ms, number, rng.getrandbits(62))
+                instances.append(
+                    (
+                        uuid.UUID(int=pk) if native_uuid else f"{pk:032x}",
+                        gift_id,
+                        pick(dates),
+                        pick(SIZES),
+                        pick(COLOURS),
+                        pick(prices),
+                        "",
+                        pick(requesters),
+                        "t" if random() < 0.2 else "a",
+                        now,
+                    )
+                )
+            gift.taken_count = sum(row[8] == "t" for row in instances[first:])
+            gift.available_count = len(instances) - first - gift.taken_count
+        with transaction.atomic(using=connection.alias):
+            Gift.objects.bulk_create(gift_rows)
+            with connection.cursor() as cursor:
+                cursor.executemany(link_sql, links)
+                cursor.executemany(instance_sql, instances)
+            if index:
+                search.add_documents(documents)
+            facets.apply({}, values, connection.alias)
+        counts["gifts"] += len(gift_rows)
+        counts["instances"] += len(instances)
+        log(f"{counts['gifts']} gifts, {counts['instances']} instances")
+
+    # explicit ids leave PostgreSQL sequences behind
+    reset = ops.sequence_reset_sql(no_style(), [User, Brand, Gift])
+    if reset:
+        with connection.cursor() as cursor:
+            for sql in reset:
+                cursor.execute(sql)
+    invalidate_stats()
+    versions.touch(Brand, Category, Country, Gift, GiftInstance)
+    return counts
@@ -0,0 +1,71 @@
+"""Removing expired sessions in batches.
+
+Django's clearsessions deletes every expired row in a single statement,
+which holds the write lock for as long as it takes to delete all of them.
+Here expired session keys are read and deleted a batch at a time, each batch
+in its own short transaction, so logins and other writers can get in
+between and an interrupted run can simply be started again.
+"""
+
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseStore
+from django.db import router, transaction
+from django.utils import timezone
+
+from giftlist.retry import retry_on_lock
+
+
+def get_store_class():
+    return import_module(settings.SESSION_ENGINE).SessionStore
+
+
+@retry_on_lock
+def clear_expired_batch(model, now, batch_size=1000):
+    """Delete up to batch_size sessions that expired before now.
+
+    Returns the number of sessions deleted.
+    """
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        keys = list(
+            model.objects.using(using)
+            .filter(expire_date__lt=now)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if keys:
+            model.objects.using(using).filter(pk__in=keys)._raw_delete(using)
+    return len(keys)
+
+
+def clear_expired(batch_size=1000, pause=0, stdout=None):
+    """Delete every expired session of the configured engine.
+
+    Returns the number of sessions deleted, or None if the engine cannot
+    count them. Engines that do not store sessions in the database use their
+    own clear_expired(), and those with nothing to clear (signed cookies,
+    the cache) are left alone.
+    """
+    store = get_store_class()
+    if not issubclass(store, DatabaseStore):
+        try:
+            store.clear_expired()
+        except NotImplementedError:
+            pass
+        return None
+
+    model = store.get_model_class()
+    now = timezone.now()
+    total = 0
+    while True:
+        deleted = clear_expired_batch(model, now, batch_size)
+        if not deleted:
+            break
+        total += deleted
+        if stdout is not None:
+            stdout.write(f"Deleted {total} expired sessions")
+        if pause:
+            time.sleep(pause)
+    return total
@@ -0,0 +1,201 @@
+"""Signal handlers that keep cached catalog data in step with the database."""
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog import denorm, facets, search, versions
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+from catalog.stats import invalidate_stats
+
+CATALOG_MODELS = (Brand, Category, Country, Gift, GiftInstance)
+
+
+@receiver(post_save, sender=Gift)
+@receiver(post_delete, sender=Gift)
+@receiver(post_save, sender=GiftInstance)
+@receiver(post_delete, sender=GiftInstance)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_stats_on_change(sender, **kwargs):
+    """Any saved or deleted row can change the home page statistics."""
+    invalidate_stats()
+
+
+def touch_table(sender, **kwargs):
+    """Move the table's change stamp forward for conditional GET."""
+    versions.touch(sender)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(touch_table, sender=model)
+    post_delete.connect(touch_table, sender=model)
+
+
+def changed_gift_ids(instance, action, reverse, pk_set):
+    """Return the ids of the gifts whose categories an m2m_changed is about."""
+    if not reverse:
+        return [instance.pk]
+    if action == "post_clear":
+        return getattr(instance, "_cleared_gift_ids", [])
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Gift.category.through)
+def remember_cleared_gifts(sender, instance, action, reverse, **kwargs):
+    """pk_set is not provided on clear, so note the gifts beforehand."""
+    if reverse and action == "pre_clear":
+        instance._cleared_gift_ids = list(
+            instance.gift_set.values_list("pk", flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=Gift.category.through)
+def touch_gift_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    """Changing a gift's categories changes the gift, so bump its updated_at."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        gift_ids = changed_gift_ids(instance, action, reverse, pk_set)
+        Gift.objects.filter(pk__in=gift_ids).update(updated_at=timezone.now())
+        versions.touch(Gift)
+
+
+@receiver(post_save, sender=Gift)
+def index_saved_gift(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_gifts([instance.pk])
+
+
+@receiver(post_delete, sender=Gift)
+def remove_deleted_gift(sender, instance, **kwargs):
+    search.remove_gifts([instance.pk])
+
+
+@receiver(m2m_changed, sender=Gift.category.through)
+def index_gift_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex gifts whose categories were added, removed or cleared."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        search.index_gifts(changed_gift_ids(instance, action, reverse, pk_set))
+
+
+@receiver(post_save, sender=Brand)
+def index_brand_gifts(sender, instance, created, raw=False, **kwargs):
+    """A renamed brand changes the document of every gift it makes."""
+    if not created and not raw:
+        search.index_gifts(instance.gift_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Category)
+def index_category_gifts(sender, instance, created, raw=False, **kwargs):
+    """A renamed category changes the document of every gift in it."""
+    if not created and not raw:
+        search.index_gifts(instance.gift_set.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Gift.category.through)
+def copy_gift_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        denorm.refresh_categories(changed_gift_ids(instance, action, reverse, pk_set))
+        if not reverse:
+            # so gift.category.add(...) is followed by a gift that shows it
+            instance.refresh_from_db(fields=["category_names"])
+
+
+@receiver(post_save, sender=Category)
+def copy_category_name(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        denorm.refresh_categories(instance.gift_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_gifts(sender, instance, **kwargs):
+    """Deleting a category drops its links without sending m2m_changed."""
+    instance._gift_ids = list(instance.gift_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_name(sender, instance, **kwargs):
+    denorm.refresh_categories(getattr(instance, "_gift_ids", []))
+
+
+@receiver(post_init, sender=GiftInstance)
+def remember_instance_state(sender, instance, **kwargs):
+    # deferred fields are left out rather than loaded one query at a time
+    instance._counted_as = (
+        instance.__dict__.get("gift_id"),
+        instance.__dict__.get("status"),
+    )
+
+
+@receiver(post_save, sender=GiftInstance)
+def count_saved_instance(sender, instance, created, raw=False, **kwargs):
+    """Recount the instances of the gift it belongs to, and belonged to."""
+    previous = instance._counted_as
+    instance._counted_as = (instance.gift_id, instance.status)
+    if raw or (not created and previous == instance._counted_as):
+        return
+    denorm.refresh_counts({instance.gift_id, previous[0]})
+
+
+@receiver(post_delete, sender=GiftInstance)
+def count_deleted_instance(sender, instance, **kwargs):
+    denorm.refresh_counts([instance.gift_id])
+
+
+@receiver(post_init, sender=Gift)
+def remember_gift_facets(sender, instance, **kwargs):
+    instance._facet_values = facets.own_values(instance)
+
+
+@receiver(post_save, sender=Gift)
+def count_saved_gift(sender, instance, created, raw=False, **kwargs):
+    """Move the gift's facet counts to its new brand and country."""
+    previous = set() if created else instance._facet_values
+    instance._facet_values = facets.own_values(instance)
+    if raw or previous == instance._facet_values:
+        return
+    after = facets.values_of([instance.pk])
+    before = {}
+    if not created:
+        # only the brand and country can have changed; categories go through
+        # m2m_changed
+        values = after.get(instance.pk, set())
+        before[instance.pk] = (values - instance._facet_values) | previous
+    facets.apply(before, after)
+
+
+@receiver(pre_delete, sender=Gift)
+def remember_deleted_gift_facets(sender, instance, **kwargs):
+    # its category links are gone by post_delete
+    instance._deleted_facet_values = facets.values_of([instance.pk])
+
+
+@receiver(post_delete, sender=Gift)
+def count_deleted_gift(sender, instance, **kwargs):
+    facets.apply(getattr(instance, "_deleted_facet_values", {}), {})
+
+
+@receiver(m2m_changed, sender=Gift.category.through)
+def count_gift_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recount the gifts whose categories change, from before and after."""
+    if action in ("pre_add", "pre_remove", "pre_clear"):
+        if not reverse:
+            gift_ids = [instance.pk]
+        elif pk_set is None:
+            gift_ids = instance.gift_set.values_list("pk", flat=True)
+        else:
+            gift_ids = pk_set
+        instance._facets_before = facets.values_of(gift_ids)
+    elif action in ("post_add", "post_remove", "post_clear"):
+        before = instance._facets_before
+        facets.apply(before, facets.values_of(before))
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_facet(sender, instance, **kwargs):
+    facets.drop_value("category", instance.pk)
@@ -0,0 +1,94 @@
+"""Cached statistics shown on the catalog home page."""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from catalog.budgets import uncounted
+from catalog.models import Brand, Gift, GiftInstance
+
+STATS_KEY = "catalog:stats"
+VERSION_KEY = "catalog:stats:version"
+LOCK_KEY = "catalog:stats:lock"
+
+
+def _timeout():
+    return getattr(settings, "CATALOG_STATS_TIMEOUT", 60 * 60)
+
+
+def _lock_timeout():
+    return getattr(settings, "CATALOG_STATS_LOCK_TIMEOUT", 10)
+
+
+def current_version():
+    """Return the version stamp that cached statistics must match to be fresh."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() rather than set() so concurrent workers agree on one stamp
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_stats():
+    """Bump the version stamp so the next read recomputes the statistics."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # key missing (e.g. evicted): any cached payload is stale by definition
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+
+
+def compute_stats():
+    """Count the home page statistics with one aggregate query per table."""
+    gifts = Gift.objects.aggregate(
+        num_gifts=Count("id"),
+        num_perfume_gifts=Count("id", filter=Q(description__icontains="Perfume")),
+    )
+    instances = GiftInstance.objects.aggregate(
+        num_instances=Count("id"),
+        num_instances_available=Count("id", filter=Q(status__exact="a")),
+    )
+    brands = Brand.objects.aggregate(
+        num_brands=Count("id"),
+        # matches Brand.objects.exclude(est__gt=1999), which keeps unknown dates
+        num_older_brands=Count("id", filter=Q(est__lte=1999) | Q(est__isnull=True)),
+    )
+    return {**gifts, **instances, **brands}
+
+
+def get_stats():
+    """Return the home page statistics, recomputing them only when stale.
+
+    Only the worker holding the recompute lock queries the database; the
+    others keep serving the previous (stale) figures until it has finished,
+    so an invalidation never sends a burst of COUNT queries to the database.
+    The version stamp and the lock are only seen by every worker with a
+    shared cache (see CACHES in the settings). The lock is strictly
+    exclusive with memcached, whose add() is atomic.
+    """
+    version = current_version()
+    payload = cache.get(STATS_KEY)
+    if payload is not None and payload["version"] == version:
+        return payload["stats"]
+
+    if cache.add(LOCK_KEY, version, timeout=_lock_timeout()):
+        try:
+            with uncounted():
+                stats = compute_stats()
+            cache.set(
+                STATS_KEY, {"version": version, "stats": stats}, timeout=_timeout()
+            )
+        finally:
+            cache.delete(LOCK_KEY)
+        return stats
+
+    if payload is not None:
+        return payload["stats"]
+
+    # cold cache and another worker is recomputing: there is nothing to fall
+    # back on, so count directly rather than keep the request waiting
+    with uncounted():
+        return compute_stats()
@@ -0,0 +1,310 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.admin.models import CHANGE, DELETION, LogEntry
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import admin as catalog_admin
+from catalog import search
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+
+
+def form_data(form):
+    """Return the POST data that submits form unchanged."""
+    return {
+        form.add_prefix(name): form[name].value()
+        for name in form.fields
+        if form[name].value() is not None
+    }
+
+
+class AdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="password")
+        cls.brand = Brand.objects.create(name="Apple")
+        cls.country = Country.objects.create(name="USA")
+        cls.categories = [
+            Category.objects.create(name=name) for name in ("Phones", "Music")
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_gifts(self, count, instances=0):
+        for n in range(Gift.objects.count(), Gift.objects.count() + count):
+            gift = Gift.objects.create(
+                name=f"Gift {n}",
+                description="A gift",
+                ref=f"ref{n}",
+                brand=self.brand,
+                made_in=self.country,
+            )
+            gift.category.set(self.categories)
+            GiftInstance.objects.bulk_create(
+                [
+                    GiftInstance(
+                        gift=gift,
+                        event_date=date(2030, 1, 1),
+                        size="M",
+                        colour="red",
+                        url="https://example.com/",
+                        requester=self.admin,
+                    )
+                    for _ in range(instances)
+                ]
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class ChangelistTest(AdminTestCase):
+    def assertConstant(self, name):
+        url = reverse(f"admin:catalog_{name}_changelist")
+        self.add_gifts(2, instances=1)
+        few = self.count_queries(url)
+        self.add_gifts(20, instances=1)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_gift_changelist(self):
+        self.assertConstant("gift")
+
+    def test_giftinstance_changelist(self):
+        self.assertConstant("giftinstance")
+
+    def test_brand_changelist(self):
+        self.assertConstant("brand")
+
+    def test_gift_filter_is_a_text_box(self):
+        self.add_gifts(3, instances=2)
+        gift = Gift.objects.get(ref="ref1")
+        url = reverse("admin:catalog_giftinstance_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, 'name="gift"')
+        self.assertNotContains(response, "?gift__id__exact=")
+
+        for value in ("ref1", str(gift.pk)):
+            response = self.client.get(url, {"gift": value, "status": "a"})
+            self.assertEqual(response.context["cl"].result_count, 2)
+            self.assertContains(response, '<input type="hidden" name="status"')
+
+    def test_gift_search_uses_the_full_text_index(self):
+        self.add_gifts(3)
+        url = reverse("admin:catalog_gift_changelist")
+        response = self.client.get(url, {"q": "gift"})
+        self.assertEqual(response.context["cl"].result_count, 3)
+        response = self.client.get(url, {"q": "ref2"})
+        self.assertEqual(
+            [gift.ref for gift in response.context["cl"].result_list], ["ref2"]
+        )
+
+    def test_autocomplete(self):
+        self.add_gifts(3)
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "catalog",
+                "model_name": "giftinstance",
+                "field_name": "gift",
+                "term": "gift",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+
+class CountTest(AdminTestCase):
+    def test_count_is_capped(self):
+        self.add_gifts(5)
+        paginator = catalog_admin.EstimatedCountPaginator(
+            Gift.objects.filter(brand=self.brand), 2
+        )
+        with mock.patch.object(catalog_admin, "COUNT_LIMIT", 3):
+            self.assertEqual(paginator.count, 4)
+
+    def test_unfiltered_count_is_estimated(self):
+        self.add_gifts(5)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(catalog_admin.estimated_count(Gift, "default"), 5)
+        paginator = catalog_admin.EstimatedCountPaginator(Gift.objects.all(), 2)
+        with mock.patch.object(catalog_admin, "COUNT_LIMIT", 3):
+            self.assertEqual(paginator.count, 5)
+
+    def test_estimate_ignores_partial_indexes(self):
+        self.add_gifts(2, instances=5)
+        GiftInstance.objects.filter(gift__ref="ref0").update(status="t")
+        table = GiftInstance._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("SELECT * FROM sqlite_stat1 WHERE tbl = %s", [table])
+            rows = cursor.fetchall()
+            # put the partial index, which only covers the available
+            # instances, first
+            rows.sort(key=lambda row: row[1] != "gi_available_event_date_idx")
+            self.assertEqual(rows[0][2].split()[0], "5")
+            cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl = %s", [table])
+            cursor.executemany("INSERT INTO sqlite_stat1 VALUES (%s, %s, %s)", rows)
+        self.assertEqual(catalog_admin.estimated_count(GiftInstance, "default"), 10)
+
+
+class InlineTest(AdminTestCase):
+    def test_inline_rows_are_limited(self):
+        self.add_gifts(1, instances=catalog_admin.INLINE_LIMIT + 5)
+        gift = Gift.objects.get()
+        url = reverse("admin:catalog_gift_change", args=[gift.pk])
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(len(formset.forms), catalog_admin.INLINE_LIMIT)
+        self.assertContains(response, "5 more not shown.")
+        self.assertContains(response, f"?gift__id__exact={gift.pk}")
+        # related objects are picked with autocomplete widgets
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, f'<option value="{self.admin.pk}">')
+
+    def test_inline_can_still_be_saved(self):
+        self.add_gifts(1, instances=catalog_admin.INLINE_LIMIT + 5)
+        gift = Gift.objects.get()
+        url = reverse("admin:catalog_gift_change", args=[gift.pk])
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        data = form_data(response.context["adminform"].form)
+        data.update(form_data(formset.management_form))
+        for form in formset.forms:
+            data.update(form_data(form))
+        data[f"{formset.prefix}-0-status"] = "t"
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(GiftInstance.objects.filter(status="t").count(), 1)
+        # the rows that were not shown are left alone
+        self.assertEqual(GiftInstance.objects.count(), catalog_admin.INLINE_LIMIT + 5)
+
+
+class BulkActionTest(AdminTestCase):
+    def run_action(self, model, action, pks=(), select_across=False, **data):
+        url = reverse(f"admin:catalog_{model._meta.model_name}_changelist")
+        query = data.pop("query", "")
+        if select_across and not pks:
+            # the admin's script keeps the boxes of the page ticked
+            pks = [model.objects.first().pk]
+        data.update(
+            {
+                "action": action,
+                "_selected_action": [str(pk) for pk in pks],
+                "select_across": "1" if select_across else "0",
+                "index": "0",
+            }
+        )
+        return self.client.post(f"{url}{query}", data)
+
+    def test_update_is_one_statement_and_one_log_entry(self):
+        self.add_gifts(3, instances=2)
+        pks = list(GiftInstance.objects.values_list("pk", flat=True)[:4])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.run_action(GiftInstance, "mark_taken", pks)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(GiftInstance.objects.filter(status="t").count(), 4)
+        updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "catalog_giftinstance"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            sum(Gift.objects.values_list("taken_count", flat=True)), 4
+        )
+        entry = LogEntry.objects.get()
+        self.assertEqual(entry.object_repr, "4 gift instances")
+        self.assertEqual(entry.action_flag, CHANGE)
+
+    def test_select_across_uses_the_filters(self):
+        self.add_gifts(3, instances=2)
+        response = self.run_action(
+            GiftInstance, "clear_requester", select_across=True, query="?gift=ref1"
+        )
+        self.assertEqual(response.status_code, 302)
+        cleared = GiftInstance.objects.filter(requester=None)
+        self.assertEqual(set(cleared.values_list("gift__ref", flat=True)), {"ref1"})
+
+    def test_shift_event_date_asks_for_the_days(self):
+        self.add_gifts(1, instances=2)
+        pks = GiftInstance.objects.values_list("pk", flat=True)
+        response = self.run_action(GiftInstance, "shift_event_date", pks)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "admin/catalog/bulk_action.html")
+        self.assertContains(response, 'name="days"')
+
+        response = self.run_action(
+            GiftInstance, "shift_event_date", pks, apply="yes", days="33"
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(GiftInstance.objects.values_list("event_date", flat=True)),
+            {date(2030, 2, 3)},
+        )
+
+    def test_delete_in_batches(self):
+        self.add_gifts(2, instances=3)
+        response = self.run_action(
+            GiftInstance, "delete_in_batches", select_across=True
+        )
+        self.assertContains(response, "6 gift instances")
+        self.assertEqual(GiftInstance.objects.count(), 6)
+
+        with mock.patch.object(catalog_admin, "BATCH_SIZE", 4):
+            response = self.run_action(
+                GiftInstance, "delete_in_batches", select_across=True, apply="yes"
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(GiftInstance.objects.exists())
+        entry = LogEntry.objects.get()
+        self.assertEqual(entry.object_repr, "6 gift instances")
+        self.assertEqual(entry.action_flag, DELETION)
+
+    def test_the_default_delete_action_is_gone(self):
+        response = self.client.get(reverse("admin:catalog_giftinstance_changelist"))
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="delete_in_batches"')
+
+    def test_brands_keep_the_default_delete_action(self):
+        brand = Brand.objects.create(name="Sony")
+        response = self.client.get(reverse("admin:catalog_brand_changelist"))
+        self.assertContains(response, 'value="delete_selected"')
+        self.assertNotContains(response, 'value="delete_in_batches"')
+        response = self.run_action(Brand, "delete_selected", [brand.pk], post="yes")
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Brand.objects.filter(pk=brand.pk).exists())
+
+    def test_gifts_with_instances_are_not_deleted(self):
+        self.add_gifts(2, instances=1)
+        self.add_gifts(3)
+        response = self.run_action(
+            Gift, "delete_in_batches", select_across=True, apply="yes"
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(Gift.objects.values_list("ref", flat=True)), {"ref0", "ref1"}
+        )
+        self.assertEqual(Gift.category.through.objects.count(), 4)
+        self.assertEqual(
+            sorted(search.search_ids("gift")),
+            sorted(Gift.objects.values_list("pk", flat=True)),
+        )
+
+    def test_mark_instances_of_gifts_available(self):
+        self.add_gifts(2, instances=2)
+        GiftInstance.objects.update(status="t", taken_by=self.admin)
+        gift = Gift.objects.get(ref="ref0")
+        response = self.run_action(Gift, "mark_instances_available", [gift.pk])
+        self.assertEqual(response.status_code, 302)
+        available = GiftInstance.objects.filter(status="a", taken_by=None)
+        self.assertEqual(set(available.values_list("gift", flat=True)), {gift.pk})
+        self.assertEqual(LogEntry.objects.get().object_repr, "2 gift instances")
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import versions
+from catalog.archive import archive_expired
+from catalog.models import ArchivedGiftInstance, Gift, GiftInstance
+from catalog.stats import get_stats
+
+
+class InstancesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.user = User.objects.create_user(username="johnsmith", password="pw")
+        gift = Gift.objects.create(name="Iphone", description="Phone", ref="ref")
+        cls.instances = {
+            days: GiftInstance.objects.create(
+                gift=gift,
+                requester=cls.user,
+                event_date=cls.today + timedelta(days=days),
+                size=f"{days} days",
+            )
+            for days in (-400, -100, -1, 0, 30)
+        }
+        cls.undated = GiftInstance.objects.create(gift=gift, requester=cls.user)
+
+    def ids(self, queryset):
+        return set(queryset.values_list("pk", flat=True))
+
+
+class ExpiryTest(InstancesTestCase):
+    def test_active(self):
+        expected = {self.instances[0].pk, self.instances[30].pk, self.undated.pk}
+        self.assertEqual(self.ids(GiftInstance.objects.active()), expected)
+
+    def test_expired(self):
+        expected = {self.instances[days].pk for days in (-400, -100, -1)}
+        self.assertEqual(self.ids(GiftInstance.objects.expired()), expected)
+        before = self.today - timedelta(days=90)
+        self.assertEqual(
+            self.ids(GiftInstance.objects.expired(today=before)),
+            {self.instances[-400].pk, self.instances[-100].pk},
+        )
+
+    def test_with_expiry(self):
+        expired = dict(
+            GiftInstance.objects.with_expiry().values_list("pk", "expired")
+        )
+        self.assertTrue(expired[self.instances[-1].pk])
+        self.assertFalse(expired[self.instances[0].pk])
+        self.assertFalse(expired[self.undated.pk])
+
+    def test_my_gifts_marks_expired(self):
+        self.client.login(username="johnsmith", password="pw")
+        response = self.client.get(reverse("mygifts"), {"page_size": 10})
+        self.assertContains(response, "(expired)", count=3)
+
+
+class ArchiveTest(InstancesTestCase):
+    def test_archive(self):
+        stamp = versions.changed_at(GiftInstance)
+        before = self.today - timedelta(days=90)
+        self.assertEqual(archive_expired(before, batch_size=1), 2)
+        self.assertEqual(
+            self.ids(ArchivedGiftInstance.objects),
+            {self.instances[-400].pk, self.instances[-100].pk},
+        )
+        self.assertFalse(GiftInstance.objects.expired(today=before).exists())
+        self.assertEqual(GiftInstance.objects.count(), 4)
+        archived = ArchivedGiftInstance.objects.get(pk=self.instances[-100].pk)
+        self.assertEqual(archived.size, "-100 days")
+        self.assertEqual(archived.requester_id, self.user.pk)
+        self.assertEqual(get_stats()["num_instances"], 4)
+        self.assertGreater(versions.changed_at(GiftInstance), stamp)
+        # nothing left to do
+        self.assertEqual(archive_expired(before), 0)
+
+    def test_limit(self):
+        self.assertEqual(archive_expired(self.today, batch_size=2, limit=1), 1)
+        self.assertEqual(
+            self.ids(ArchivedGiftInstance.objects), {self.instances[-400].pk}
+        )
+
+    def test_command(self):
+        out = StringIO()
+        call_command("archive_expired", "--dry-run", stdout=out)
+        self.assertIn("2 gift instances would be archived", out.getvalue())
+        self.assertEqual(ArchivedGiftInstance.objects.count(), 0)
+
+        out = StringIO()
+        call_command("archive_expired", f"--before={self.today}", stdout=out)
+        self.assertIn("Archived 3 gift instances", out.getvalue())
+        self.assertEqual(GiftInstance.objects.expired().count(), 0)
+
+    def test_command_errors(self):
+        with self.assertRaises(CommandError):
+            call_command("archive_expired", "--batch-size=0", stdout=StringIO())
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from catalog import bench, search
+from catalog.models import Brand, Gift, GiftInstance
+from catalog.seed import seed
+
+
+class SeedTest(TestCase):
+    def test_counts(self):
+        counts = seed(40, instances_per_gift=2, users=3)
+        self.assertEqual(Gift.objects.count(), 40)
+        self.assertEqual(Brand.objects.count(), 2)
+        self.assertEqual(GiftInstance.objects.count(), counts["instances"])
+        self.assertEqual(counts["users"], 3)
+        self.assertFalse(Gift.objects.filter(category=None).exists())
+
+    def test_deterministic(self):
+        seed(20, seed=7)
+        first = list(Gift.objects.values_list("name", "brand__name", "made_in__name"))
+        instances = list(GiftInstance.objects.values_list("id", "price"))
+        Gift.category.through.objects.all().delete()
+        GiftInstance.objects.all().delete()
+        Gift.objects.all().delete()
+        Brand.objects.all().delete()
+        seed(20, seed=7)
+        again = list(Gift.objects.values_list("name", "brand__name", "made_in__name"))
+        # ids carry on from the first run, so compare what does not depend on them
+        self.assertEqual(
+            [name.rsplit(" ", 1)[0] for name, _, _ in first],
+            [name.rsplit(" ", 1)[0] for name, _, _ in again],
+        )
+        self.assertEqual([row[2] for row in first], [row[2] for row in again])
+        again_instances = list(GiftInstance.objects.values_list("id", "price"))
+        self.assertEqual(
+            [price for _, price in instances], [price for _, price in again_instances]
+        )
+
+    def test_seeding_again(self):
+        seed(20, seed=7)
+        first = list(GiftInstance.objects.values_list("id", flat=True))
+        seed(20, seed=7)
+        instances = list(GiftInstance.objects.values_list("id", flat=True))
+        self.assertEqual(len(instances), 2 * len(first))
+        # the second run's keys all come after the first run's
+        self.assertEqual(instances[: len(first)], first)
+
+
+class BenchTest(TransactionTestCase):
+    def setUp(self):
+        seed(30, instances_per_gift=2, users=2)
+
+    def test_every_url_is_benchmarked(self):
+        self.assertEqual(bench.url_names() - set(bench.endpoints()), set())
+
+    def test_run(self):
+        report = bench.run(
+            requests=4, concurrency=2, only=["gifts", "gift-detail", "export"]
+        )
+        self.assertEqual(report["meta"]["gifts"], 30)
+        self.assertEqual(report["meta"]["not_benchmarked"], [])
+        self.assertEqual(set(report["endpoints"]), {"gifts", "gift-detail", "export"})
+        result = report["endpoints"]["gift-detail"]
+        self.assertEqual(result["requests"], 4)
+        self.assertEqual(result["errors"], 0)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+        self.assertEqual(report["endpoints"]["gifts"]["queries_per_request"], 1)
+
+    def test_empty_catalog(self):
+        Gift.category.through.objects.all().delete()
+        GiftInstance.objects.all().delete()
+        Gift.objects.all().delete()
+        with self.assertRaises(LookupError):
+            bench.endpoints()
+
+
+class CompareTest(TestCase):
+    def report(self, p95, queries, errors=0):
+        result = {"p95_ms": p95, "queries_per_request": queries, "errors": errors}
+        return {"endpoints": {"gifts": result}}
+
+    def test_no_regression(self):
+        self.assertEqual(bench.compare(self.report(10, 1), self.report(12, 1)), [])
+
+    def test_slower(self):
+        regressions = bench.compare(self.report(10, 1), self.report(20, 1))
+        self.assertEqual(regressions, ["gifts: p95 10 ms -> 20 ms"])
+
+    def test_more_queries(self):
+        regressions = bench.compare(self.report(10, 1), self.report(10, 3))
+        self.assertEqual(regressions, ["gifts: 1 -> 3 queries per request"])
+
+    def test_unknown_endpoint(self):
+        with self.assertRaises(CommandError):
+            call_command("bench", "--endpoint=nope", stdout=StringIO())
+
+
+class SeedCatalogCommandTest(TestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "seed_catalog",
+            "--gifts=25",
+            "--instances-per-gift=2",
+            "--users=4",
+            "--batch-size=10",
+            "--sqlite-fast",
+            stdout=out,
+        )
+        self.assertIn("Added 25 gifts", out.getvalue())
+        self.assertEqual(Gift.objects.count(), 25)
+        self.assertEqual(User.objects.filter(username__startswith="seed-").count(), 4)
+        instance = GiftInstance.objects.select_related("gift").first()
+        self.assertEqual(instance.id.version, 7)
+        self.assertIn(instance.gift.pk, search.search_ids(instance.gift.name))
+        self.assertEqual(str(instance.updated_at.tzinfo), "UTC")
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            call_command("seed_catalog", "--gifts=0", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("seed_catalog", "--gifts=1", "--users=-1", stdout=StringIO())
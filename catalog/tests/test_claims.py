@@ -0,0 +1,233 @@
+import random
+import threading
+import uuid
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from catalog import claims, denorm, versions
+from catalog.budgets import uncounted
+from catalog.models import Gift, GiftInstance
+from catalog.stats import get_stats
+from catalog.views import GiftInstanceUpdateView
+
+
+class ClaimsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gift = Gift.objects.create(
+            name="Iphone", description="A brilliant smartphone", ref="ref"
+        )
+        cls.instance = GiftInstance.objects.create(
+            gift=cls.gift, event_date=date(2021, 12, 25)
+        )
+        cls.buyer = User.objects.create_user(username="buyer", password="password")
+        cls.other = User.objects.create_user(username="other", password="password")
+
+    def test_claim(self):
+        available = get_stats()["num_instances_available"]
+        stamp = versions.changed_at(GiftInstance)
+        claims.claim(self.instance.pk, self.buyer)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.status, "t")
+        self.assertEqual(self.instance.taken_by, self.buyer)
+        self.assertEqual(get_stats()["num_instances_available"], available - 1)
+        self.assertGreater(versions.changed_at(GiftInstance), stamp)
+
+    def test_claim_taken(self):
+        claims.claim(self.instance.pk, self.buyer)
+        with self.assertRaises(claims.ClaimConflict):
+            claims.claim(self.instance.pk, self.other)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.taken_by, self.buyer)
+
+    def test_claim_missing(self):
+        with self.assertRaises(GiftInstance.DoesNotExist):
+            claims.claim(uuid.uuid4(), self.buyer)
+
+    def test_release(self):
+        claims.claim(self.instance.pk, self.buyer)
+        with self.assertRaises(claims.ClaimConflict):
+            claims.release(self.instance.pk, self.other)
+        claims.release(self.instance.pk, self.buyer)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.status, "a")
+        self.assertIsNone(self.instance.taken_by)
+        with self.assertRaises(claims.ClaimConflict):
+            claims.release(self.instance.pk, self.buyer)
+
+    def test_staff_release(self):
+        claims.claim(self.instance.pk, self.buyer)
+        staff = User.objects.create(username="staff", is_staff=True)
+        claims.release(self.instance.pk, staff)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.status, "a")
+
+
+class ClaimViewsTest(ClaimsTest):
+    def url(self, name, pk=None):
+        return reverse(name, args=[pk or self.instance.pk])
+
+    def test_login_required(self):
+        response = self.client.post(self.url("giftinstance-claim"))
+        self.assertRedirects(
+            response, f"/accounts/login/?next={self.url('giftinstance-claim')}"
+        )
+        response = self.client.post(self.url("claim"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_post_only(self):
+        self.client.login(username="buyer", password="password")
+        response = self.client.get(self.url("giftinstance-claim"))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.client.get(self.url("claim")).status_code, 405)
+
+    def test_html(self):
+        self.client.login(username="buyer", password="password")
+        response = self.client.post(self.url("giftinstance-claim"))
+        self.assertRedirects(response, self.gift.get_absolute_url())
+        response = self.client.get(self.gift.get_absolute_url())
+        self.assertContains(response, "You are buying this.")
+
+        self.client.login(username="other", password="password")
+        response = self.client.post(self.url("giftinstance-claim"))
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, "Someone is already buying", status_code=409)
+        response = self.client.post(self.url("giftinstance-release"))
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.post(self.url("giftinstance-claim", uuid.uuid4()))
+        self.assertEqual(response.status_code, 404)
+
+    def test_api(self):
+        self.client.login(username="buyer", password="password")
+        response = self.client.post(self.url("claim"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "t")
+        self.assertEqual(self.client.post(self.url("claim")).status_code, 409)
+        self.assertEqual(self.client.post(self.url("release")).status_code, 200)
+        self.assertEqual(self.client.post(self.url("release")).status_code, 409)
+        response = self.client.post(self.url("claim", uuid.uuid4()))
+        self.assertEqual(response.status_code, 404)
+
+    def test_edit_keeps_a_claim_made_meanwhile(self):
+        get_object = GiftInstanceUpdateView.get_object
+
+        def get_object_then_claim(view, queryset=None):
+            instance = get_object(view, queryset)
+            # another buyer's request, outside this view's query budget
+            with uncounted():
+                claims.claim(self.instance.pk, self.other)
+            return instance
+
+        self.client.force_login(self.buyer)
+        url = reverse("giftinstance-update", kwargs={"pk": self.instance.pk})
+        data = {
+            "gift": self.gift.pk,
+            "event_date": "2021-12-31",
+            "size": "Large",
+            "colour": "Red",
+            "price": "10.00",
+            "url": "https://example.com",
+            "requester": self.buyer.pk,
+        }
+        with mock.patch.object(
+            GiftInstanceUpdateView, "get_object", get_object_then_claim
+        ):
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("mygifts"))
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.size, "Large")
+        self.assertEqual(self.instance.event_date, date(2021, 12, 31))
+        self.assertEqual(self.instance.status, "t")
+        self.assertEqual(self.instance.taken_by, self.other)
+
+
+# the in-memory test database fails at once on a locked table rather than
+# waiting, so a hundred writers need many quick retries
+@override_settings(DB_LOCK_RETRY={"ATTEMPTS": 200, "BASE_DELAY": 0.001})
+class ClaimStressTest(TransactionTestCase):
+    """A hundred buyers race for the same few gifts."""
+
+    threads = 100
+
+    def setUp(self):
+        gift = Gift.objects.create(name="Vase", description="A vase", ref="vase")
+        self.instances = [
+            GiftInstance.objects.create(gift=gift, event_date=date(2021, 12, 25))
+            for _ in range(5)
+        ]
+        User.objects.bulk_create(
+            [User(username=f"buyer{n}") for n in range(self.threads)]
+        )
+        self.users = list(User.objects.order_by("pk"))
+
+    def test_each_gift_is_claimed_once(self):
+        barrier = threading.Barrier(self.threads)
+        won = []
+        lost = []
+
+        def buyer(user):
+            pks = [instance.pk for instance in self.instances]
+            random.shuffle(pks)
+            try:
+                barrier.wait()
+                for pk in pks:
+                    # lock errors are retried inside claim(), not here, so
+                    # a retry that misreports a win shows up as a loss
+                    try:
+                        claims.claim(pk, user)
+                        won.append((pk, user.pk))
+                    except claims.ClaimConflict:
+                        lost.append((pk, user.pk))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buyer, args=[user]) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = sorted(instance.pk for instance in self.instances)
+        self.assertEqual(sorted(pk for pk, _ in won), expected)
+        self.assertEqual(len(lost), len(self.instances) * (self.threads - 1))
+        for pk, user_pk in won:
+            instance = GiftInstance.objects.get(pk=pk)
+            self.assertEqual(instance.status, "t")
+            self.assertEqual(instance.taken_by_id, user_pk)
+        gift = Gift.objects.get()
+        self.assertEqual((gift.available_count, gift.taken_count), (0, 5))
+
+
+@override_settings(DB_LOCK_RETRY={"BASE_DELAY": 0})
+class ClaimRetryTest(TransactionTestCase):
+    """A claim that loses the lock part way is run again as a whole."""
+
+    def setUp(self):
+        self.gift = Gift.objects.create(name="Vase", description="A vase", ref="vase")
+        self.instance = GiftInstance.objects.create(gift=self.gift)
+        self.buyer = User.objects.create_user(username="buyer", password="password")
+
+    def test_lock_error_after_the_update(self):
+        refresh_counts = denorm.refresh_counts
+        calls = []
+
+        def locked_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return refresh_counts(*args, **kwargs)
+
+        with mock.patch.object(denorm, "refresh_counts", locked_once):
+            claims.claim(self.instance.pk, self.buyer)
+        self.assertEqual(len(calls), 2)
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.status, "t")
+        self.assertEqual(self.instance.taken_by, self.buyer)
+        self.gift.refresh_from_db()
+        self.assertEqual((self.gift.available_count, self.gift.taken_count), (0, 1))
@@ -0,0 +1,101 @@
+import tempfile
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog import versions
+from catalog.models import Brand, Category, Gift, GiftInstance
+
+
+class ConditionalDetailTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        test_brand = Brand.objects.create(name="Apple", est=2001)
+        test_gift = Gift.objects.create(
+            name="Iphone 11",
+            description="A brilliant smartphone",
+            ref="randomcodeAZC",
+            brand=test_brand,
+        )
+        GiftInstance.objects.create(gift=test_gift, event_date=datetime(2021, 11, 5))
+        Category.objects.create(name="Phones")
+
+    def setUp(self):
+        cache.clear()
+        self.gift = Gift.objects.get(ref="randomcodeAZC")
+        self.url = reverse("gift-detail", kwargs={"pk": self.gift.pk})
+
+    def get_etag(self, url=None):
+        response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        return response["ETag"]
+
+    def test_not_modified(self):
+        etag = self.get_etag()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_row_change(self):
+        etag = self.get_etag()
+        self.gift.description = "Changed"
+        self.gift.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_changes(self):
+        etag = self.get_etag()
+        GiftInstance.objects.create(gift=self.gift, event_date=datetime(2021, 12, 5))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.gift.category.add(Category.objects.get(name="Phones"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        Category.objects.get(name="Phones").gift_set.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_varies_by_user(self):
+        etag = self.get_etag()
+        self.client.force_login(User.objects.create(username="johnsmith"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_gift(self):
+        response = self.client.get(reverse("gift-detail", kwargs={"pk": 999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_brand_detail(self):
+        brand = Brand.objects.get(name="Apple")
+        url = reverse("brand-detail", kwargs={"pk": brand.pk})
+        etag = self.get_etag(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.gift.name = "Iphone 12"
+        self.gift.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SharedStampTest(TestCase):
+    def test_other_workers_see_changes(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+            with override_settings(CACHES={"default": shared}):
+                # another worker's cache, reading the same files
+                other = caches.create_connection("default")
+                before = versions.changed_at(Gift)
+                other.set(versions._key(Gift), before + 10, timeout=None)
+                self.assertEqual(versions.changed_at(Gift), before + 10)
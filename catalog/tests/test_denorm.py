@@ -0,0 +1,133 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import claims, denorm
+from catalog.archive import archive_expired
+from catalog.models import Brand, Category, Gift, GiftInstance
+from catalog.seed import seed
+
+
+def copies(gift):
+    gift = Gift.objects.get(pk=gift.pk)
+    return gift.category_names, gift.available_count, gift.taken_count
+
+
+class DenormTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Apple")
+        cls.gift = Gift.objects.create(name="Iphone", ref="ref1", brand=cls.brand)
+        cls.other = Gift.objects.create(name="MacBook", ref="ref2", brand=cls.brand)
+        cls.phones = Category.objects.create(name="Phones")
+        cls.music = Category.objects.create(name="Music")
+        cls.user = User.objects.create_user(username="buyer", password="password")
+
+
+class CategoryNamesTest(DenormTestCase):
+    def test_names_follow_the_categories(self):
+        self.gift.category.add(self.phones, self.music)
+        self.assertEqual(self.gift.category_names, ["Music", "Phones"])
+        self.assertEqual(copies(self.gift)[0], ["Music", "Phones"])
+
+        self.phones.gift_set.remove(self.gift)
+        self.assertEqual(copies(self.gift)[0], ["Music"])
+
+        self.music.gift_set.clear()
+        self.assertEqual(copies(self.gift)[0], [])
+
+    def test_renamed_and_deleted_categories(self):
+        self.gift.category.add(self.phones, self.music)
+        self.phones.name = "Mobiles"
+        self.phones.save()
+        self.assertEqual(copies(self.gift)[0], ["Mobiles", "Music"])
+
+        self.music.delete()
+        self.assertEqual(copies(self.gift)[0], ["Mobiles"])
+
+
+class InstanceCountsTest(DenormTestCase):
+    def test_counts_follow_the_instances(self):
+        instance = GiftInstance.objects.create(gift=self.gift)
+        GiftInstance.objects.create(gift=self.gift, status="t")
+        self.assertEqual(copies(self.gift)[1:], (1, 1))
+
+        instance.status = "t"
+        instance.save()
+        self.assertEqual(copies(self.gift)[1:], (0, 2))
+
+        instance.gift = self.other
+        instance.save()
+        self.assertEqual(copies(self.gift)[1:], (0, 1))
+        self.assertEqual(copies(self.other)[1:], (0, 1))
+
+        instance.delete()
+        self.assertEqual(copies(self.other)[1:], (0, 0))
+
+    def test_saving_a_stale_gift_keeps_the_counts(self):
+        stale = Gift.objects.get(pk=self.gift.pk)
+        GiftInstance.objects.create(gift=self.gift)
+        stale.name = "Iphone 12"
+        stale.save()
+        self.assertEqual(copies(self.gift)[1:], (1, 0))
+
+    def test_claims(self):
+        instance = GiftInstance.objects.create(gift=self.gift)
+        claims.claim(instance.pk, self.user)
+        self.assertEqual(copies(self.gift)[1:], (0, 1))
+        claims.release(instance.pk, self.user)
+        self.assertEqual(copies(self.gift)[1:], (1, 0))
+
+    def test_archive(self):
+        past = timezone.localdate() - timedelta(days=400)
+        GiftInstance.objects.create(gift=self.gift, event_date=past)
+        GiftInstance.objects.create(gift=self.gift)
+        archive_expired(timezone.localdate())
+        self.assertEqual(copies(self.gift)[1:], (1, 0))
+
+
+class RecomputeTest(DenormTestCase):
+    def test_repairs_wrong_copies(self):
+        self.gift.category.add(self.phones)
+        GiftInstance.objects.bulk_create(
+            [GiftInstance(gift=self.gift), GiftInstance(gift=self.other, status="t")]
+        )
+        Gift.objects.filter(pk=self.gift.pk).update(category_names=["Wrong"])
+        totals = denorm.recompute(batch_size=1)
+        self.assertEqual(totals, {"checked": 2, "categories": 1, "counts": 2})
+        self.assertEqual(copies(self.gift), (["Phones"], 1, 0))
+        self.assertEqual(copies(self.other), ([], 0, 1))
+        self.assertEqual(denorm.recompute()["counts"], 0)
+
+    def test_seeded_gifts_are_already_right(self):
+        seed(20, instances_per_gift=2, users=2, index=False)
+        totals = denorm.recompute()
+        self.assertEqual(totals["categories"], 0)
+        self.assertEqual(totals["counts"], 0)
+
+    def test_command(self):
+        GiftInstance.objects.bulk_create([GiftInstance(gift=self.gift)])
+        out = StringIO()
+        call_command("recompute_gift_denorm", "--batch-size", "1", stdout=out)
+        self.assertIn("instance counts of 1", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("recompute_gift_denorm", "--batch-size", "0")
+
+
+class ListRenderingTest(DenormTestCase):
+    def test_lists_render_from_the_gift_row(self):
+        self.gift.category.add(self.phones, self.music)
+        GiftInstance.objects.create(gift=self.gift, status="t")
+        response = self.client.get(reverse("gifts"))
+        self.assertContains(response, "Music, Phones")
+        self.assertContains(response, "0 available, 1 taken")
+
+        response = self.client.get(reverse("gift-list"))
+        row = response.data["results"][0]
+        self.assertEqual(row["category_names"], ["Music", "Phones"])
+        self.assertEqual((row["available_count"], row["taken_count"]), (0, 1))
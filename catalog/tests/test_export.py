@@ -0,0 +1,91 @@
+import csv
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from catalog import export
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        apple = Brand.objects.create(name="Apple", est=1976)
+        usa = Country.objects.create(name="USA")
+        phones = Category.objects.create(name="Phones")
+        electronics = Category.objects.create(name="Electronics")
+        user = User.objects.create(username="johnsmith", password="password")
+        for i in range(5):
+            gift = Gift.objects.create(
+                name=f"Iphone {i}",
+                description="A brilliant smartphone",
+                ref=f"ref {i}",
+                brand=apple,
+                made_in=usa,
+            )
+            gift.category.add(phones, electronics)
+            GiftInstance.objects.create(
+                gift=gift, requester=user, event_date=date(2021, 12, 25), price=10
+            )
+
+    def test_gift_rows(self):
+        rows = list(export.iter_rows("gifts"))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            rows[0],
+            {
+                "id": rows[0]["id"],
+                "ref": "ref 0",
+                "name": "Iphone 0",
+                "description": "A brilliant smartphone",
+                "brand": "Apple",
+                "made_in": "USA",
+                "category": ["Electronics", "Phones"],
+            },
+        )
+
+    def test_queries_per_chunk(self):
+        # two queries (gifts, categories) per chunk plus the empty last one
+        with self.assertNumQueries(7):
+            list(export.iter_rows("gifts", chunk_size=2))
+        with self.assertNumQueries(2):
+            list(export.iter_rows("giftinstances", chunk_size=10))
+
+    def test_ndjson(self):
+        data = b"".join(export.export("giftinstances")).decode()
+        rows = [json.loads(line) for line in data.splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["requester"], "johnsmith")
+        self.assertEqual(rows[0]["event_date"], "2021-12-25")
+        self.assertEqual(rows[0]["price"], "10.00")
+
+    def test_csv_gzip(self):
+        data = gzip.decompress(b"".join(export.export("gifts", "csv", compress=True)))
+        rows = list(csv.DictReader(StringIO(data.decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["category"], "Electronics|Phones")
+
+    def test_unknown_table(self):
+        with self.assertRaises(ValueError):
+            export.export("users")
+
+    def test_command_round_trips_through_import(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / "gifts.csv"
+        call_command("export_catalog", "gifts", "--format=csv", f"--output={path}")
+
+        Gift.category.through.objects.all().delete()
+        Gift.objects.filter(ref="ref 1").update(name="Changed")
+        call_command("import_catalog", str(path), stdout=StringIO())
+        gift = Gift.objects.get(ref="ref 1")
+        self.assertEqual(gift.name, "Iphone 1")
+        self.assertEqual(gift.category.count(), 2)
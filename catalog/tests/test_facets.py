@@ -0,0 +1,174 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import facets
+from catalog.models import Brand, Category, Country, FacetCount, Gift
+from catalog.seed import seed
+
+
+def snapshot():
+    return {
+        (row.filter_facet, row.filter_value, row.facet, row.value_id): row.gifts
+        for row in FacetCount.objects.filter(gifts__gt=0)
+    }
+
+
+class FacetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.apple = Brand.objects.create(name="Apple")
+        cls.sony = Brand.objects.create(name="Sony")
+        cls.usa = Country.objects.create(name="USA")
+        cls.china = Country.objects.create(name="China")
+        cls.phones = Category.objects.create(name="Phones")
+        cls.music = Category.objects.create(name="Music")
+        cls.iphone = Gift.objects.create(
+            name="Iphone", ref="ref1", brand=cls.apple, made_in=cls.china
+        )
+        cls.iphone.category.add(cls.phones, cls.music)
+        cls.ipod = Gift.objects.create(
+            name="Ipod", ref="ref2", brand=cls.apple, made_in=cls.usa
+        )
+        cls.ipod.category.add(cls.music)
+        cls.walkman = Gift.objects.create(
+            name="Walkman", ref="ref3", brand=cls.sony, made_in=cls.china
+        )
+        cls.walkman.category.add(cls.music)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCountsAreRight(self):
+        counts = snapshot()
+        facets.rebuild()
+        self.assertEqual(counts, snapshot())
+
+
+class MaintenanceTest(FacetTestCase):
+    def test_counts(self):
+        counts = snapshot()
+        self.assertEqual(counts["", 0, "category", self.music.pk], 3)
+        self.assertEqual(counts["brand", self.apple.pk, "category", self.music.pk], 2)
+        phones = counts["category", self.phones.pk, "made_in", self.china.pk]
+        self.assertEqual(phones, 1)
+        self.assertCountsAreRight()
+
+    def test_changing_brand_and_country(self):
+        self.ipod.brand = self.sony
+        self.ipod.made_in = None
+        self.ipod.save()
+        self.assertCountsAreRight()
+
+    def test_changing_categories(self):
+        self.iphone.category.remove(self.music)
+        self.phones.gift_set.add(self.walkman, self.ipod)
+        self.assertCountsAreRight()
+        self.music.gift_set.clear()
+        self.assertCountsAreRight()
+        self.iphone.category.clear()
+        self.assertCountsAreRight()
+
+    def test_deleting(self):
+        self.iphone.delete()
+        self.assertCountsAreRight()
+        self.music.delete()
+        self.assertCountsAreRight()
+
+    def test_bulk_writers(self):
+        seed(30, instances_per_gift=0, users=1, index=False)
+        self.assertCountsAreRight()
+
+    def test_rebuild_command(self):
+        FacetCount.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_facet_counts", "--batch-size", "2", stdout=out)
+        self.assertIn("3 gifts", out.getvalue())
+        self.assertEqual(snapshot()["", 0, "brand", self.apple.pk], 2)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_facet_counts", "--batch-size", "0")
+
+
+class FacetCountsTest(FacetTestCase):
+    def names(self, counts, facet):
+        return [(str(value), gifts) for value, gifts in counts["facets"][facet]]
+
+    def test_without_filters(self):
+        counts = facets.facet_counts([])
+        self.assertEqual(counts["total"], 3)
+        self.assertEqual(self.names(counts, "category"), [("Music", 3), ("Phones", 1)])
+        self.assertEqual(self.names(counts, "brand"), [("Apple", 2), ("Sony", 1)])
+
+    def test_one_filter(self):
+        counts = facets.facet_counts([("made_in", self.china.pk)])
+        self.assertEqual(counts["total"], 2)
+        self.assertEqual(self.names(counts, "brand"), [("Apple", 1), ("Sony", 1)])
+        self.assertEqual(self.names(counts, "made_in"), [("China", 2)])
+
+    def test_several_filters(self):
+        filters = [("brand", self.apple.pk), ("category", self.music.pk)]
+        counts = facets.facet_counts(filters)
+        self.assertEqual(counts["total"], 2)
+        self.assertEqual(self.names(counts, "category"), [("Music", 2), ("Phones", 1)])
+        self.assertEqual(self.names(counts, "made_in"), [("USA", 1), ("China", 1)])
+
+        filters.append(("category", self.phones.pk))
+        counts = facets.facet_counts(filters)
+        self.assertEqual(counts["total"], 1)
+        self.assertEqual(self.names(counts, "made_in"), [("China", 1)])
+
+    def test_counts_are_cached_until_a_change(self):
+        facets.facet_counts([("brand", self.apple.pk)])
+        with self.assertNumQueries(0):
+            facets.facet_counts([("brand", self.apple.pk)])
+        self.walkman.brand = self.apple
+        self.walkman.save()
+        counts = facets.facet_counts([("brand", self.apple.pk)])
+        self.assertEqual(counts["total"], 3)
+
+
+class BrowseViewTest(FacetTestCase):
+    def test_browse(self):
+        response = self.client.get(reverse("browse"), {"category": self.music.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["gift_list"]), 3)
+        self.assertContains(response, "3 gifts")
+        self.assertContains(response, "<strong>Music</strong>")
+        # the link on a selected value deselects it
+        self.assertContains(response, 'href="?">')
+        self.assertContains(response, f'href="?brand={self.sony.pk}&amp;category=')
+
+        response = self.client.get(
+            reverse("browse"), {"category": self.music.pk, "brand": self.sony.pk}
+        )
+        self.assertEqual(list(response.context["gift_list"]), [self.walkman])
+
+    def test_pages_keep_the_filters(self):
+        response = self.client.get(
+            reverse("browse"), {"category": self.music.pk, "page_size": 1}
+        )
+        self.assertContains(response, f"?category={self.music.pk}&amp;cursor=")
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse("browse"), {"brand": "apple"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_api(self):
+        response = self.client.get(
+            reverse("gift-browse"), {"made_in": self.china.pk, "brand": self.apple.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([gift["ref"] for gift in response.data["results"]], ["ref1"])
+        self.assertEqual(response.data["total"], 1)
+        self.assertEqual(
+            response.data["facets"]["category"],
+            [
+                {"id": self.phones.pk, "name": "Phones", "count": 1},
+                {"id": self.music.pk, "name": "Music", "count": 1},
+            ],
+        )
+        response = self.client.get(reverse("gift-browse"), {"brand": "apple"})
+        self.assertEqual(response.status_code, 400)
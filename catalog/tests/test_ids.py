@@ -0,0 +1,48 @@
+import time
+import uuid
+
+from django.test import TestCase
+
+from catalog import bench
+from catalog.ids import uuid7, uuid7_int
+from catalog.models import Gift, GiftInstance
+
+
+class UUID7Test(TestCase):
+    def test_layout(self):
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        ms = value.int >> 80
+        self.assertAlmostEqual(ms / 1000, time.time(), delta=5)
+
+    def test_uuid7_int(self):
+        value = uuid.UUID(int=uuid7_int(0x0123456789AB, 0xCDE, 0x3FFFFFFFFFFFFFFF))
+        self.assertEqual(str(value), "01234567-89ab-7cde-bfff-ffffffffffff")
+
+    def test_increasing(self):
+        values = [uuid7() for _ in range(10000)]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+        # also in their database form on backends without a uuid type
+        hexes = [value.hex for value in values]
+        self.assertEqual(hexes, sorted(hexes))
+
+    def test_gift_instance_default(self):
+        gift = Gift.objects.create(name="Vase", description="A vase", ref="vase")
+        first = GiftInstance.objects.create(gift=gift)
+        second = GiftInstance.objects.create(gift=gift)
+        self.assertEqual(first.id.version, 7)
+        self.assertEqual(list(GiftInstance.objects.all()), [first, second])
+
+    def test_existing_uuid4_ids(self):
+        gift = Gift.objects.create(name="Vase", description="A vase", ref="vase")
+        old = GiftInstance.objects.create(id=uuid.uuid4(), gift=gift)
+        GiftInstance.objects.create(gift=gift)
+        self.assertEqual(GiftInstance.objects.get(pk=old.pk), old)
+
+    def test_insert_ids_benchmark(self):
+        results = bench.insert_ids(200, batch_size=50)
+        self.assertEqual(set(results), {"uuid4", "uuid7"})
+        self.assertEqual(results["uuid7"]["rows"], 200)
+        self.assertGreater(results["uuid7"]["rows_per_s"], 0)
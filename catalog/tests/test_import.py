@@ -0,0 +1,114 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from catalog import search
+from catalog.models import Brand, Category, Country, Gift
+
+CSV = """ref,name,description,brand,made_in,category
+ref1,Iphone 11,A brilliant smartphone,Apple,USA,Phones|Electronics
+ref2,MacBook,A nice laptop,Apple,China,Electronics
+ref3,Chanel No 5,A classic perfume,Chanel,France,
+"""
+
+
+class ImportCatalogTest(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = self.directory / name
+        path.write_text(content)
+        return str(path)
+
+    def run_command(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_catalog", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_csv(self):
+        out, _ = self.run_command(self.write("gifts.csv", CSV), "--batch-size=2")
+        self.assertIn("Imported 3 records", out)
+        self.assertEqual(Gift.objects.count(), 3)
+        self.assertEqual(Brand.objects.count(), 2)
+        self.assertEqual(Country.objects.count(), 3)
+        gift = Gift.objects.get(ref="ref1")
+        self.assertEqual(gift.brand.name, "Apple")
+        self.assertEqual(gift.made_in.name, "USA")
+        self.assertEqual(
+            sorted(c.name for c in gift.category.all()), ["Electronics", "Phones"]
+        )
+        self.assertFalse(Gift.objects.get(ref="ref3").category.exists())
+        self.assertEqual([g.ref for g in search.search_gifts("laptop")], ["ref2"])
+
+    def test_import_jsonl_upserts(self):
+        Category.objects.create(name="Phones")
+        Gift.objects.create(name="Old", description="Old", ref="ref1")
+        lines = [
+            {"ref": "ref1", "name": "Iphone 12", "brand": "Apple", "category": "Phones"},
+            {"ref": "ref4", "name": "Watch", "category": ["Watches", "Phones"]},
+        ]
+        path = self.write("gifts.jsonl", "\n".join(json.dumps(l) for l in lines))
+        out, _ = self.run_command(path)
+        self.assertIn("1 created, 1 updated", out)
+        gift = Gift.objects.get(ref="ref1")
+        self.assertEqual(gift.name, "Iphone 12")
+        self.assertEqual([c.name for c in gift.category.all()], ["Phones"])
+        self.assertEqual(Gift.objects.get(ref="ref4").category.count(), 2)
+
+    def test_on_conflict_ignore(self):
+        Gift.objects.create(name="Old", description="Old", ref="ref1")
+        out, _ = self.run_command(self.write("gifts.csv", CSV), "--on-conflict=ignore")
+        self.assertIn("2 created, 0 updated, 1 skipped", out)
+        self.assertEqual(Gift.objects.get(ref="ref1").name, "Old")
+
+    def test_invalid_records_are_skipped(self):
+        content = CSV + ",No ref,,,,\nref-that-is-far-too-long,Name,,,,\n"
+        out, err = self.run_command(self.write("gifts.csv", content))
+        self.assertIn("Record 4 skipped", err)
+        self.assertIn("Record 5 skipped", err)
+        self.assertEqual(Gift.objects.count(), 3)
+
+    def test_invalid_json_records_are_skipped(self):
+        lines = [
+            {"ref": 1001, "name": 42, "brand": 7, "category": [3, "Phones"]},
+            {"ref": {"nested": True}, "name": "Nested"},
+            [1, 2],
+            "not json",
+            {"ref": "ref2", "name": "MacBook", "category": "Electronics"},
+        ]
+        content = "\n".join(
+            line if isinstance(line, str) else json.dumps(line) for line in lines
+        )
+        out, err = self.run_command(self.write("gifts.jsonl", content))
+        self.assertIn("2 created, 0 updated, 3 skipped", out)
+        for number in (2, 3, 4):
+            self.assertIn(f"Record {number} skipped", err)
+        gift = Gift.objects.get(ref="1001")
+        self.assertEqual((gift.name, gift.brand.name), ("42", "7"))
+        self.assertEqual(sorted(gift.category_names), ["3", "Phones"])
+        self.assertEqual(Gift.objects.get(ref="ref2").category_names, ["Electronics"])
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = self.directory / "checkpoint.json"
+        checkpoint.write_text(json.dumps({"records": 2}))
+        out, _ = self.run_command(
+            self.write("gifts.csv", CSV), f"--checkpoint={checkpoint}", "--resume"
+        )
+        self.assertIn("Resuming after record 2", out)
+        self.assertEqual(list(Gift.objects.values_list("ref", flat=True)), ["ref3"])
+        self.assertEqual(json.loads(checkpoint.read_text()), {"records": 3})
+
+    def test_bad_arguments(self):
+        with self.assertRaises(CommandError):
+            self.run_command(str(self.directory / "missing.csv"))
+        with self.assertRaises(CommandError):
+            self.run_command(self.write("gifts.xml", ""))
+        with self.assertRaises(CommandError):
+            self.run_command(self.write("gifts.csv", CSV), "--resume")
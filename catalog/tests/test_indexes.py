@@ -0,0 +1,65 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from catalog.models import Gift, GiftInstance
+from catalog.views import GiftInstanceListView
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "EXPLAIN output differs")
+class GiftInstanceIndexTest(TestCase):
+    """The hot GiftInstance queries are answered from the tailored indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="johnsmith")
+        cls.gift = Gift.objects.create(name="Iphone", description="Phone", ref="ref")
+        GiftInstance.objects.create(
+            gift=cls.gift, requester=cls.user, event_date=date(2021, 12, 25)
+        )
+
+    def plan(self, queryset):
+        if connection.vendor == "postgresql":
+            # a tiny table would otherwise always be scanned
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, name):
+        self.assertIn(name, self.plan(queryset))
+
+    def test_my_gifts(self):
+        view = GiftInstanceListView()
+        view.request = SimpleNamespace(user=self.user)
+        queryset = view.get_queryset()
+        self.assertUsesIndex(queryset, "gi_requester_event_date_idx")
+        # the next keyset page
+        self.assertUsesIndex(
+            queryset.filter(event_date__gt=date(2021, 1, 1))[:3],
+            "gi_requester_event_date_idx",
+        )
+
+    def test_instances_of_gift(self):
+        self.assertUsesIndex(
+            GiftInstance.objects.filter(gift__in=[self.gift]), "gi_gift_status_idx"
+        )
+        self.assertUsesIndex(
+            GiftInstance.objects.filter(gift=self.gift, status="a"),
+            "gi_gift_status_idx",
+        )
+
+    def test_available_by_date(self):
+        queryset = GiftInstance.objects.filter(
+            status="a", event_date__gte=date(2021, 1, 1)
+        ).order_by("event_date")
+        self.assertUsesIndex(queryset, "gi_available_event_date_idx")
+
+    def test_event_date_range(self):
+        queryset = GiftInstance.objects.filter(
+            event_date__gte=date(2021, 1, 1), event_date__lt=date(2022, 1, 1)
+        )
+        self.assertUsesIndex(queryset, "gi_event_date_idx")
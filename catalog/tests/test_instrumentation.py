@@ -0,0 +1,53 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Brand
+from giftlist.instrumentation import normalize_sql
+
+
+class NormalizeSqlTest(TestCase):
+    def test_literals(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x''y' AND b > 10.5 LIMIT 3"),
+            "SELECT * FROM t WHERE a = ? AND b > ? LIMIT ?",
+        )
+
+    def test_in_lists_and_whitespace(self):
+        self.assertEqual(
+            normalize_sql('SELECT "id"\n  FROM t WHERE "id" IN (%s, %s, %s)'),
+            'SELECT "id" FROM t WHERE "id" IN (...)',
+        )
+
+
+class SQLInstrumentationMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Brand.objects.create(name="Apple", est=1976)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("brands"))
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("app;dur=", timing)
+
+    @override_settings(SQL_INSTRUMENTATION={"SERVER_TIMING": False})
+    def test_server_timing_disabled(self):
+        response = self.client.get(reverse("brands"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SQL_INSTRUMENTATION={"SAMPLE_RATE": 0.0})
+    def test_not_sampled(self):
+        response = self.client.get(reverse("brands"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(SQL_INSTRUMENTATION={"SLOW_QUERY_MS": 0})
+    def test_slow_query_log(self):
+        with self.assertLogs("giftlist.sql", "WARNING") as logs:
+            self.client.get(reverse("brands"))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["event"], "slow_query")
+        self.assertEqual(entry["path"], reverse("brands"))
+        self.assertEqual(entry["database"], "default")
+        self.assertIn("SELECT", entry["sql"])
@@ -0,0 +1,145 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Brand, Gift, GiftInstance
+from catalog.pagination import KeysetPaginator, encode_cursor
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        test_gift = Gift.objects.create(name="Iphone 11", ref="ref 0")
+        # include ties and NULLs on the first key
+        for event_date in [
+            date(2021, 12, 25),
+            None,
+            date(2021, 11, 5),
+            date(2021, 12, 25),
+            None,
+            date(2021, 11, 5),
+            date(2022, 1, 1),
+        ]:
+            GiftInstance.objects.create(gift=test_gift, event_date=event_date)
+
+    def paginator(self, per_page):
+        return KeysetPaginator(
+            GiftInstance.objects.all(), ("event_date", "id"), per_page
+        )
+
+    def expected(self):
+        instances = list(GiftInstance.objects.all())
+        return sorted(
+            instances, key=lambda i: (i.event_date is not None, i.event_date, i.id)
+        )
+
+    def test_walks_forward_over_every_row(self):
+        paginator = self.paginator(3)
+        page = paginator.page()
+        self.assertFalse(page.has_previous())
+        seen = list(page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.expected())
+        self.assertEqual(len(page), 1)
+
+    def test_walks_back(self):
+        paginator = self.paginator(2)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(back.object_list, second.object_list)
+        self.assertTrue(back.has_next())
+        back = paginator.page(back.previous_cursor)
+        self.assertEqual(back.object_list, first.object_list)
+        self.assertFalse(back.has_previous())
+
+    def test_constant_query_count(self):
+        paginator = self.paginator(2)
+        page = paginator.page()
+        while page.has_next():
+            with self.assertNumQueries(1):
+                page = paginator.page(page.next_cursor)
+
+
+class KeysetListViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(1, 6):
+            Brand.objects.create(name=f"Brand {i}", est=1900 + i)
+        for gift_id in range(7):
+            Gift.objects.create(ref=f"ref {gift_id}", name=f"Iphone {gift_id}")
+        User.objects.create(username="johnsmith", password="password")
+
+    def test_gift_list_cursor(self):
+        response = self.client.get(reverse("gifts"))
+        page = response.context["page_obj"]
+        self.assertIsNotNone(page.next_cursor)
+        self.assertContains(response, f"?cursor={page.next_cursor}")
+        self.assertNotContains(response, "Page 1 of")
+
+        response = self.client.get(reverse("gifts"), {"cursor": page.next_cursor})
+        self.assertEqual(
+            [gift.ref for gift in response.context["gift_list"]],
+            ["ref 3", "ref 4", "ref 5"],
+        )
+        self.assertTrue(response.context["page_obj"].has_previous())
+
+    def test_brand_list_cursor(self):
+        response = self.client.get(reverse("brands"))
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("brands"), {"cursor": cursor})
+        self.assertEqual(
+            [brand.name for brand in response.context["brand_list"]],
+            ["Brand 3", "Brand 4"],
+        )
+
+    def test_giftinstance_list_cursor(self):
+        user = User.objects.get(username="johnsmith")
+        gift = Gift.objects.get(ref="ref 0")
+        for day in range(1, 6):
+            GiftInstance.objects.create(
+                gift=gift, requester=user, event_date=date(2021, 12, day)
+            )
+        self.client.force_login(user)
+        response = self.client.get(reverse("mygifts"))
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("mygifts"), {"cursor": cursor})
+        self.assertEqual(
+            [i.event_date.day for i in response.context["giftinstance_list"]], [4, 5]
+        )
+        self.assertFalse(response.context["page_obj"].has_next())
+
+    def test_page_size(self):
+        response = self.client.get(reverse("gifts"), {"page_size": 5})
+        self.assertEqual(len(response.context["gift_list"]), 5)
+        # the page size is carried by the cursor
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("gifts"), {"cursor": cursor})
+        self.assertEqual(len(response.context["gift_list"]), 2)
+
+    @override_settings(CATALOG_MAX_PAGE_SIZE=4)
+    def test_page_size_limit(self):
+        response = self.client.get(reverse("gifts"), {"page_size": 50})
+        self.assertEqual(len(response.context["gift_list"]), 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("gifts"), {"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 404)
+        bad_key = encode_cursor({"k": ["abc"], "s": 3})
+        response = self.client.get(reverse("gifts"), {"cursor": bad_key})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_parameter_uses_offset(self):
+        response = self.client.get(reverse("gifts"), {"page": 3})
+        self.assertEqual(len(response.context["gift_list"]), 1)
+        self.assertContains(response, "Page 3 of 3.")
+
+    @override_settings(CATALOG_PAGINATION="offset")
+    def test_offset_mode(self):
+        response = self.client.get(reverse("gifts"))
+        self.assertContains(response, "Page 1 of 3.")
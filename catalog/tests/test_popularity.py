@@ -0,0 +1,164 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from catalog import popularity
+from catalog.models import Brand, Gift, ViewCount
+
+
+def totals():
+    return {
+        (kind, object_id): views
+        for kind, object_id, views in ViewCount.objects.values_list(
+            "kind", "object_id", "views"
+        )
+    }
+
+
+class PopularityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="Apple")
+        cls.gifts = [
+            Gift.objects.create(name=f"Gift {n}", ref=f"ref{n}", brand=cls.brand)
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        popularity.buffer.take()
+
+
+class ViewBufferTest(PopularityTestCase):
+    def test_detail_views_are_buffered(self):
+        gift = self.gifts[0]
+        url = reverse("gift-detail", args=[gift.pk])
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.client.get(reverse("brand-detail", args=[self.brand.pk]))
+        self.client.get(reverse("gift-detail", args=[9999]))
+
+        # nothing is written inside the test's transaction
+        self.assertFalse(ViewCount.objects.exists())
+        self.assertEqual(popularity.buffer.flush(shard=1), 3)
+        self.assertEqual(
+            totals(), {("gift", gift.pk): 2, ("brand", self.brand.pk): 1}
+        )
+
+    def test_flushes_add_up(self):
+        buffer = popularity.ViewBuffer()
+        buffer.add(Gift, self.gifts[0].pk, 2)
+        buffer.add(Gift, self.gifts[1].pk)
+        buffer.flush(shard=1)
+        buffer.add(Gift, self.gifts[0].pk)
+        buffer.flush(shard=1)
+        buffer.add(Gift, self.gifts[0].pk)
+        buffer.flush(shard=2)
+        self.assertEqual(ViewCount.objects.count(), 3)
+        self.assertEqual(
+            ViewCount.objects.get(object_id=self.gifts[0].pk, shard=1).views, 3
+        )
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_large_flush_is_batched(self):
+        buffer = popularity.ViewBuffer()
+        for pk in range(1, 1201):
+            buffer.add(Gift, pk)
+        self.assertEqual(buffer.flush(shard=0), 1200)
+        self.assertEqual(ViewCount.objects.count(), 1200)
+
+    def test_due(self):
+        buffer = popularity.ViewBuffer()
+        config = {"FLUSH_SIZE": 2, "FLUSH_INTERVAL": 60}
+        self.assertFalse(buffer.due(config))
+        buffer.add(Gift, 1)
+        self.assertFalse(buffer.due(config))
+        self.assertTrue(buffer.due({**config, "FLUSH_INTERVAL": 0}))
+        buffer.add(Gift, 1)
+        self.assertTrue(buffer.due(config))
+
+    @override_settings(VIEW_COUNTS={"ENABLED": False})
+    def test_disabled(self):
+        self.client.get(reverse("gift-detail", args=[self.gifts[0].pk]))
+        self.assertEqual(popularity.buffer.flush(), 0)
+
+
+class MostViewedTest(PopularityTestCase):
+    def test_most_viewed(self):
+        first, second, third = self.gifts
+        ViewCount.objects.bulk_create(
+            [
+                ViewCount(kind="gift", object_id=first.pk, shard=0, views=5),
+                ViewCount(kind="gift", object_id=first.pk, shard=3, views=5),
+                ViewCount(kind="gift", object_id=second.pk, shard=0, views=20),
+                ViewCount(kind="gift", object_id=9999, shard=0, views=50),
+                ViewCount(kind="brand", object_id=self.brand.pk, shard=0, views=1),
+            ]
+        )
+        gifts = popularity.most_viewed(Gift)
+        self.assertEqual(
+            [(gift, gift.views) for gift in gifts], [(second, 20), (first, 10)]
+        )
+
+        response = self.client.get(reverse("most-viewed"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Gift 1</a> (20 views)")
+        self.assertContains(response, "Apple</a> (1 views)")
+        self.assertNotContains(response, third.name)
+
+    def test_most_viewed_is_cached(self):
+        popularity.most_viewed(Gift)
+        with self.assertNumQueries(0):
+            popularity.most_viewed(Gift)
+
+
+class CompactTest(PopularityTestCase):
+    def setUp(self):
+        super().setUp()
+        first, second, _ = self.gifts
+        ViewCount.objects.bulk_create(
+            [
+                ViewCount(kind="gift", object_id=first.pk, shard=0, views=1),
+                ViewCount(kind="gift", object_id=first.pk, shard=4, views=2),
+                ViewCount(kind="gift", object_id=first.pk, shard=7, views=3),
+                ViewCount(kind="gift", object_id=second.pk, shard=2, views=4),
+                ViewCount(kind="gift", object_id=9999, shard=1, views=5),
+                ViewCount(kind="brand", object_id=self.brand.pk, shard=9, views=6),
+            ]
+        )
+
+    def test_compact(self):
+        self.assertEqual(popularity.compact(batch_size=1), 5)
+        self.assertEqual(
+            totals(),
+            {
+                ("gift", self.gifts[0].pk): 6,
+                ("gift", self.gifts[1].pk): 4,
+                ("gift", 9999): 5,
+                ("brand", self.brand.pk): 6,
+            },
+        )
+        self.assertFalse(ViewCount.objects.exclude(shard=0).exists())
+
+    def test_command_prunes(self):
+        out = StringIO()
+        call_command("compact_view_counts", "--prune", stdout=out)
+        self.assertIn("Removed 6 view count rows.", out.getvalue())
+        self.assertNotIn(("gift", 9999), totals())
+        self.assertEqual(ViewCount.objects.count(), 3)
+
+
+class FlushOnRequestFinishedTest(TransactionTestCase):
+    def setUp(self):
+        popularity.buffer.take()
+
+    @override_settings(VIEW_COUNTS={"FLUSH_INTERVAL": 0})
+    def test_flush_after_response(self):
+        brand = Brand.objects.create(name="Apple")
+        self.client.get(reverse("brand-detail", args=[brand.pk]))
+        self.assertEqual(totals(), {("brand", brand.pk): 1})
+        self.assertEqual(ViewCount.objects.get().shard, popularity.worker_shard())
@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Brand
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Brand.objects.create(name="Apple", est=1976)
+        User.objects.create(username="staff", is_staff=True)
+        User.objects.create(username="johnsmith")
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(PROFILING={"DIR": self.directory})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def reports(self):
+        return sorted(path.suffix for path in self.directory.iterdir())
+
+    def test_staff_query_parameter(self):
+        self.client.force_login(User.objects.get(username="staff"))
+        response = self.client.get(reverse("brands"), {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["X-Profile-Report"].startswith("brands-"))
+        self.assertEqual(self.reports(), [".collapsed", ".prof"])
+
+    def test_staff_header(self):
+        self.client.force_login(User.objects.get(username="staff"))
+        self.client.get(reverse("brands"), HTTP_X_PROFILE="1")
+        self.assertEqual(self.reports(), [".collapsed", ".prof"])
+
+    def test_not_staff(self):
+        self.client.force_login(User.objects.get(username="johnsmith"))
+        response = self.client.get(reverse("brands"), {"profile": "1"})
+        self.assertNotIn("X-Profile-Report", response)
+        self.assertEqual(self.reports(), [])
+
+    def test_sampling(self):
+        with self.settings(PROFILING={"DIR": self.directory, "SAMPLE_EVERY": 1}):
+            response = self.client.get(reverse("brands"))
+        self.assertNotIn("X-Profile-Report", response)
+        self.assertEqual(self.reports(), [".collapsed", ".prof"])
+
+    def test_profile_view_command(self):
+        out = StringIO()
+        call_command(
+            "profile_view", reverse("brands"), "--repeat=2", "--save", stdout=out
+        )
+        self.assertIn("function calls", out.getvalue())
+        self.assertIn("Report written to", out.getvalue())
+        self.assertEqual(self.reports(), [".collapsed", ".prof"])
+
+    def test_profile_view_command_errors(self):
+        with self.assertRaises(CommandError):
+            call_command("profile_view", "/catalog/missing/", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("profile_view", "/", "--user=nobody", stdout=StringIO())
@@ -0,0 +1,241 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import popularity
+from catalog.budgets import QueryBudgetExceeded, query_budget, uncounted
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+
+SIZES = (1, 10, 100)
+
+
+def seed(size):
+    """Create size gifts with brands, categories, countries and instances."""
+    user, _ = User.objects.get_or_create(username="johnsmith")
+    brand = Brand.objects.create(name=f"Brand {size}", est=1950)
+    country = Country.objects.create(name=f"Country {size}")
+    categories = [Category.objects.create(name=f"Category {size} {i}") for i in range(3)]
+    for i in range(size):
+        gift = Gift.objects.create(
+            name=f"Gift {size} {i}",
+            description="A gift",
+            ref=f"ref {size} {i}",
+            brand=brand,
+            made_in=country,
+        )
+        gift.category.add(*categories)
+        for day in (1, 2):
+            GiftInstance.objects.create(
+                gift=gift, requester=user, event_date=date(2021, 12, day)
+            )
+    return brand, gift
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+    """Every view must stay within its budget and run the same number of
+    queries whatever the data size."""
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url, login=False):
+        if login:
+            self.client.force_login(User.objects.get(username="johnsmith"))
+        # warm the caches (stats, change stamps) so only steady state is counted
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstant(self, url_for, login=False):
+        counts = []
+        for size in SIZES:
+            brand, gift = seed(size)
+            counts.append(self.count_queries(url_for(brand, gift), login))
+        self.assertEqual(len(set(counts)), 1, f"query counts grew: {counts}")
+
+    def test_index(self):
+        self.assertConstant(lambda brand, gift: reverse("index"))
+
+    def test_gift_list(self):
+        self.assertConstant(lambda brand, gift: reverse("gifts") + "?page_size=100")
+
+    def test_gift_detail(self):
+        self.assertConstant(
+            lambda brand, gift: reverse("gift-detail", kwargs={"pk": gift.pk})
+        )
+
+    def test_gift_detail_logged_in(self):
+        self.assertConstant(
+            lambda brand, gift: reverse("gift-detail", kwargs={"pk": gift.pk}),
+            login=True,
+        )
+
+    def test_brand_list(self):
+        self.assertConstant(lambda brand, gift: reverse("brands") + "?page_size=100")
+
+    def test_brand_detail(self):
+        self.assertConstant(
+            lambda brand, gift: reverse("brand-detail", kwargs={"pk": brand.pk})
+        )
+
+    def test_my_gifts(self):
+        self.assertConstant(
+            lambda brand, gift: reverse("mygifts") + "?page_size=100", login=True
+        )
+
+    def test_giftinstance_update(self):
+        self.assertConstant(
+            lambda brand, gift: gift.giftinstance_set.first().get_absolute_url(),
+            login=True,
+        )
+
+    def test_search(self):
+        self.assertConstant(lambda brand, gift: reverse("search") + "?q=gift")
+
+    def test_giftinstance_update_post(self):
+        brand, gift = seed(10)
+        self.client.force_login(User.objects.get(username="johnsmith"))
+        url = gift.giftinstance_set.first().get_absolute_url()
+        data = {
+            "gift": gift.pk,
+            "event_date": "2021-12-31",
+            "size": "Large",
+            "colour": "Red",
+            "price": "10.00",
+            "url": "https://example.com",
+            "requester": "",
+        }
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("mygifts"))
+        # an invalid form is rendered again
+        response = self.client.post(url, {**data, "url": "not a url"})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ColdCacheBudgetTest(TestCase):
+    """Budgets must also hold for a logged-in user on the first request after
+    the caches were emptied, when the statistics and lists are refilled."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand, cls.gift = seed(10)
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username="johnsmith"))
+        self.client.get(reverse("gift-detail", kwargs={"pk": self.gift.pk}))
+        self.client.get(reverse("brand-detail", kwargs={"pk": self.brand.pk}))
+        popularity.buffer.flush()
+        cache.clear()
+
+    def assertWithinBudget(self, url):
+        cold = self.client.get(url)
+        self.assertEqual(cold.status_code, 200)
+        # refills are not counted, so the cold request counts as a warm one
+        warm = self.client.get(url)
+        self.assertEqual(cold.query_count, warm.query_count)
+
+    def test_index(self):
+        self.assertWithinBudget(reverse("index"))
+
+    def test_search(self):
+        self.assertWithinBudget(reverse("search") + "?q=gift")
+
+    def test_most_viewed(self):
+        self.assertWithinBudget(reverse("most-viewed"))
+
+    def test_gift_list(self):
+        self.assertWithinBudget(reverse("gifts"))
+
+    def test_gift_detail(self):
+        self.assertWithinBudget(reverse("gift-detail", kwargs={"pk": self.gift.pk}))
+
+    def test_brand_list(self):
+        self.assertWithinBudget(reverse("brands"))
+
+    def test_brand_detail(self):
+        self.assertWithinBudget(reverse("brand-detail", kwargs={"pk": self.brand.pk}))
+
+    def test_my_gifts(self):
+        self.assertWithinBudget(reverse("mygifts"))
+
+    def test_offset_pages(self):
+        for name in ("gifts", "brands", "mygifts"):
+            with self.subTest(name):
+                self.assertWithinBudget(reverse(name) + "?page=1")
+                with override_settings(CATALOG_PAGINATION="offset"):
+                    self.assertWithinBudget(reverse(name))
+
+    def test_giftinstance_update(self):
+        instance = self.gift.giftinstance_set.first()
+        self.assertWithinBudget(instance.get_absolute_url())
+
+    def test_browse(self):
+        self.assertWithinBudget(reverse("browse"))
+        brand = f"?brand={self.brand.pk}"
+        self.assertWithinBudget(reverse("browse") + brand)
+
+    def test_browse_api(self):
+        self.assertWithinBudget(reverse("gift-browse"))
+
+
+class QueryBudgetDecoratorTest(TestCase):
+    def setUp(self):
+        Brand.objects.create(name="Apple")
+
+    def test_counts_queries(self):
+        @query_budget(2)
+        def view(request):
+            list(Brand.objects.all())
+            list(Brand.objects.all())
+            return _Response()
+
+        response = view(RequestFactory().get("/"))
+        self.assertEqual(response.query_count, 2)
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_raises_over_budget(self):
+        @query_budget(1)
+        def view(request):
+            list(Brand.objects.all())
+            list(Brand.objects.all())
+            return _Response()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get("/"))
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_uncounted_queries(self):
+        @query_budget(1)
+        def view(request):
+            list(Brand.objects.all())
+            with uncounted():
+                list(Brand.objects.all())
+            return _Response()
+
+        response = view(RequestFactory().get("/"))
+        self.assertEqual(response.query_count, 1)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_logs_over_budget(self):
+        @query_budget(0)
+        def view(request):
+            list(Brand.objects.all())
+            return _Response()
+
+        with self.assertLogs("catalog.budgets", "WARNING") as logs:
+            view(RequestFactory().get("/"))
+        self.assertIn("over its budget of 0", logs.output[0])
+
+
+class _Response:
+    pass
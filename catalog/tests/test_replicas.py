@@ -0,0 +1,122 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import router
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from catalog.models import Brand, Gift
+from giftlist import replicas
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaReadsTest(TransactionTestCase):
+    """The replica only sees what sync_replicas copied to it, so reads that
+    went to the replica miss the rows created since."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.brand = Brand.objects.create(name="Apple")
+        self.gift = Gift.objects.create(name="Iphone", ref="ref1", brand=self.brand)
+        call_command("sync_replicas", stdout=StringIO())
+        self.new_brand = Brand.objects.create(name="Chanel")
+
+    def test_detail_views_read_the_replica(self):
+        response = self.client.get(reverse("brand-detail", args=[self.brand.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("brand-detail", args=[self.new_brand.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("gift-detail", args=[self.gift.pk]))
+        self.assertContains(response, "Iphone")
+
+    def test_list_views_read_the_replica(self):
+        response = self.client.get(reverse("brands"))
+        self.assertEqual(list(response.context["brand_list"]), [self.brand])
+
+        response = self.client.get(reverse("brand-list"))
+        self.assertEqual(
+            [brand["name"] for brand in response.data["results"]], ["Apple"]
+        )
+
+        response = self.client.get(reverse("brand-list"), {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Apple"])
+
+    def test_replica_responses_have_no_validators(self):
+        urls = [reverse("gift-detail", args=[self.gift.pk]), reverse("brand-list")]
+        for url in urls:
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("ETag", response)
+                self.assertNotIn("Last-Modified", response)
+
+        # reads on the primary are validated as before
+        self.client.cookies[replicas.STICKY_COOKIE] = "1"
+        for url in urls:
+            with self.subTest(url):
+                etag = self.client.get(url)["ETag"]
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        User.objects.create_user(username="buyer", password="password")
+        response = self.client.post(
+            reverse("login"), {"username": "buyer", "password": "password"}
+        )
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+        self.assertEqual(
+            response.cookies[replicas.STICKY_COOKIE]["max-age"],
+            replicas.sticky_seconds(),
+        )
+        response = self.client.get(reverse("brand-detail", args=[self.new_brand.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_go_to_the_primary(self):
+        response = self.client.post(
+            reverse("brand-list"), {"name": "Hermes"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Brand.objects.filter(name="Hermes").exists())
+        self.assertFalse(Brand.objects.using("replica").filter(name="Hermes").exists())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_reads_the_primary(self):
+        response = self.client.get(reverse("brand-detail", args=[self.new_brand.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse("login"), {"username": "nobody"})
+        self.assertNotIn(replicas.STICKY_COOKIE, response.cookies)
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_routing(self):
+        self.assertEqual(router.db_for_read(Gift), "default")
+        with replicas.reading_from("replica"):
+            self.assertEqual(router.db_for_read(Gift), "replica")
+            self.assertEqual(router.db_for_write(Gift), "default")
+        self.assertEqual(router.db_for_read(Gift), "default")
+
+        gift, brand = Gift(), Brand()
+        gift._state.db, brand._state.db = "replica", "default"
+        self.assertTrue(replicas.ReplicaRouter().allow_relation(gift, brand))
+
+    @override_settings(DATABASE_REPLICAS=["replica", "replica2"])
+    def test_choose_replica(self):
+        request = RequestFactory().get("/")
+        self.assertIn(replicas.choose_replica(request), ["replica", "replica2"])
+        request.COOKIES[replicas.STICKY_COOKIE] = "1"
+        self.assertIsNone(replicas.choose_replica(request))
+
+    def test_sync_replicas_needs_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_replicas")
+        with self.assertRaises(CommandError):
+            call_command("sync_replicas", "--database", "default")
@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog import search
+from catalog.models import Brand, Category, Gift
+
+
+class GiftSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        chanel = Brand.objects.create(name="Chanel", est=1910)
+        apple = Brand.objects.create(name="Apple", est=1976)
+        fragrance = Category.objects.create(name="Fragrance")
+
+        perfume = Gift.objects.create(
+            name="Chanel No 5",
+            description="A classic perfume",
+            ref="ref1",
+            brand=chanel,
+        )
+        perfume.category.add(fragrance)
+        Gift.objects.create(
+            name="Iphone 11",
+            description="A brilliant smartphone, not a perfume",
+            ref="ref2",
+            brand=apple,
+        )
+        Gift.objects.create(
+            name="MacBook",
+            description="A nice laptop",
+            ref="ref3",
+            brand=apple,
+        )
+
+    def names(self, text):
+        return [gift.name for gift in search.search_gifts(text)]
+
+    def name_set(self, text):
+        return set(self.names(text))
+
+    def test_matches_name_and_description(self):
+        self.assertEqual(self.names("laptop"), ["MacBook"])
+        self.assertEqual(self.names("macbook"), ["MacBook"])
+
+    def test_ranks_name_above_description(self):
+        Gift.objects.create(
+            name="Perfume set", description="Three bottles", ref="ref4"
+        )
+        self.assertEqual(self.names("perfume")[0], "Perfume set")
+
+    def test_matches_brand_and_category(self):
+        self.assertEqual(self.name_set("apple"), {"Iphone 11", "MacBook"})
+        self.assertEqual(self.names("fragrance"), ["Chanel No 5"])
+
+    def test_prefix_and_all_words(self):
+        self.assertEqual(self.names("smart"), ["Iphone 11"])
+        self.assertEqual(self.names("apple laptop"), ["MacBook"])
+
+    def test_syntax_is_not_interpreted(self):
+        self.assertEqual(self.names('"laptop ('), ["MacBook"])
+        self.assertEqual(self.names("*"), [])
+
+    def test_index_follows_changes(self):
+        gift = Gift.objects.get(ref="ref3")
+        gift.name = "Chromebook"
+        gift.save()
+        self.assertEqual(self.names("macbook"), [])
+        self.assertEqual(self.names("chromebook"), ["Chromebook"])
+
+        gift.category.add(Category.objects.get(name="Fragrance"))
+        self.assertIn("Chromebook", self.names("fragrance"))
+
+        Category.objects.get(name="Fragrance").gift_set.clear()
+        self.assertEqual(self.names("fragrance"), [])
+
+        brand = Brand.objects.get(name="Apple")
+        brand.name = "Pear"
+        brand.save()
+        self.assertEqual(self.name_set("pear"), {"Iphone 11", "Chromebook"})
+
+        gift.delete()
+        self.assertEqual(self.names("chromebook"), [])
+
+    def test_rebuild_command(self):
+        search.remove_gifts(Gift.objects.values_list("pk", flat=True))
+        self.assertEqual(self.names("apple"), [])
+        out = StringIO()
+        call_command("rebuild_search_index", "--batch-size=2", stdout=out)
+        self.assertIn("Indexed 3 gifts", out.getvalue())
+        self.assertEqual(self.name_set("apple"), {"Iphone 11", "MacBook"})
+
+    def test_search_view(self):
+        response = self.client.get(reverse("search") + "?q=laptop")
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "catalog/search.html")
+        self.assertEqual(
+            [gift.name for gift in response.context["gift_list"]], ["MacBook"]
+        )
+
+    def test_search_view_without_query(self):
+        response = self.client.get(reverse("search"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["gift_list"], [])
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import CommandError, OutputWrapper
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from catalog.sessions import clear_expired
+
+
+class ClearExpiredSessionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [
+                Session(
+                    session_key=f"expired{n:05d}",
+                    session_data="",
+                    expire_date=now - timedelta(days=1),
+                )
+                for n in range(25)
+            ]
+            + [
+                Session(
+                    session_key=f"live{n:05d}",
+                    session_data="",
+                    expire_date=now + timedelta(days=1),
+                )
+                for n in range(5)
+            ]
+        )
+
+    def test_deletes_only_expired_sessions_in_batches(self):
+        out = StringIO()
+        self.assertEqual(clear_expired(batch_size=10, stdout=OutputWrapper(out)), 25)
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            [f"Deleted {total} expired sessions" for total in (10, 20, 25)],
+        )
+        self.assertEqual(Session.objects.count(), 5)
+        self.assertFalse(
+            Session.objects.filter(expire_date__lt=timezone.now()).exists()
+        )
+
+    def test_command(self):
+        out = StringIO()
+        call_command("clear_expired_sessions", "--batch-size", "7", stdout=out)
+        self.assertIn("Deleted 25 expired sessions.", out.getvalue())
+        self.assertEqual(Session.objects.count(), 5)
+
+    def test_command_rejects_bad_batch_size(self):
+        with self.assertRaises(CommandError):
+            call_command("clear_expired_sessions", "--batch-size", "0")
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_engines_without_rows_are_left_alone(self):
+        out = StringIO()
+        call_command("clear_expired_sessions", stdout=out)
+        self.assertIn("cleared by the session engine", out.getvalue())
+        self.assertEqual(Session.objects.count(), 30)
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from catalog import bench
+from giftlist import retry
+from giftlist.sqlite3.base import get_pragmas
+
+NO_DELAY = {"ATTEMPTS": 3, "BASE_DELAY": 0, "MAX_DELAY": 0}
+
+
+class PragmasTest(TestCase):
+    def test_connection_is_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], get_pragmas()["busy_timeout"])
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], get_pragmas()["cache_size"])
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": None, "cache_size": -1024})
+    def test_settings_override_defaults(self):
+        pragmas = get_pragmas()
+        self.assertIsNone(pragmas["journal_mode"])
+        self.assertEqual(pragmas["cache_size"], -1024)
+        self.assertEqual(pragmas["synchronous"], "NORMAL")
+
+
+@override_settings(DB_LOCK_RETRY=NO_DELAY)
+class RetryOnLockTest(SimpleTestCase):
+    databases = {"default"}
+
+    def locked_then(self, failures, error=None):
+        calls = []
+
+        @retry.retry_on_lock
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise error or OperationalError("database is locked")
+            return "written"
+
+        return write, calls
+
+    def test_retries_until_written(self):
+        write, calls = self.locked_then(2)
+        self.assertEqual(write(), "written")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_attempts(self):
+        write, calls = self.locked_then(3)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.locked_then(1, OperationalError("no such table: x"))
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+    def test_not_retried_inside_a_transaction(self):
+        write, calls = self.locked_then(1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write()
+        self.assertEqual(len(calls), 1)
+
+    def test_backoff_grows_up_to_max_delay(self):
+        config = {"BASE_DELAY": 0.1, "MAX_DELAY": 0.3}
+        with mock.patch("random.uniform", return_value=1):
+            delays = [retry.backoff(attempt, config) for attempt in range(1, 5)]
+        self.assertEqual(delays, [0.1, 0.2, 0.3, 0.3])
+
+
+class SQLiteLocksTest(SimpleTestCase):
+    def test_no_write_is_lost(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for pragmas in (bench.SQLITE_BASELINE, get_pragmas()):
+                path = Path(directory) / f"{len(pragmas)}.sqlite3"
+                result = bench.sqlite_locks(
+                    path, pragmas, readers=2, writers=2, duration=0.2, rows=50
+                )
+                self.assertTrue(result["consistent"])
+                self.assertEqual(result["failed_writes"], 0)
+                self.assertGreater(result["reads_per_s"], 0)
+                self.assertGreater(result["writes_per_s"], 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "stress_sqlite", "--duration", "0.1", stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report["results"]), {"default", "tuned"})
+        self.assertEqual(report["pragmas"]["tuned"]["journal_mode"], "WAL")
+        self.assertEqual(report["meta"]["sqlite"], sqlite3.sqlite_version)
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import checks, stats
+from catalog.models import Brand, Gift, GiftInstance
+
+
+class CatalogStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        old_brand = Brand.objects.create(name="Chanel", est=1954)
+        Brand.objects.create(name="Apple", est=2001)
+        Brand.objects.create(name="Unknown")
+
+        perfume = Gift.objects.create(
+            name="Chanel Man",
+            description="A brilliant perfume",
+            ref="randomcodeABC",
+            brand=old_brand,
+        )
+        GiftInstance.objects.create(
+            gift=perfume, event_date=datetime(2021, 11, 5), status="t"
+        )
+        GiftInstance.objects.create(gift=perfume, event_date=datetime(2021, 11, 5))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_compute_stats(self):
+        with self.assertNumQueries(3):
+            result = stats.compute_stats()
+        self.assertEqual(
+            result,
+            {
+                "num_gifts": 1,
+                "num_perfume_gifts": 1,
+                "num_instances": 2,
+                "num_instances_available": 1,
+                "num_brands": 3,
+                "num_older_brands": 2,
+            },
+        )
+
+    def test_cached_in_steady_state(self):
+        stats.get_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.get_stats()["num_gifts"], 1)
+
+    def test_save_invalidates(self):
+        stats.get_stats()
+        Brand.objects.create(name="Dior", est=1946)
+        self.assertEqual(stats.get_stats()["num_brands"], 4)
+
+    def test_delete_invalidates(self):
+        stats.get_stats()
+        GiftInstance.objects.filter(status="t").get().delete()
+        self.assertEqual(stats.get_stats()["num_instances"], 1)
+
+    def test_update_invalidates(self):
+        stats.get_stats()
+        instance = GiftInstance.objects.get(status="a")
+        instance.status = "t"
+        instance.save()
+        self.assertEqual(stats.get_stats()["num_instances_available"], 0)
+
+    def test_stale_value_served_while_locked(self):
+        stats.get_stats()
+        stats.invalidate_stats()
+        # another worker is already recomputing
+        cache.add(stats.LOCK_KEY, "other", timeout=10)
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.get_stats()["num_gifts"], 1)
+
+    def test_version_lost(self):
+        stats.get_stats()
+        cache.delete(stats.VERSION_KEY)
+        stats.invalidate_stats()
+        self.assertNotEqual(stats.current_version(), 1)
+        self.assertEqual(stats.get_stats()["num_gifts"], 1)
+
+    def test_index_runs_no_count_queries(self):
+        self.client.get(reverse("index"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["num_brands"], 3)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in queries.captured_queries))
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_per_process_cache(self):
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": locmem}):
+            warnings = checks.check_shared_cache(None)
+        self.assertEqual([warning.id for warning in warnings], ["catalog.W001"])
+
+    def test_shared_cache(self):
+        memcached = {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": "127.0.0.1:11211",
+        }
+        with override_settings(CACHES={"default": memcached}):
+            self.assertEqual(checks.check_shared_cache(None), [])
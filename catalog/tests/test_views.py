@@ -1,6 +1,8 @@
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
 from django.urls import reverse
 from django.test import TestCase
 
@@ -55,9 +57,7 @@ class CatalogIndexViewTest(TestCase):
         self.assertTemplateUsed(response, "base_generic.html")
 
     def test_context(self):
-        response = self.client.get(reverse("index"))
-        request = response.wsgi_request
-        num_visits = request.session.get("num_visits", 0)
+        self.client.get(reverse("index"))
         response = self.client.get(reverse("index"))
 
         self.assertEqual(response.status_code, 200)
@@ -69,6 +69,19 @@ class CatalogIndexViewTest(TestCase):
         self.assertEqual(response.context["num_older_brands"], 1)
         self.assertEqual(response.context["num_visits"], 1)
 
+    def test_visits_do_not_write_sessions(self):
+        for _ in range(3):
+            response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["num_visits"], 2)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_tampered_visit_cookie_restarts_count(self):
+        self.client.get(reverse("index"))
+        self.client.cookies["num_visits"] = "41:forged"
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["num_visits"], 0)
+
 
 class GiftListViewTest(TestCase):
     @classmethod
@@ -4,7 +4,10 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("search/", views.search, name="search"),
+    path("popular/", views.most_viewed, name="most-viewed"),
     path("gifts/", views.GiftListView.as_view(), name="gifts"),
+    path("browse/", views.GiftBrowseView.as_view(), name="browse"),
     path("gift/<int:pk>", views.GiftDetailView.as_view(), name="gift-detail"),
     path("brands/", views.BrandListView.as_view(), name="brands"),
     path("brand/<int:pk>", views.BrandDetailView.as_view(), name="brand-detail"),
@@ -14,4 +17,14 @@ urlpatterns = [
         views.GiftInstanceUpdateView.as_view(),
         name="giftinstance-update",
     ),
+    path(
+        "mygift/<uuid:pk>/claim",
+        views.claim_gift,
+        name="giftinstance-claim",
+    ),
+    path(
+        "mygift/<uuid:pk>/release",
+        views.release_gift,
+        name="giftinstance-release",
+    ),
 ]
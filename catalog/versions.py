@@ -0,0 +1,109 @@
+"""Cheap change stamps for conditional GET.
+
+Every catalog model has an ``updated_at`` column for per-row checks. Each
+table also has a "last changed" stamp kept in the cache and moved forward by
+the signal handlers (and by bulk writes, which send no signals), which also
+covers deletions. Views build their ETag and Last-Modified headers from these
+without running the queries needed to render the page.
+
+The stamps must live in a cache shared by every worker (see CACHES in the
+settings): with a per-process cache a write on one worker never moves the
+stamps of the others, which keep answering 304 Not Modified with stale data.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from giftlist.replicas import on_replica
+
+
+def _key(model):
+    return f"catalog:changed:{model._meta.label_lower}"
+
+
+def touch(*models):
+    """Record that the tables of models have just changed."""
+    keys = [_key(model) for model in models]
+    previous = cache.get_many(keys)
+    now = time.time()
+    # always move forward, even if the clock has not ticked since last time
+    cache.set_many(
+        {key: max(now, previous.get(key, 0) + 1e-6) for key in keys}, timeout=None
+    )
+
+
+def changed_at(model):
+    """Return when the table of model last changed, as a POSIX timestamp."""
+    stamp = cache.get(_key(model))
+    if stamp is None:
+        # unknown (e.g. the cache was cleared): assume it has just changed
+        stamp = time.time()
+        cache.add(_key(model), stamp, timeout=None)
+        stamp = cache.get(_key(model), stamp)
+    return stamp
+
+
+def last_modified(*stamps):
+    """Return the latest of stamps (timestamps or datetimes) as a datetime."""
+    latest = max(
+        stamp.timestamp() if isinstance(stamp, datetime) else stamp
+        for stamp in stamps
+    )
+    return datetime.fromtimestamp(latest, tz=timezone.utc)
+
+
+def make_etag(*parts):
+    """Return an opaque entity tag built from parts."""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _row_stamps(request, model, pk, depends_on):
+    """Return (etag, last_modified) for one row and the tables it depends on.
+
+    The row's updated_at costs one query, which is only run once per request.
+    Returns (None, None) if the row does not exist.
+    """
+    cache_attr = f"_stamps_{model._meta.label_lower}_{pk}"
+    if not hasattr(request, cache_attr):
+        updated_at = (
+            model.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+        )
+        if updated_at is None:
+            stamps = (None, None)
+        else:
+            tables = [changed_at(dependency) for dependency in depends_on]
+            # pages show the user in the sidebar, so they vary by user
+            stamps = (
+                make_etag(
+                    model._meta.label_lower, pk, updated_at, tables, request.user.pk
+                ),
+                last_modified(updated_at, *tables),
+            )
+        setattr(request, cache_attr, stamps)
+    return getattr(request, cache_attr)
+
+
+def conditional_detail(model, depends_on=()):
+    """Decorate a detail view's get() to answer conditional requests.
+
+    The ETag and Last-Modified headers come from the row's updated_at and the
+    change stamps of the depends_on tables, whose rows the page also shows.
+    Pages read from a replica get neither, as the replica may lag the stamps.
+    """
+
+    def etag(request, pk):
+        if on_replica():
+            return None
+        return _row_stamps(request, model, pk, depends_on)[0]
+
+    def modified(request, pk):
+        if on_replica():
+            return None
+        return _row_stamps(request, model, pk, depends_on)[1]
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=modified))
@@ -1,67 +1,169 @@
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import render
+from django.db.models import F, Prefetch
+from django.http import Http404
+from django.utils.http import urlencode
+from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import require_POST
 
-from catalog.models import Brand, Gift, GiftInstance
+from catalog import claims, facets, popularity
+from catalog import search as gift_search
+from catalog.budgets import query_budget
+from catalog.models import Brand, Category, Country, Gift, GiftInstance
+from catalog.pagination import KeysetPaginationMixin
+from catalog.stats import get_stats
+from catalog.versions import conditional_detail
+from catalog.visits import get_visits, set_visits
+from giftlist.replicas import replica_reads
+from giftlist.retry import retry_on_lock
 
 
+@query_budget(4)
 def index(request):
     """View function for home page of site."""
 
-    # Generate counts of some of the main objects
-    num_gifts = Gift.objects.all().count()
-    num_instances = GiftInstance.objects.all().count()
+    # counts of the main objects, served from the cache in steady state
+    stats = get_stats()
 
-    # Available gifts (status = 'a')
-    num_instances_available = GiftInstance.objects.filter(status__exact="a").count()
+    # counted in a signed cookie, so anonymous visits do not write a session
+    num_visits = get_visits(request)
 
-    # The 'all()' is implied by default.
-    num_brands = Brand.objects.count()
+    context = {
+        **stats,
+        "num_visits": num_visits,
+    }
 
-    # session info
-    num_visits = request.session.get("num_visits", 0)
-    request.session["num_visits"] = num_visits + 1
+    # Render the HTML template index.html with the data in the context variable
+    response = render(request, "index.html", context=context)
+    set_visits(response, num_visits + 1)
+    return response
 
-    # random challenge
-    num_perfume_gifts = Gift.objects.filter(description__icontains="Perfume").count()
-    num_older_brands = Brand.objects.exclude(est__gt=1999).count()
 
+@query_budget(4)
+def search(request):
+    """View function for the ranked gift search page."""
+    query = request.GET.get("q", "").strip()
+    gifts = gift_search.search_gifts(query) if query else []
     context = {
-        "num_gifts": num_gifts,
-        "num_instances": num_instances,
-        "num_instances_available": num_instances_available,
-        "num_brands": num_brands,
-        "num_perfume_gifts": num_perfume_gifts,
-        "num_older_brands": num_older_brands,
-        "num_visits": num_visits,
+        "query": query,
+        "gift_list": gifts,
     }
+    return render(request, "catalog/search.html", context=context)
 
-    # Render the HTML template index.html with the data in the context variable
-    return render(request, "index.html", context=context)
 
+@query_budget(4)
+def most_viewed(request):
+    """View function for the most viewed gifts and brands."""
+    context = {
+        "gift_list": popularity.most_viewed(Gift),
+        "brand_list": popularity.most_viewed(Brand),
+    }
+    return render(request, "catalog/most_viewed.html", context=context)
 
-class GiftListView(generic.ListView):
+
+# offset pages add a COUNT to the page, session and user
+@method_decorator(query_budget(4), name="dispatch")
+@method_decorator(replica_reads, name="dispatch")
+class GiftListView(KeysetPaginationMixin, generic.ListView):
     model = Gift
+    queryset = Gift.objects.select_related("brand")
     paginate_by = 3
+    keyset_ordering = ("id",)
+
 
+@method_decorator(query_budget(10), name="dispatch")
+@method_decorator(replica_reads, name="dispatch")
+class GiftBrowseView(KeysetPaginationMixin, generic.ListView):
+    """Gifts narrowed by category, brand and country, with facet counts."""
 
+    model = Gift
+    template_name = "catalog/gift_browse.html"
+    paginate_by = 10
+    keyset_ordering = ("id",)
+
+    def get_queryset(self):
+        try:
+            self.filters = facets.parse_filters(self.request.GET)
+        except ValueError:
+            raise Http404("Invalid facet filter.")
+        return facets.filter_gifts(Gift.objects.select_related("brand"), self.filters)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        counts = facets.facet_counts(self.filters)
+        selected = set(self.filters)
+        groups = []
+        for facet, values in counts["facets"].items():
+            choices = []
+            for value, gifts in values:
+                key = (facet, value.pk)
+                # following the link selects the value, or deselects it
+                query = urlencode(sorted(selected ^ {key}))
+                choices.append(
+                    {
+                        "value": value,
+                        "gifts": gifts,
+                        "selected": key in selected,
+                        "query": query,
+                    }
+                )
+            name = facets.FACETS[facet]._meta.verbose_name
+            groups.append({"name": name, "choices": choices})
+        context.update(
+            {
+                "total": counts["total"],
+                "facet_groups": groups,
+                "filters_query": urlencode(self.filters),
+            }
+        )
+        return context
+
+
+@method_decorator(query_budget(6), name="dispatch")
+@method_decorator(replica_reads, name="dispatch")
 class GiftDetailView(generic.DetailView):
     model = Gift
+    queryset = Gift.objects.select_related("brand", "made_in").prefetch_related(
+        "giftinstance_set"
+    )
+
+    @popularity.counts_views(Gift)
+    @conditional_detail(Gift, depends_on=[Brand, Category, Country, GiftInstance])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
-class BrandListView(generic.ListView):
+# offset pages add a COUNT to the page, session and user
+@method_decorator(query_budget(4), name="dispatch")
+@method_decorator(replica_reads, name="dispatch")
+class BrandListView(KeysetPaginationMixin, generic.ListView):
     model = Brand
     paginate_by = 2
+    keyset_ordering = ("name",)
 
 
+@method_decorator(query_budget(6), name="dispatch")
+@method_decorator(replica_reads, name="dispatch")
 class BrandDetailView(generic.DetailView):
     model = Brand
+    queryset = Brand.objects.prefetch_related(
+        Prefetch("gift_set", queryset=Gift.objects.select_related("made_in"))
+    )
 
+    @popularity.counts_views(Brand)
+    @conditional_detail(Brand, depends_on=[Category, Country, Gift])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class GiftInstanceListView(LoginRequiredMixin, generic.ListView):
+
+@method_decorator(query_budget(4), name="dispatch")
+class GiftInstanceListView(LoginRequiredMixin, KeysetPaginationMixin, generic.ListView):
     model = GiftInstance
     paginate_by = 3
+    keyset_ordering = ("event_date", "id")
 
     def get_queryset(self):
         """Override to return GiftInstance objects uploaded by current user.
@@ -69,13 +171,56 @@ class GiftInstanceListView(LoginRequiredMixin, generic.ListView):
             QuerySet: A list of GiftInstance objects.
         """
 
-        return GiftInstance.objects.filter(requester=self.request.user).order_by(
-            "event_date"
+        return (
+            GiftInstance.objects.filter(requester=self.request.user)
+            .with_expiry()
+            .select_related("gift__brand")
+            .order_by(F("event_date").asc(nulls_first=True), "id")
         )
 
 
 # add login mixin
+# an invalid form is shown again, which runs the most queries
+@method_decorator(query_budget(9), name="dispatch")
 class GiftInstanceUpdateView(LoginRequiredMixin, generic.UpdateView):
     model = GiftInstance
     fields = ["gift", "event_date", "size", "colour", "price", "url", "requester"]
     success_url = reverse_lazy("mygifts")
+
+    @retry_on_lock
+    def form_valid(self, form):
+        # write only the edited fields, so a claim made since this instance
+        # was read is not reverted to available
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=[*form.fields, "updated_at"])
+        return redirect(self.get_success_url())
+
+
+def _change_claim(request, pk, change):
+    try:
+        change(pk, request.user)
+    except GiftInstance.DoesNotExist:
+        raise Http404("No gift request found matching the query")
+    except claims.ClaimConflict as conflict:
+        context = {"message": str(conflict)}
+        return render(request, "catalog/claim_conflict.html", context, status=409)
+    gift_id = (
+        GiftInstance.objects.filter(pk=pk).values_list("gift_id", flat=True).first()
+    )
+    return redirect("gift-detail", pk=gift_id) if gift_id else redirect("mygifts")
+
+
+@login_required
+@require_POST
+@query_budget(5)
+def claim_gift(request, pk):
+    """Take an available gift instance; answers 409 if someone else has it."""
+    return _change_claim(request, pk, claims.claim)
+
+
+@login_required
+@require_POST
+@query_budget(5)
+def release_gift(request, pk):
+    """Give back a gift instance taken by the current user."""
+    return _change_claim(request, pk, claims.release)
@@ -0,0 +1,29 @@
+"""Per-browser visit counter for the home page.
+
+The count lives in a signed cookie instead of the session. Reading the
+session and writing to it on every hit made the read-mostly home page
+write a session row for every anonymous visitor. Now the page reads
+nothing and writes nothing server-side. The signature stops the count
+from being edited by hand. It is still only a count, so a lost or stale
+cookie just restarts it.
+"""
+
+from django.core import signing
+
+COOKIE = "num_visits"
+SALT = "catalog.visits"
+MAX_AGE = 365 * 24 * 60 * 60
+
+
+def get_visits(request):
+    """Return how many times this browser has visited before."""
+    try:
+        return int(request.get_signed_cookie(COOKIE, 0, salt=SALT, max_age=MAX_AGE))
+    except (ValueError, signing.BadSignature):
+        return 0
+
+
+def set_visits(response, visits):
+    response.set_signed_cookie(
+        COOKIE, str(visits), salt=SALT, max_age=MAX_AGE, httponly=True, samesite="Lax"
+    )
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+
+from catalog import versions
+from catalog.stats import invalidate_stats
+
+ON_CONFLICT_CHOICES = ("error", "ignore", "update")
+
+
+class BulkCreateMixin:
+    """
+    Lets a create endpoint also accept a JSON array of objects.
+
+    The array is validated in one pass and written with `bulk_create` in
+    batches of `?batch_size=` inside a single transaction. Objects whose
+    `bulk_key` already exists are reported as errors, skipped
+    (`?on_conflict=ignore`) or overwritten (`?on_conflict=update`).
+    If any object is invalid nothing is written and the response lists the
+    errors by position in the array.
+    """
+
+    bulk_key = "name"
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def get_bulk_options(self, request):
+        errors = {}
+        on_conflict = request.query_params.get("on_conflict", "error")
+        if on_conflict not in ON_CONFLICT_CHOICES:
+            choices = ", ".join(ON_CONFLICT_CHOICES)
+            errors["on_conflict"] = [f"Must be one of {choices}."]
+        batch_size = getattr(settings, "API_BULK_BATCH_SIZE", 500)
+        try:
+            batch_size = int(request.query_params.get("batch_size", batch_size))
+            if batch_size < 1:
+                raise ValueError
+        except ValueError:
+            errors["batch_size"] = ["Must be a positive integer."]
+        return on_conflict, batch_size, errors
+
+    def get_bulk_serializer(self, data):
+        serializer = self.get_serializer(data=data, many=True)
+        # uniqueness of the key is checked for the whole array at once in
+        # bulk_create, rather than with one query per object
+        key_field = serializer.child.fields[self.bulk_key]
+        key_field.validators = [
+            validator
+            for validator in key_field.validators
+            if not isinstance(validator, UniqueValidator)
+        ]
+        return serializer
+
+    def get_key_errors(self, model, keys, existing, on_conflict):
+        errors = [{} for _ in keys]
+        seen = set()
+        for index, key in enumerate(keys):
+            if key in seen:
+                errors[index] = {self.bulk_key: ["Duplicated in this request."]}
+            elif key in existing and on_conflict == "error":
+                message = (
+                    f"{model._meta.verbose_name} with this {self.bulk_key} "
+                    "already exists."
+                )
+                errors[index] = {self.bulk_key: [message]}
+            seen.add(key)
+        return errors
+
+    def bulk_create(self, request):
+        on_conflict, batch_size, option_errors = self.get_bulk_options(request)
+        if option_errors:
+            return Response(option_errors, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = getattr(settings, "API_BULK_MAX_ITEMS", 10000)
+        if len(request.data) > max_items:
+            message = f"No more than {max_items} objects per request."
+            return Response(
+                {"non_field_errors": [message]}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_bulk_serializer(request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        model = serializer.child.Meta.model
+        items = serializer.validated_data
+        keys = [item[self.bulk_key] for item in items]
+        existing = model.objects.in_bulk(keys, field_name=self.bulk_key)
+
+        errors = self.get_key_errors(model, keys, existing, on_conflict)
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        new = [model(**item) for item in items if item[self.bulk_key] not in existing]
+        changed = []
+        fields = set()
+        if on_conflict == "update":
+            now = timezone.now()
+            for item in items:
+                obj = existing.get(item[self.bulk_key])
+                if obj is not None:
+                    for name, value in item.items():
+                        setattr(obj, name, value)
+                    # bulk_update does not apply auto_now
+                    obj.updated_at = now
+                    fields.update(item)
+                    changed.append(obj)
+            fields.discard(self.bulk_key)
+            fields.add("updated_at")
+
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    new, batch_size=batch_size, ignore_conflicts=on_conflict != "error"
+                )
+                if changed:
+                    model.objects.bulk_update(changed, fields, batch_size=batch_size)
+        except IntegrityError:
+            # another writer created one of the keys after they were checked
+            message = "Conflicting objects were created concurrently, please retry."
+            return Response(
+                {"non_field_errors": [message]}, status=status.HTTP_409_CONFLICT
+            )
+
+        self.bulk_written([getattr(obj, self.bulk_key) for obj in new + changed])
+        return Response(
+            {
+                "created": len(new),
+                "updated": len(changed),
+                "ignored": len(items) - len(new) - len(changed),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def bulk_written(self, keys):
+        """
+        Called with the keys of the created and updated objects. `bulk_create`
+        and `bulk_update` send no signals, so caches are refreshed here.
+        """
+        invalidate_stats()
+        versions.touch(self.get_queryset().model)
@@ -0,0 +1,38 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from catalog import versions
+from giftlist.replicas import on_replica
+
+
+class ConditionalListMixin:
+    """
+    Answers `If-None-Match`/`If-Modified-Since` on a list endpoint from the
+    table's change stamp, before the list query runs. Lists read from a
+    replica, which may lag the stamp, are sent without validators.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if on_replica():
+            return super().list(request, *args, **kwargs)
+        model = self.get_queryset().model
+        stamp = versions.changed_at(model)
+        etag = quote_etag(
+            versions.make_etag(
+                model._meta.label_lower,
+                stamp,
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT"),
+            )
+        )
+        last_modified = int(stamp)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by the view's `ordering` attribute.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "ordering", None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class StreamingListMixin:
+    """
+    Adds `?stream=ndjson` to a list endpoint: rows are read from the database
+    in chunks and written out one JSON object per line, so the response never
+    holds the whole table in memory.
+    """
+
+    stream_param = "stream"
+    stream_formats = ("ndjson",)
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get(self.stream_param)
+        if stream is None:
+            return super().list(request, *args, **kwargs)
+        if stream not in self.stream_formats:
+            raise ValidationError(
+                {self.stream_param: f"Unsupported stream format '{stream}'."}
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        return StreamingHttpResponse(
+            self.stream_ndjson(queryset.order_by(*ordering)),
+            content_type="application/x-ndjson",
+        )
+
+    def stream_ndjson(self, queryset):
+        serializer = self.get_serializer()
+        encoder = JSONEncoder(ensure_ascii=False)
+        chunk_size = getattr(settings, "API_STREAM_CHUNK_SIZE", 2000)
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield encoder.encode(serializer.to_representation(obj)) + "\n"
@@ -24,5 +24,13 @@ class BrandSerializer(serializers.HyperlinkedModelSerializer):
 class GiftSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Gift
-        fields = ["name", "description", "ref"]
+        fields = [
+            "name",
+            "description",
+            "ref",
+            "category_names",
+            "available_count",
+            "taken_count",
+        ]
+        read_only_fields = ["category_names", "available_count", "taken_count"]
 
@@ -1,6 +1,8 @@
+import gzip
 import json
 
 from catalog.models import Brand, Category, Country, Gift
+from django.contrib.auth.models import User
 from django.urls import reverse
 from giftapi.serializers import (BrandSerializer, CategorySerializer,
                                  CountrySerializer, GiftSerializer)
@@ -34,13 +36,13 @@ class GetAllCountriesTest(APITestCase):
 
         # context must include request due to HyperlinkedIdentityField
         serializer = CountrySerializer(countries, many=True, context={"request": request})
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_ordering_by_name(self):
         response = self.client.get(reverse("country-list"))
-        self.assertEqual(response.data[0]["name"], "Country A")
-        self.assertEqual(response.data[2]["name"], "Country C")
+        self.assertEqual(response.data["results"][0]["name"], "Country A")
+        self.assertEqual(response.data["results"][2]["name"], "Country C")
 
 
 
@@ -100,13 +102,13 @@ class GetAllCategoriesTest(APITestCase):
 
         # context must include request due to HyperlinkedIdentityField
         serializer = CategorySerializer(categories, many=True, context={"request": request})
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_ordering_by_name(self):
         response = self.client.get(reverse("category-list"))
-        self.assertEqual(response.data[0]["name"], "Astrology")
-        self.assertEqual(response.data[2]["name"], "Cricket")
+        self.assertEqual(response.data["results"][0]["name"], "Astrology")
+        self.assertEqual(response.data["results"][2]["name"], "Cricket")
 
 
 
@@ -165,13 +167,13 @@ class GetAllBrandsTest(APITestCase):
         request = response.wsgi_request
 
         serializer = BrandSerializer(brands, many=True, context={"request": request})
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_ordering_by_name(self):
         response = self.client.get(reverse("brand-list"))
-        self.assertEqual(response.data[0]["name"], "Brand A")
-        self.assertEqual(response.data[2]["name"], "Brand C")
+        self.assertEqual(response.data["results"][0]["name"], "Brand A")
+        self.assertEqual(response.data["results"][2]["name"], "Brand C")
 
 class CreateNewBrandTest(APITestCase):
     @classmethod
@@ -254,7 +256,7 @@ class GetAllGiftsTest(APITestCase):
         request = response.wsgi_request
 
         serializer = GiftSerializer(gifts, many=True, context={"request": request})
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 '''class CreateNewGiftTest(APITestCase):
@@ -304,3 +306,241 @@ class GetAllGiftsTest(APITestCase):
 
  
 
+
+class SearchGiftsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        test_brand = Brand.objects.create(name="Apple", est=1976)
+        Gift.objects.create(
+            name="Iphone 11",
+            description="A brilliant smartphone",
+            ref="randomcodeABC",
+            brand=test_brand,
+        )
+        Gift.objects.create(
+            name="MacBook",
+            description="A nice laptop",
+            ref="randomcodeHIJ",
+            brand=test_brand,
+        )
+
+    def test_url_exists_at_desired_location(self):
+        response = self.client.get("/api/gifts/search/?q=laptop")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search(self):
+        response = self.client.get(reverse("gift-search"), {"q": "laptop"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([gift["name"] for gift in response.data], ["MacBook"])
+
+    def test_limit(self):
+        response = self.client.get(reverse("gift-search"), {"q": "apple", "limit": 1})
+        self.assertEqual(len(response.data), 1)
+
+
+class PaginatedGiftsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Gift.objects.create(name=f"Gift {i}", description="", ref=f"ref {i}")
+
+    def test_cursor_pagination(self):
+        response = self.client.get(reverse("gift-list"), {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [gift["ref"] for gift in response.data["results"]], ["ref 0", "ref 1"]
+        )
+        self.assertIsNone(response.data["previous"])
+
+        refs = []
+        url = reverse("gift-list") + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            refs.extend(gift["ref"] for gift in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(refs, [f"ref {i}" for i in range(5)])
+
+    def test_stream_ndjson(self):
+        response = self.client.get(reverse("gift-list"), {"stream": "ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["ref"] for row in rows], [f"ref {i}" for i in range(5)])
+        self.assertEqual(
+            rows[0],
+            {
+                "name": "Gift 0",
+                "description": "",
+                "ref": "ref 0",
+                "category_names": [],
+                "available_count": 0,
+                "taken_count": 0,
+            },
+        )
+
+    def test_stream_ordering(self):
+        Brand.objects.create(name="Brand B")
+        Brand.objects.create(name="Brand A")
+        response = self.client.get(reverse("brand-list"), {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["name"] for line in lines], ["Brand A", "Brand B"]
+        )
+
+    def test_stream_unknown_format(self):
+        response = self.client.get(reverse("gift-list"), {"stream": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkCreateTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Brand.objects.create(name="Brand A", est=1950)
+        Gift.objects.create(name="Old name", description="", ref="ref 0")
+
+    def post(self, name, payload, **params):
+        url = reverse(name)
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        return self.client.post(url, data=json.dumps(payload), content_type="application/json")
+
+    def test_bulk_create(self):
+        payload = [{"name": f"Country {i}"} for i in range(5)]
+        with self.assertNumQueries(4):  # lookup, savepoint, insert, release
+            response = self.post("country-list", payload, batch_size=10)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"created": 5, "updated": 0, "ignored": 0})
+        self.assertEqual(Country.objects.count(), 5)
+
+    def test_batches(self):
+        payload = [{"name": f"Category {i}"} for i in range(5)]
+        response = self.post("category-list", payload, batch_size=2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Category.objects.count(), 5)
+
+    def test_errors_per_item(self):
+        payload = [
+            {"name": "Brand B", "est": 1990},
+            {"name": "Brand C", "est": "bad data"},
+        ]
+        response = self.post("brand-list", payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["errors"][0], {})
+        self.assertIn("est", response.data["errors"][1])
+        self.assertEqual(Brand.objects.count(), 1)
+
+    def test_conflict_error(self):
+        payload = [{"name": "Brand B"}, {"name": "Brand A"}, {"name": "Brand B"}]
+        response = self.post("brand-list", payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("already exists", errors[1]["name"][0])
+        self.assertIn("Duplicated", errors[2]["name"][0])
+        self.assertEqual(Brand.objects.count(), 1)
+
+    def test_conflict_ignore(self):
+        payload = [{"name": "Brand A", "est": 2000}, {"name": "Brand B"}]
+        response = self.post("brand-list", payload, on_conflict="ignore")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"created": 1, "updated": 0, "ignored": 1})
+        self.assertEqual(Brand.objects.get(name="Brand A").est, 1950)
+
+    def test_conflict_update(self):
+        payload = [
+            {"name": "New name", "description": "Updated", "ref": "ref 0"},
+            {"name": "Gift 1", "description": "A gift", "ref": "ref 1"},
+        ]
+        response = self.post("gift-list", payload, on_conflict="update")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"created": 1, "updated": 1, "ignored": 0})
+        self.assertEqual(Gift.objects.get(ref="ref 0").name, "New name")
+        self.assertEqual(Gift.objects.count(), 2)
+
+        # bulk writes are searchable straight away
+        response = self.client.get(reverse("gift-search"), {"q": "new name"})
+        self.assertEqual([gift["ref"] for gift in response.data], ["ref 0"])
+
+    def test_bad_options(self):
+        response = self.post("brand-list", [{"name": "Brand B"}], on_conflict="merge")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("on_conflict", response.data)
+        response = self.post("brand-list", [{"name": "Brand B"}], batch_size=0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("batch_size", response.data)
+
+
+class ExportTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Brand.objects.create(name="Brand A", est=1950)
+        Brand.objects.create(name="Brand B")
+        User.objects.create(username="admin", is_staff=True)
+
+    def test_export_ndjson(self):
+        response = self.client.get(reverse("export", kwargs={"table": "brands"}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Brand A", "Brand B"])
+
+    def test_export_csv_gzip(self):
+        response = self.client.get(
+            "/api/export/brands/", {"type": "csv", "compress": "gzip"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="brands.csv.gz"'
+        )
+        data = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(data.splitlines()[0], "id,name,est")
+
+    def test_bad_requests(self):
+        response = self.client.get("/api/export/users/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get("/api/export/brands/", {"type": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_giftinstances_need_staff(self):
+        response = self.client.get("/api/export/giftinstances/")
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN),
+        )
+        self.client.force_authenticate(User.objects.get(username="admin"))
+        response = self.client.get("/api/export/giftinstances/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ConditionalListTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Brand.objects.create(name="Brand A", est=1950)
+
+    def test_not_modified(self):
+        response = self.client.get(reverse("brand-list"))
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("brand-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified(self):
+        response = self.client.get(reverse("brand-list"))
+        etag = response["ETag"]
+        Brand.objects.create(name="Brand B")
+        response = self.client.get(reverse("brand-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_bulk_create_modifies(self):
+        response = self.client.get(reverse("brand-list"))
+        etag = response["ETag"]
+        self.client.post(
+            reverse("brand-list"),
+            data=json.dumps([{"name": "Brand C"}]),
+            content_type="application/json",
+        )
+        response = self.client.get(reverse("brand-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from catalog.models import Brand, Category, Country, Gift
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ApiQueryBudgetTest(APITestCase):
+    """List endpoints must run the same number of queries whatever the size."""
+
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, size):
+        for i in range(size):
+            brand = Brand.objects.create(name=f"Brand {size} {i}")
+            Category.objects.create(name=f"Category {size} {i}")
+            Country.objects.create(name=f"Country {size} {i}")
+            Gift.objects.create(
+                name=f"Gift {size} {i}",
+                description="A gift",
+                ref=f"ref {size} {i}",
+                brand=brand,
+            )
+
+    def assertConstant(self, url, **params):
+        counts = []
+        for size in (1, 10, 100):
+            self.seed(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f"query counts grew: {counts}")
+
+    def test_lists(self):
+        for name in ("country-list", "category-list", "brand-list", "gift-list"):
+            with self.subTest(name):
+                Gift.objects.all().delete()
+                Brand.objects.all().delete()
+                Category.objects.all().delete()
+                Country.objects.all().delete()
+                self.assertConstant(reverse(name), page_size=100)
+
+    def test_search(self):
+        self.assertConstant(reverse("gift-search"), q="gift", limit=100)
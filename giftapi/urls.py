@@ -11,4 +11,13 @@ router.register(r"gifts", views.GiftViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("export/<str:table>/", views.ExportView.as_view(), name="export"),
+    path(
+        "giftinstances/<uuid:pk>/claim/", views.ClaimView.as_view(), name="claim"
+    ),
+    path(
+        "giftinstances/<uuid:pk>/release/",
+        views.ReleaseView.as_view(),
+        name="release",
+    ),
 ]
\ No newline at end of file
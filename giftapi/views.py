@@ -1,41 +1,186 @@
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from rest_framework import mixins
+from rest_framework import permissions
+from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from catalog import models
+from catalog import claims, export, facets, models, search
+from catalog.budgets import query_budget
+from giftlist.replicas import replica_reads
 from . import serializers
+from .bulk import BulkCreateMixin
+from .conditional import ConditionalListMixin
+from .pagination import StreamingListMixin
 
-class CountryViewSet(mixins.CreateModelMixin,
+@method_decorator(query_budget(1), name="list")
+@method_decorator(replica_reads, name="list")
+class CountryViewSet(ConditionalListMixin,
+                                StreamingListMixin,
+                                BulkCreateMixin,
+                                mixins.CreateModelMixin,
                                 mixins.ListModelMixin,
                                 viewsets.GenericViewSet):
     """
     New countries are created from the country list. 
     """
     queryset = models.Country.objects.all()
+    ordering = "name"
     serializer_class = serializers.CountrySerializer
 
-class CategoryViewSet(mixins.CreateModelMixin,
+@method_decorator(query_budget(1), name="list")
+@method_decorator(replica_reads, name="list")
+class CategoryViewSet(ConditionalListMixin,
+                                StreamingListMixin,
+                                BulkCreateMixin,
+                                mixins.CreateModelMixin,
                                 mixins.ListModelMixin,
                                 viewsets.GenericViewSet):
     """
     New categories are created from the category list. 
     """
     queryset = models.Category.objects.all()
+    ordering = "name"
     serializer_class = serializers.CategorySerializer
 
-class BrandViewSet(mixins.CreateModelMixin,
+@method_decorator(query_budget(1), name="list")
+@method_decorator(replica_reads, name="list")
+class BrandViewSet(ConditionalListMixin,
+                                StreamingListMixin,
+                                BulkCreateMixin,
+                                mixins.CreateModelMixin,
                                 mixins.ListModelMixin,
                                 viewsets.GenericViewSet):
     """
     New brands are created from the brand list. 
     """
     queryset = models.Brand.objects.all()
+    ordering = "name"
     serializer_class = serializers.BrandSerializer
 
-class GiftViewSet(mixins.CreateModelMixin,
+@method_decorator(query_budget(1), name="list")
+@method_decorator(replica_reads, name="list")
+class GiftViewSet(ConditionalListMixin,
+                                StreamingListMixin,
+                                BulkCreateMixin,
+                                mixins.CreateModelMixin,
                                 mixins.ListModelMixin,
                                 viewsets.GenericViewSet):
     """
     New gifts are created from the gift list. 
     """
     queryset = models.Gift.objects.all()
+    ordering = "id"
     serializer_class = serializers.GiftSerializer
+    bulk_key = "ref"
+
+    def bulk_written(self, keys):
+        super().bulk_written(keys)
+        for start in range(0, len(keys), 500):
+            gifts = models.Gift.objects.filter(ref__in=keys[start : start + 500])
+            search.index_gifts(gifts.values_list("pk", flat=True))
+
+    @action(detail=False)
+    @method_decorator(query_budget(2))
+    def search(self, request):
+        """
+        Gifts matching ?q=, best match first. Use ?limit= to change the number of results (max 100).
+        """
+        try:
+            limit = max(min(int(request.query_params.get("limit", 20)), 100), 1)
+        except ValueError:
+            limit = 20
+        gifts = search.search_gifts(request.query_params.get("q", ""), limit=limit)
+        serializer = self.get_serializer(gifts, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False)
+    @method_decorator(query_budget(10))
+    @method_decorator(replica_reads)
+    def browse(self, request):
+        """
+        Gifts with every `category`, `brand` and `made_in` id given (each may be repeated), with `total`, the number of them, and `facets`, the most common values of each facet among them with their number of gifts.
+        """
+        try:
+            filters = facets.parse_filters(request.query_params)
+        except ValueError:
+            raise ValidationError({"detail": "Facet filters must be ids."})
+        queryset = facets.filter_gifts(self.get_queryset(), filters)
+        page = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+        counts = facets.facet_counts(filters)
+        response.data["total"] = counts["total"]
+        response.data["facets"] = {
+            facet: [
+                {"id": value.pk, "name": str(value), "count": gifts}
+                for value, gifts in values
+            ]
+            for facet, values in counts["facets"].items()
+        }
+        return response
+
+
+class ExportView(APIView):
+    """
+    Streams a whole table as NDJSON (default) or CSV with ?type=csv. Add ?compress=gzip for a gzipped download.
+    Gift instances can only be exported by staff.
+    """
+
+    def get_permissions(self):
+        if self.kwargs.get("table") == "giftinstances":
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def get(self, request, table):
+        if table not in export.TABLES:
+            raise Http404
+        # ?format= is taken by DRF's content negotiation
+        file_format = request.query_params.get("type", "ndjson")
+        if file_format not in export.FORMATS:
+            return Response(
+                {"type": [f"Must be one of {', '.join(export.FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = request.query_params.get("compress") == "gzip"
+        response = StreamingHttpResponse(
+            export.export(table, file_format, compress=compress),
+            content_type=export.content_type(file_format, compress),
+        )
+        name = export.filename(table, file_format, compress)
+        response["Content-Disposition"] = f'attachment; filename="{name}"'
+        return response
+
+
+class ClaimView(APIView):
+    """
+    POST to take an available gift instance. Answers 409 Conflict if someone else has already taken it.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    change = staticmethod(claims.claim)
+    new_status = "t"
+
+    @method_decorator(query_budget(4))
+    def post(self, request, pk):
+        try:
+            self.change(pk, request.user)
+        except models.GiftInstance.DoesNotExist:
+            raise Http404
+        except claims.ClaimConflict as conflict:
+            return Response({"detail": str(conflict)}, status=status.HTTP_409_CONFLICT)
+        return Response({"id": pk, "status": self.new_status})
+
+
+class ReleaseView(ClaimView):
+    """
+    POST to give back a gift instance you have taken. Answers 409 Conflict if you have not taken it.
+    """
+
+    change = staticmethod(claims.release)
+    new_status = "a"
@@ -0,0 +1,117 @@
+"""Per-request SQL instrumentation.
+
+SQLInstrumentationMiddleware times every query a request runs, on every
+database connection, and reports the totals in a Server-Timing header. Queries
+slower than a threshold are written to the "giftlist.sql" logger as one JSON
+object per query, with their SQL normalized so that similar queries group
+together. Settings (all optional) live in the SQL_INSTRUMENTATION dict:
+
+ENABLED         turn the middleware off without removing it (default True)
+SAMPLE_RATE     fraction of requests instrumented, 0.0 to 1.0 (default 1.0)
+SLOW_QUERY_MS   log queries slower than this, None to disable (default 100)
+SERVER_TIMING   add the Server-Timing header (default True)
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("giftlist.sql")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "SLOW_QUERY_MS": 100,
+    "SERVER_TIMING": True,
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\?|%s)(?:, ?(?:\?|%s))*\)", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Replace literals with ? and collapse IN lists and whitespace."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "SQL_INSTRUMENTATION", {})}
+
+
+class QueryTimer:
+    """execute_wrapper recording how long each query takes."""
+
+    def __init__(self, slow_ms):
+        self.slow_ms = slow_ms
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.total += duration
+            self.max = max(self.max, duration)
+            if self.slow_ms is not None and duration >= self.slow_ms:
+                alias = context["connection"].alias
+                self.slow.append((duration, alias, sql))
+
+
+class SQLInstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config["ENABLED"] or random.random() >= config["SAMPLE_RATE"]:
+            return self.get_response(request)
+
+        timer = QueryTimer(config["SLOW_QUERY_MS"])
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if config["SERVER_TIMING"]:
+            timings = [
+                f'db;dur={timer.total:.1f};desc="{timer.count} queries"',
+                f"db-max;dur={timer.max:.1f}",
+                f"app;dur={elapsed:.1f}",
+            ]
+            existing = response.get("Server-Timing")
+            if existing:
+                timings.insert(0, existing)
+            response["Server-Timing"] = ", ".join(timings)
+
+        for duration, alias, sql in timer.slow:
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "slow_query",
+                        "method": request.method,
+                        "path": request.path,
+                        "database": alias,
+                        "duration_ms": round(duration, 1),
+                        "sql": normalize_sql(sql),
+                    }
+                )
+            )
+        return response
@@ -0,0 +1,146 @@
+"""Opt-in per-request profiling.
+
+ProfilingMiddleware runs a view (including template rendering) under cProfile
+when a staff user asks for it with the ?profile=1 parameter or an
+"X-Profile: 1" header, or on one request in every SAMPLE_EVERY. Each run
+writes two files to DIR, named after the URL name and the time:
+
+<name>-<time>.prof       pstats data, for pstats/snakeviz
+<name>-<time>.collapsed  sampled stacks in collapsed format, for flamegraph.pl
+                         or speedscope
+
+Settings live in the PROFILING dict:
+
+ENABLED       turn the middleware off without removing it (default True)
+DIR           where reports are written (default BASE_DIR / "profiles")
+SAMPLE_EVERY  also profile one request in this many, 0 for never (default 0)
+INTERVAL_MS   stack sampling interval for the collapsed output (default 1)
+"""
+
+import cProfile
+import itertools
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DIR": None,
+    "SAMPLE_EVERY": 0,
+    "INTERVAL_MS": 1,
+}
+
+QUERY_PARAM = "profile"
+HEADER = "HTTP_X_PROFILE"
+
+_requests = itertools.count(1)
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, "PROFILING", {})}
+    if config["DIR"] is None:
+        config["DIR"] = Path(settings.BASE_DIR) / "profiles"
+    return config
+
+
+class StackSampler(threading.Thread):
+    """Sample the stack of one thread at a fixed interval.
+
+    cProfile only records caller/callee pairs, so the full stacks needed for a
+    flame graph are sampled separately.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", "?")
+                names.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def profile_call(func, *args, interval=0.001, **kwargs):
+    """Run func under cProfile and a stack sampler.
+
+    Returns (result, profile, sampler).
+    """
+    profile = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    try:
+        result = profile.runcall(func, *args, **kwargs)
+    finally:
+        sampler.stop()
+    return result, profile, sampler
+
+
+def write_report(directory, name, profile, sampler):
+    """Write the .prof and .collapsed files and return the .prof path."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    prof_path = directory / f"{stem}.prof"
+    profile.dump_stats(prof_path)
+    (directory / f"{stem}.collapsed").write_text(sampler.collapsed())
+    return prof_path
+
+
+class ProfilingMiddleware:
+    """Must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def wants_profile(self, request, config):
+        if config["SAMPLE_EVERY"] and next(_requests) % config["SAMPLE_EVERY"] == 0:
+            return True
+        asked = request.GET.get(QUERY_PARAM) == "1" or request.META.get(HEADER) == "1"
+        user = getattr(request, "user", None)
+        return asked and user is not None and user.is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        config = get_config()
+        if not config["ENABLED"] or not self.wants_profile(request, config):
+            return None
+
+        def run_view():
+            response = view_func(request, *view_args, **view_kwargs)
+            lazy = getattr(response, "template_name", None)
+            if lazy and not response.is_rendered:
+                response.render()
+            return response
+
+        response, profile, sampler = profile_call(
+            run_view, interval=config["INTERVAL_MS"] / 1000
+        )
+        name = request.resolver_match.url_name or "view"
+        path = write_report(config["DIR"], name, profile, sampler)
+        if getattr(request, "user", None) is not None and request.user.is_staff:
+            response["X-Profile-Report"] = path.name
+        return response
@@ -0,0 +1,132 @@
+"""Sending catalog reads to read replicas.
+
+Views decorated with replica_reads run their queries on one of the
+databases listed in settings.DATABASE_REPLICAS, picked at random for each
+request, so read capacity grows with every replica added. Everything else,
+including every write, uses the default database.
+
+Replicas lag behind the primary. After a browser makes a write (any
+successful POST, PUT, PATCH or DELETE), ReplicaMiddleware sets a cookie
+that lasts REPLICA_STICKY_SECONDS. While it is set, that browser's reads
+stay on the primary, so users see their own changes straight away.
+
+The change stamps behind ETag and Last-Modified (catalog.versions) follow
+the primary, so responses read from a replica are sent without them: a
+client would otherwise keep a stale body under a current validator.
+
+Settings:
+
+DATABASE_REPLICAS       aliases in DATABASES to read from (default none)
+REPLICA_STICKY_SECONDS  how long reads stay on the primary after a write
+                        (default 5)
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = "primary_reads"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+_read_db = ContextVar("read_db", default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+@contextmanager
+def reading_from(alias):
+    """Route the reads in the block to the database alias."""
+    token = _read_db.set(alias)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def on_replica():
+    """Return whether reads are being routed to a replica."""
+    return _read_db.get() is not None
+
+
+def _stream_from(alias, content):
+    with reading_from(alias):
+        yield from content
+
+
+def choose_replica(request):
+    """Return the replica alias to read from for request, or None for the
+    primary."""
+    replicas = get_replicas()
+    if not replicas or STICKY_COOKIE in request.COOKIES:
+        return None
+    return random.choice(replicas)
+
+
+def replica_reads(view):
+    """Decorate a view function (or a method, via method_decorator) to read
+    from a replica."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = choose_replica(request)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        with reading_from(alias):
+            response = view(request, *args, **kwargs)
+            # the queries of a lazy TemplateResponse run while rendering
+            lazy = getattr(response, "template_name", None)
+            if lazy and not response.is_rendered:
+                response.render()
+        if response.streaming:
+            response.streaming_content = _stream_from(
+                alias, response.streaming_content
+            )
+        return response
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside replica_reads go to its replica, all else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_db.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every database is the primary or a copy of it
+        databases = settings.DATABASES
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Keeps a browser's reads on the primary for a while after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            get_replicas()
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                STICKY_COOKIE, "1", max_age=sticky_seconds(), samesite="Lax"
+            )
+        return response
@@ -0,0 +1,86 @@
+"""Retrying writes that lost the race for a database lock.
+
+SQLite lets one connection write at a time. busy_timeout makes the others
+wait for the lock, but a transaction that has already read cannot wait,
+because that could deadlock, so it fails at once with "database is locked".
+retry_on_lock runs such a write again after a short pause. The pause grows
+with each attempt and is randomized, so that the writers that collided do
+not collide again.
+
+Only a whole unit of work can be run again. Inside a transaction (an atomic
+block) the wrapper therefore retries nothing and leaves the error to the
+code that owns the transaction.
+
+Settings live in the DB_LOCK_RETRY dict:
+
+ATTEMPTS    tries in all, including the first (default 5)
+BASE_DELAY  seconds to wait before the first retry, doubled for each
+            further one (default 0.05)
+MAX_DELAY   longest wait between two tries in seconds (default 1)
+"""
+
+import logging
+import random
+import sqlite3
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ATTEMPTS": 5,
+    "BASE_DELAY": 0.05,
+    "MAX_DELAY": 1,
+}
+
+LOCK_MESSAGES = ("database is locked", "database table is locked")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "DB_LOCK_RETRY", {})}
+
+
+def is_lock_error(error):
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and any(
+        message in str(error) for message in LOCK_MESSAGES
+    )
+
+
+def in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def backoff(attempt, config):
+    """Return the seconds to wait before retry number attempt (from 1)."""
+    delay = min(config["MAX_DELAY"], config["BASE_DELAY"] * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def retry_on_lock(func):
+    """Decorate func to run it again when the database is locked."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        config = get_config()
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                if (
+                    attempt >= config["ATTEMPTS"]
+                    or not is_lock_error(error)
+                    or in_transaction()
+                ):
+                    raise
+                delay = backoff(attempt, config)
+                logger.info(
+                    "%s: %s, retrying in %.3fs", func.__qualname__, error, delay
+                )
+                time.sleep(delay)
+                attempt += 1
+
+    return wrapper
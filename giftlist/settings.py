@@ -43,13 +43,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "giftlist.instrumentation.SQLInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "giftlist.replicas.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "giftlist.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "giftlist.urls"
@@ -79,11 +82,56 @@ WSGI_APPLICATION = "giftlist.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "giftlist.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # a read replica; locally a copy of db.sqlite3 made by sync_replicas
+    "replica": {
+        "ENGINE": "giftlist.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    },
 }
 
+# Catalog list and detail pages and API lists read from one of these, except
+# for REPLICA_STICKY_SECONDS after a browser writes (see giftlist/replicas.py)
+DATABASE_ROUTERS = ["giftlist.replicas.ReplicaRouter"]
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 5
+
+# Run on every new SQLite connection, over the defaults in
+# giftlist/sqlite3/base.py; None leaves a PRAGMA at SQLite's default
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+}
+
+# Writes that find the database locked are tried again this many times in
+# all, with a randomized pause doubling from BASE_DELAY (see giftlist/retry.py)
+DB_LOCK_RETRY = {
+    "ATTEMPTS": 5,
+    "BASE_DELAY": 0.05,
+    "MAX_DELAY": 1,
+}
+
+# Cached statistics, change stamps and their locks must be seen by every
+# worker, so the default cache cannot be per-process (LocMemCache). Files
+# are shared by the workers of one host; with several hosts, or to make the
+# recompute locks strictly atomic, use memcached
+# ("django.core.cache.backends.memcached.PyMemcacheCache"). Tests get a
+# cache of their own (see giftlist/test_runner.py), and
+# "manage.py check --deploy" warns about a per-process cache.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    },
+}
+
+TEST_RUNNER = "giftlist.test_runner.TestRunner"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,3 +181,83 @@ LOGIN_REDIRECT_URL = "/"
 
 # send emails to stdout
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Home page statistics are cached until a Gift, GiftInstance or Brand changes;
+# the timeout is only a safety net (seconds)
+CATALOG_STATS_TIMEOUT = 60 * 60
+CATALOG_STATS_LOCK_TIMEOUT = 10
+
+# Sessions live in the database. Anonymous visitors normally have no session
+# at all: the home page visit counter is a signed cookie (see
+# catalog/visits.py). Only use "django.contrib.sessions.backends.cached_db" or
+# "django.contrib.sessions.backends.cache" with a cache shared by every
+# worker: with a per-process cache, logging out on one worker leaves the
+# session valid on the others. Expired rows of the database backends are
+# removed by the clear_expired_sessions command.
+SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# Gift and brand page views are buffered in each worker and written in
+# batches (see catalog/popularity.py)
+VIEW_COUNTS = {
+    "ENABLED": True,
+    "FLUSH_INTERVAL": 10,
+    "FLUSH_SIZE": 1000,
+    "SHARDS": 16,
+    "CACHE_TIMEOUT": 60,
+}
+
+# Faceted gift browsing reads precomputed counts (see catalog/facets.py)
+FACETS = {
+    "LIMIT": 20,
+    "CACHE_TIMEOUT": 300,
+}
+
+# List views seek on their ordering keys ("keyset") unless set to "offset";
+# ?page=N always uses offset pagination. ?page_size= is capped at the maximum.
+CATALOG_PAGINATION = "keyset"
+CATALOG_MAX_PAGE_SIZE = 100
+
+# API list endpoints are cursor paginated; ?stream=ndjson streams every row
+# instead, reading API_STREAM_CHUNK_SIZE rows from the database at a time
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "giftapi.pagination.CatalogCursorPagination",
+    "PAGE_SIZE": 50,
+}
+API_STREAM_CHUNK_SIZE = 2000
+
+# Create endpoints also accept a JSON array, written in batches of this size
+API_BULK_BATCH_SIZE = 500
+API_BULK_MAX_ITEMS = 10000
+
+# Views decorated with catalog.budgets.query_budget raise when they go over
+# their query budget if this is true, and only log a warning otherwise
+QUERY_BUDGET_RAISE = DEBUG
+
+# Per-request SQL timing (see giftlist/instrumentation.py): a Server-Timing
+# header on sampled requests and a JSON log line for every slow query
+SQL_INSTRUMENTATION = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "SLOW_QUERY_MS": 100,
+    "SERVER_TIMING": True,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "giftlist.sql": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
+# Staff can profile a request with ?profile=1 or an "X-Profile: 1" header;
+# reports are written to DIR (see giftlist/profiling.py)
+PROFILING = {
+    "ENABLED": True,
+    "DIR": BASE_DIR / "profiles",
+    "SAMPLE_EVERY": 0,
+    "INTERVAL_MS": 1,
+}
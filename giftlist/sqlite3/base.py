@@ -0,0 +1,43 @@
+"""SQLite backend tuned for several worker processes.
+
+It is Django's sqlite3 backend, except that every new connection first runs
+the PRAGMAs in settings.SQLITE_PRAGMAS (merged over DEFAULT_PRAGMAS). A
+PRAGMA set to None is left at SQLite's default. Use it with
+ENGINE = "giftlist.sqlite3".
+"""
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    # readers do not wait for the writer, and the writer does not wait for
+    # readers; the setting is stored in the database file
+    "journal_mode": "WAL",
+    # in WAL mode this can lose the last commits on power loss, but it never
+    # corrupts the database, and commits no longer wait for fsync
+    "synchronous": "NORMAL",
+    # milliseconds to wait for a lock before failing with "database is locked"
+    "busy_timeout": 5000,
+    # read pages through a 256 MiB memory map instead of read() calls
+    "mmap_size": 256 * 1024 * 1024,
+    # negative sizes are in KiB: 64 MiB of page cache per connection
+    "cache_size": -64 * 1024,
+}
+
+
+def get_pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, "SQLITE_PRAGMAS", {})}
+
+
+def apply_pragmas(connection, pragmas):
+    """Run PRAGMA name = value on a DB-API connection for each of pragmas."""
+    for name, value in pragmas.items():
+        if value is not None:
+            connection.execute(f"PRAGMA {name} = {value}")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, get_pragmas())
+        return connection